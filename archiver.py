@@ -1,12 +1,19 @@
 import os
+import sys
+import json
 import time
 import lzma
 import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Optional, Tuple
 
+from coldstore import archive_key, file_sha256, store_from_url
+from iobudget import IOBudget, ThrottledReader, WriterPressure, lower_priority
+from profiler import SpanRecorder, StackSampler, install_signal_handlers
+
 # Configuration via environment variables
 ARCHIVER_ENABLED = os.environ.get("ARCHIVER_ENABLED", "true").lower() == "true"
 ARCHIVER_SCAN_INTERVAL_SECONDS = int(os.environ.get("ARCHIVER_SCAN_INTERVAL_SECONDS", "3600"))
@@ -14,6 +21,34 @@ ARCHIVER_UNCOMPRESSED_DAYS = int(os.environ.get("ARCHIVER_UNCOMPRESSED_DAYS", "2
 ARCHIVER_MIN_AGE_MINUTES = int(os.environ.get("ARCHIVER_MIN_AGE_MINUTES", "60"))
 ARCHIVER_COMPRESSION_LEVEL = int(os.environ.get("ARCHIVER_COMPRESSION_LEVEL", "9"))
 
+# Resource budget: archive in the capacity the ingest writer leaves (0 = unlimited)
+ARCHIVER_READ_MBPS = float(os.environ.get("ARCHIVER_READ_MBPS", "20"))
+ARCHIVER_WRITE_MBPS = float(os.environ.get("ARCHIVER_WRITE_MBPS", "10"))
+ARCHIVER_CPU_SHARE = float(os.environ.get("ARCHIVER_CPU_SHARE", "0.5"))  # Fraction of one core
+ARCHIVER_NICE = int(os.environ.get("ARCHIVER_NICE", "10"))
+ARCHIVER_IONICE_IDLE = os.environ.get("ARCHIVER_IONICE_IDLE", "true").lower() == "true"
+# Back off while the writer's published flush latency rises (see iobudget.FlushLatency)
+ARCHIVER_BACKOFF_ENABLED = os.environ.get("ARCHIVER_BACKOFF_ENABLED", "true").lower() == "true"
+ARCHIVER_BACKOFF_RATIO = float(os.environ.get("ARCHIVER_BACKOFF_RATIO", "2.0"))  # x the idle baseline
+ARCHIVER_BACKOFF_MAX_MS = float(os.environ.get("ARCHIVER_BACKOFF_MAX_MS", "250"))  # Regardless of the baseline
+
+# Scrubber: re-verify archives on a rolling schedule, a bounded amount per pass
+ARCHIVER_SCRUB_ENABLED = os.environ.get("ARCHIVER_SCRUB_ENABLED", "true").lower() == "true"
+ARCHIVER_SCRUB_INTERVAL_DAYS = float(os.environ.get("ARCHIVER_SCRUB_INTERVAL_DAYS", "30"))  # Re-check each archive this often
+ARCHIVER_SCRUB_MAX_MB_PER_PASS = float(os.environ.get("ARCHIVER_SCRUB_MAX_MB_PER_PASS", "2048"))
+ARCHIVER_SCRUB_WORKERS = int(os.environ.get("ARCHIVER_SCRUB_WORKERS", "2"))
+ARCHIVER_SCRUB_DEEP = os.environ.get("ARCHIVER_SCRUB_DEEP", "false").lower() == "true"  # Decompress instead of hashing the .xz
+
+# Cold tier (coldstore.py): offload verified archives to an object store, then prune local copies
+ARCHIVER_COLD_URL = os.environ.get("ARCHIVER_COLD_URL", "")  # s3://bucket/prefix or a directory; empty disables the tier
+ARCHIVER_COLD_ENDPOINT = os.environ.get("ARCHIVER_COLD_ENDPOINT", "")  # S3-compatible endpoint (MinIO, R2, ...); empty = AWS
+ARCHIVER_COLD_WORKERS = int(os.environ.get("ARCHIVER_COLD_WORKERS", "4"))  # Archives uploaded in parallel
+ARCHIVER_COLD_PART_MB = int(os.environ.get("ARCHIVER_COLD_PART_MB", "16"))  # Multipart chunk size
+ARCHIVER_COLD_PART_CONCURRENCY = int(os.environ.get("ARCHIVER_COLD_PART_CONCURRENCY", "4"))  # Parts in flight per archive
+ARCHIVER_COLD_VERIFY = os.environ.get("ARCHIVER_COLD_VERIFY", "download")  # download: re-read and hash; head: size + stored hash
+ARCHIVER_COLD_KEEP_DAYS = int(os.environ.get("ARCHIVER_COLD_KEEP_DAYS", "30"))  # Local copies of offloaded archives kept this long
+ARCHIVER_COLD_MAX_LOCAL_MB = float(os.environ.get("ARCHIVER_COLD_MAX_LOCAL_MB", "0"))  # Prune oldest offloaded archives above this; 0 = no limit
+
 # Resolve WS_DIR_PATH from env or fallback to ./ws_data
 WS_DIR_PATH = Path(os.environ.get("WS_DIR_PATH", os.path.abspath("ws_data")))
 
@@ -30,12 +65,46 @@ logging.basicConfig(
 
 CHUNK_SIZE = 4 * 1024 * 1024  # 4 MiB
 
+# Flush latency files the ingest processes publish next to their pid files
+ARCHIVER_PRESSURE_DIR = Path(os.environ.get("ARCHIVER_PRESSURE_DIR", str(WS_DIR_PATH / "run")))
+budget = IOBudget(
+    read_bps=ARCHIVER_READ_MBPS * 1024 * 1024,
+    write_bps=ARCHIVER_WRITE_MBPS * 1024 * 1024,
+    cpu_share=ARCHIVER_CPU_SHARE,
+    pressure=WriterPressure(ARCHIVER_PRESSURE_DIR, ratio=ARCHIVER_BACKOFF_RATIO, max_ms=ARCHIVER_BACKOFF_MAX_MS)
+    if ARCHIVER_BACKOFF_ENABLED else None,
+)
+
+SCRUB_DIR = WS_DIR_PATH / "scrub"
+SCRUB_STATE_FILE = SCRUB_DIR / "state.json"  # Per-archive last verification, so passes resume
+SCRUB_STATUS_FILE = SCRUB_DIR / "status.json"  # Totals for monitor.py
+
+COLD_DIR = WS_DIR_PATH / "cold"
+COLD_STATE_FILE = COLD_DIR / "state.json"  # Per-archive upload record, so passes resume
+COLD_STATUS_FILE = COLD_DIR / "status.json"
+cold_store = None
+if ARCHIVER_COLD_URL:
+    try:
+        cold_store = store_from_url(
+            ARCHIVER_COLD_URL, ARCHIVER_COLD_ENDPOINT or None, part_size=ARCHIVER_COLD_PART_MB * 1024 * 1024,
+            workers=ARCHIVER_COLD_PART_CONCURRENCY,
+            connections=ARCHIVER_COLD_WORKERS * ARCHIVER_COLD_PART_CONCURRENCY + 2,
+        )
+    except ImportError as e:
+        logging.error(f"Cold tier disabled: {e}")
+
+# On-demand profiling: SIGUSR1 toggles the stack sampler, SIGUSR2 the hash/compress/verify spans
+ARCHIVER_PROFILE_DIR = Path(os.environ.get("ARCHIVER_PROFILE_DIR", str(WS_DIR_PATH / "profiles")))
+sampler = StackSampler(ARCHIVER_PROFILE_DIR, "archiver")
+tracer = SpanRecorder(ARCHIVER_PROFILE_DIR, "archiver", capacity=10000,
+                      enabled=os.environ.get("ARCHIVER_TRACE", "false").lower() == "true")
+
 
 def _now():
     return datetime.now(timezone.utc)
 
 
-def compute_sha256(path: Path) -> Tuple[str, int]:
+def compute_sha256(path: Path, budget: Optional[IOBudget] = None) -> Tuple[str, int]:
     h = hashlib.sha256()
     total = 0
     with path.open("rb") as f:
@@ -43,6 +112,8 @@ def compute_sha256(path: Path) -> Tuple[str, int]:
             b = f.read(CHUNK_SIZE)
             if not b:
                 break
+            if budget:
+                budget.read(len(b))
             h.update(b)
             total += len(b)
     return h.hexdigest(), total
@@ -76,25 +147,29 @@ def parse_hash_file(hash_file: Path) -> Optional[Tuple[str, int]]:
         return None
 
 
-def compress_xz(src_path: Path, dst_tmp_path: Path, level: int = 9) -> None:
-    # Stream compression to tmp file
-    with src_path.open("rb") as fin, lzma.open(dst_tmp_path, "wb", preset=level, check=lzma.CHECK_CRC64) as fout:
+def compress_xz(src_path: Path, dst_tmp_path: Path, level: int = 9, budget: Optional[IOBudget] = None) -> None:
+    # Stream compression to tmp file; the compressor is driven by hand so every chunk is charged to the budget
+    compressor = lzma.LZMACompressor(format=lzma.FORMAT_XZ, check=lzma.CHECK_CRC64, preset=level)
+    with src_path.open("rb") as fin, dst_tmp_path.open("wb") as fout:
         while True:
             b = fin.read(CHUNK_SIZE)
             if not b:
                 break
-            fout.write(b)
+            if budget:
+                budget.read(len(b))
+            out = compressor.compress(b)
+            fout.write(out)
+            if budget:
+                budget.write(len(out))
+        fout.write(compressor.flush())
         fout.flush()
-        # lzma handles its own checksums, but still fsync file descriptor
-        fout_fd = getattr(fout, "fileno", None)
-        if callable(fout_fd):
-            os.fsync(fout.fileno())
+        os.fsync(fout.fileno())
 
 
-def verify_archive(archive_path: Path, expected_hash_hex: str) -> bool:
+def verify_archive(archive_path: Path, expected_hash_hex: str, budget: Optional[IOBudget] = None) -> bool:
     h = hashlib.sha256()
     try:
-        with lzma.open(archive_path, "rb") as fin:
+        with archive_path.open("rb") as raw, lzma.open(ThrottledReader(raw, budget) if budget else raw, "rb") as fin:
             while True:
                 b = fin.read(CHUNK_SIZE)
                 if not b:
@@ -190,17 +265,20 @@ def process_file(src_jsonl_path: Path) -> str:
             parsed = parse_hash_file(jsonl_hash_path)
             if not parsed:
                 # re-compute if parse failed
-                hex_digest, size_bytes = compute_sha256(src_jsonl_path)
+                with tracer.span("hash"):
+                    hex_digest, size_bytes = compute_sha256(src_jsonl_path, budget)
                 write_hash_file(src_jsonl_path, hex_digest, size_bytes)
             else:
                 hex_digest, _size_bytes = parsed
 
         # If archive already exists, verify and delete original if valid
         if xz_path.exists():
-            if verify_archive(xz_path, hex_digest):
+            with tracer.span("verify"):
+                verified = verify_archive(xz_path, hex_digest, budget)
+            if verified:
                 # ensure we have an archive hash manifest (optional informational)
                 if not xz_hash_path.exists():
-                    arch_hex, arch_size = compute_sha256(xz_path)
+                    arch_hex, arch_size = compute_sha256(xz_path, budget)
                     write_hash_file(xz_path, arch_hex, arch_size)
                 # delete original jsonl
                 safe_remove(src_jsonl_path)
@@ -214,14 +292,17 @@ def process_file(src_jsonl_path: Path) -> str:
                 return "FAILED"
 
         # Create archive
-        compress_xz(src_jsonl_path, xz_tmp_path, level=ARCHIVER_COMPRESSION_LEVEL)
+        with tracer.span("compress"):
+            compress_xz(src_jsonl_path, xz_tmp_path, level=ARCHIVER_COMPRESSION_LEVEL, budget=budget)
         # Atomic rename
         os.replace(xz_tmp_path, xz_path)
 
         # Verify archive
-        if verify_archive(xz_path, hex_digest):
+        with tracer.span("verify"):
+            verified = verify_archive(xz_path, hex_digest, budget)
+        if verified:
             # Write archive hash manifest (informational)
-            arch_hex, arch_size = compute_sha256(xz_path)
+            arch_hex, arch_size = compute_sha256(xz_path, budget)
             write_hash_file(xz_path, arch_hex, arch_size)
             # Delete original
             safe_remove(src_jsonl_path)
@@ -245,12 +326,304 @@ def run_once() -> None:
     LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
     files = list_eligible_files(ws, ARCHIVER_UNCOMPRESSED_DAYS, ARCHIVER_MIN_AGE_MINUTES)
+    if budget.pressure:
+        budget.pressure.observe_idle()  # Writer latency before we add any load is the baseline
     logging.info(f"Archiver scan: ws_dir={ws} eligible_files={len(files)} keep_days={ARCHIVER_UNCOMPRESSED_DAYS} min_age_minutes={ARCHIVER_MIN_AGE_MINUTES}")
     for p in files:
         start = time.time()
         result = process_file(p)
         elapsed = int((time.time() - start) * 1000)
         logging.info(f"Archiver processed file={p.name} result={result} elapsed_ms={elapsed}")
+    if files:
+        pressure = budget.pressure
+        logging.info(
+            f"Archiver budget: throttled_s={budget.throttled:.1f}"
+            + (f" backoffs={pressure.backoffs} paused_s={pressure.paused:.0f}"
+               f" writer_baseline_ms={pressure.baseline_ms or 0:.1f}" if pressure else "")
+        )
+
+
+def scrub_archive(xz_path: Path, deep: bool = False, budget: Optional[IOBudget] = None) -> Tuple[str, str]:
+    """
+    Re-check one archive. Returns (status, detail), status one of 'ok', 'corrupt', 'unverifiable'.
+
+    The .xz.sha256 manifest is checked by hashing the compressed file, which
+    reads only the archive; deep mode (or a missing .xz manifest) decompresses
+    it and compares against the original's .jsonl.sha256.
+    """
+    xz_manifest = parse_hash_file(xz_path.with_suffix(xz_path.suffix + ".sha256"))
+    if xz_manifest and not deep:
+        expected_hex, expected_size = xz_manifest
+        size = xz_path.stat().st_size
+        if size != expected_size:
+            return "corrupt", f"size {size} != {expected_size} in manifest"  # Truncated, no need to read it
+        actual_hex, _ = compute_sha256(xz_path, budget)
+        if actual_hex != expected_hex:
+            return "corrupt", "archive hash mismatch"
+        return "ok", ""
+    original_manifest = parse_hash_file(xz_path.with_suffix(".sha256"))
+    if not original_manifest:
+        return "unverifiable", "no manifest"
+    if not verify_archive(xz_path, original_manifest[0], budget):
+        return "corrupt", "content hash mismatch or unreadable archive"
+    return "ok", ""
+
+
+def scrub_pack_file(path: Path, expected: Optional[Tuple[str, int]],
+                    budget: Optional[IOBudget] = None) -> Tuple[str, str]:
+    """Re-check a pack or pack manifest against its recorded (sha256, size)."""
+    if not expected:
+        return "unverifiable", "no manifest"
+    expected_hex, expected_size = expected
+    size = path.stat().st_size
+    if size != expected_size:
+        return "corrupt", f"size {size} != {expected_size} in manifest"
+    actual_hex, _ = compute_sha256(path, budget)
+    if actual_hex != expected_hex:
+        return "corrupt", "pack hash mismatch"
+    return "ok", ""
+
+
+def pack_files(pack_dir: Path) -> dict:
+    """
+    {'packs/<month>/<file>': (path, (sha256, size) or None)} for every
+    monthly pack manifest (checked against manifest.json.sha256) and every
+    pack it lists (checked against the hash recorded in the manifest).
+    """
+    files = {}
+    for manifest in sorted(pack_dir.glob("*/manifest.json")):
+        month = manifest.parent.name
+        sidecar = manifest.with_name("manifest.json.sha256")
+        files[f"packs/{month}/manifest.json"] = (manifest, parse_hash_file(sidecar) if sidecar.exists() else None)
+        try:
+            packs = json.loads(manifest.read_text(encoding="utf-8"))["packs"]
+        except (OSError, ValueError, KeyError, TypeError):
+            continue  # The manifest's own check reports it
+        for pack in packs.values():
+            files[f"packs/{month}/{pack['file']}"] = (manifest.parent / pack["file"], (pack["sha256"], pack["size"]))
+    return files
+
+
+def load_scrub_state(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_json(path: Path, data) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".part")
+    tmp.write_text(json.dumps(data, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def scrub_pass(ws_dir_path: Path = WS_DIR_PATH, state_path: Path = SCRUB_STATE_FILE,
+               status_path: Path = SCRUB_STATUS_FILE, interval_days: float = ARCHIVER_SCRUB_INTERVAL_DAYS,
+               max_bytes: float = ARCHIVER_SCRUB_MAX_MB_PER_PASS * 1024 * 1024,
+               workers: int = ARCHIVER_SCRUB_WORKERS, deep: bool = ARCHIVER_SCRUB_DEEP,
+               budget: Optional[IOBudget] = None, pack_dir: Optional[Path] = None) -> dict:
+    """
+    Verify the archives that are due (never checked, changed, or last checked
+    more than interval_days ago), least recently verified first, stopping at
+    max_bytes of archives per pass. Monthly packs and their manifests are in
+    the same rotation. Returns the status written to status_path.
+    """
+    state = load_scrub_state(state_path)
+    now = time.time()
+    packs = pack_files(pack_dir if pack_dir is not None else ws_dir_path / "packs")  # packs.py's PACK_DIR
+    archives = {}
+    for name, p in [(p.name, p) for p in ws_dir_path.glob("*.xz")] + [(n, p) for n, (p, _e) in packs.items()]:
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            if name in packs:
+                archives[name] = (p, 0, 0.0)  # Listed in its manifest but gone: due, and reported corrupt
+            continue
+        archives[name] = (p, st.st_size, st.st_mtime)
+    for name in [n for n in state if n not in archives]:
+        del state[name]  # Removed or repacked since the last pass
+
+    due = []
+    for name, (p, size, mtime) in archives.items():
+        entry = state.get(name)
+        if entry and (entry["size"], entry["mtime"]) != (size, mtime):
+            del state[name]  # Replaced since it was verified
+            entry = None
+        verified_at = entry["verified_at"] if entry else 0.0
+        if now - verified_at >= interval_days * 86400:
+            due.append((verified_at, name))
+    due.sort()
+
+    batch, batch_bytes = [], 0
+    for _verified_at, name in due:
+        if batch and batch_bytes + archives[name][1] > max_bytes:
+            break
+        batch.append(name)
+        batch_bytes += archives[name][1]
+
+    verified_bytes = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(scrub_pack_file, archives[name][0], packs[name][1], budget) if name in packs
+            else pool.submit(scrub_archive, archives[name][0], deep, budget): name
+            for name in batch
+        }
+        for n, future in enumerate(as_completed(futures), 1):
+            name = futures[future]
+            p, size, mtime = archives[name]
+            try:
+                status, detail = future.result()
+            except Exception as e:
+                status, detail = "corrupt", f"unreadable: {e}"
+            state[name] = {"verified_at": time.time(), "size": size, "mtime": mtime, "status": status}
+            verified_bytes += size
+            marker = p.with_suffix(p.suffix + ".corrupt")
+            if status == "corrupt":
+                marker.write_text(f"{_now().isoformat()} {detail}\n", encoding="utf-8")
+                logging.error(f"Scrub: corrupt archive file={name} reason={detail}")
+            elif status == "ok":
+                safe_remove(marker)
+            else:
+                logging.warning(f"Scrub: cannot verify file={name} reason={detail}")
+            if n % 20 == 0:
+                write_json(state_path, state)  # Resume point if the pass is interrupted
+    write_json(state_path, state)
+
+    verified = [e["verified_at"] for e in state.values()]
+    status = {
+        "updated_at": time.time(),
+        "archives": len(archives),
+        "pack_files": len(packs),
+        "checked_this_pass": len(batch),
+        "checked_bytes_this_pass": verified_bytes,
+        "overdue": len(due) - len(batch),
+        "never_verified": len(archives) - len(verified),
+        "corrupt": sorted(name for name, e in state.items() if e["status"] == "corrupt"),
+        "unverifiable": sorted(name for name, e in state.items() if e["status"] == "unverifiable"),
+        "oldest_verified_at": min(verified) if verified else None,
+    }
+    write_json(status_path, status)
+    logging.info(
+        f"Scrub pass: checked={len(batch)} bytes={verified_bytes} overdue={status['overdue']} "
+        f"corrupt={len(status['corrupt'])} archives={len(archives)}"
+    )
+    return status
+
+
+def archive_day(xz_path: Path):
+    """Date in price_data[_<shard>]_YYYY-MM-DD.jsonl.xz, else the file's mtime date."""
+    try:
+        return datetime.strptime(xz_path.name.split("_")[-1].split(".")[0], "%Y-%m-%d").date()
+    except ValueError:
+        return datetime.fromtimestamp(xz_path.stat().st_mtime, timezone.utc).date()
+
+
+def offload_archive(xz_path: Path, store, verify: str = ARCHIVER_COLD_VERIFY,
+                    budget: Optional[IOBudget] = None) -> dict:
+    """Upload one verified archive and its manifests, then check the stored copy; returns its state entry."""
+    manifest = parse_hash_file(xz_path.with_suffix(xz_path.suffix + ".sha256"))
+    if not manifest:
+        raise ValueError("no .sha256 manifest")
+    expected_hex, expected_size = manifest
+    if xz_path.stat().st_size != expected_size:
+        raise ValueError(f"size {xz_path.stat().st_size} != manifest {expected_size}")
+    key = archive_key(xz_path.name)
+    with tracer.span("upload"):
+        store.upload(xz_path, key, expected_hex, budget)
+    for sidecar in (xz_path.with_suffix(xz_path.suffix + ".sha256"), xz_path.with_suffix(".sha256")):
+        if sidecar.exists():
+            store.upload(sidecar, archive_key(sidecar.name), file_sha256(sidecar)[0])
+
+    head = store.head(key)
+    if not head or head["size"] != expected_size or head.get("sha256") != expected_hex:
+        raise IOError(f"stored object {key} does not match the manifest: {head}")
+    if verify == "download":
+        with tracer.span("verify_upload"):
+            actual_hex, actual_size = store.hash(key, budget)
+        if (actual_hex, actual_size) != (expected_hex, expected_size):
+            raise IOError(f"stored object {key} hashes to {actual_hex} ({actual_size} bytes)")
+    return {"key": key, "size": expected_size, "sha256": expected_hex, "uploaded_at": time.time()}
+
+
+def offload_pass(store, ws_dir_path: Path = WS_DIR_PATH, state_path: Path = COLD_STATE_FILE,
+                 status_path: Path = COLD_STATUS_FILE, keep_days: int = ARCHIVER_COLD_KEEP_DAYS,
+                 max_local_bytes: float = ARCHIVER_COLD_MAX_LOCAL_MB * 1024 * 1024,
+                 workers: int = ARCHIVER_COLD_WORKERS, verify: str = ARCHIVER_COLD_VERIFY,
+                 budget: Optional[IOBudget] = None) -> dict:
+    """
+    Upload the archives not yet in the cold tier (skipping corrupt or
+    unmanifested ones), then delete local .xz files that are safely stored
+    and older than keep_days, and, oldest first, more while the local
+    archives exceed max_local_bytes. Manifests stay local for the reader.
+    """
+    state = load_scrub_state(state_path)
+    archives = {}
+    for p in ws_dir_path.glob("*.jsonl.xz"):
+        try:
+            archives[p.name] = (p, p.stat().st_size)
+        except FileNotFoundError:
+            continue
+
+    todo = [
+        p for name, (p, size) in sorted(archives.items())
+        if (name not in state or state[name]["size"] != size)
+        and not p.with_suffix(p.suffix + ".corrupt").exists()
+    ]
+    uploaded_bytes, failed = 0, []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(offload_archive, p, store, verify, budget): p.name for p in todo}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                state[name] = future.result()
+                uploaded_bytes += state[name]["size"]
+                logging.info(f"Cold tier: uploaded file={name} key={state[name]['key']}")
+            except Exception as e:
+                failed.append(name)
+                logging.error(f"Cold tier: upload failed file={name} reason={e}")
+            write_json(state_path, state)
+
+    # Prune: only archives whose stored copy is still there and unchanged
+    cutoff = _now().date() - timedelta(days=keep_days)
+    local = sorted((archive_day(p), name) for name, (p, _size) in archives.items())
+    local_bytes = sum(size for _p, size in archives.values())
+    pruned, pruned_bytes = [], 0
+    for day, name in local:
+        p, size = archives[name]
+        entry = state.get(name)
+        if not entry or entry["size"] != size:
+            continue
+        if day >= cutoff and not (max_local_bytes and local_bytes > max_local_bytes):
+            continue
+        head = store.head(entry["key"])
+        if not head or head["size"] != size or head.get("sha256") != entry["sha256"]:
+            logging.error(f"Cold tier: stored copy of file={name} is missing or changed; keeping the local one")
+            del state[name]
+            continue
+        safe_remove(p)
+        pruned.append(name)
+        pruned_bytes += size
+        local_bytes -= size
+    write_json(state_path, state)
+
+    status = {
+        "updated_at": time.time(),
+        "uploaded_this_pass": len(todo) - len(failed),
+        "uploaded_bytes_this_pass": uploaded_bytes,
+        "failed": sorted(failed),
+        "pruned_this_pass": len(pruned),
+        "pruned_bytes_this_pass": pruned_bytes,
+        "local_archives": len(archives) - len(pruned),
+        "local_bytes": local_bytes,
+        "offloaded_archives": len(state),
+    }
+    write_json(status_path, status)
+    logging.info(
+        f"Cold tier pass: uploaded={status['uploaded_this_pass']} bytes={uploaded_bytes} failed={len(failed)} "
+        f"pruned={len(pruned)} pruned_bytes={pruned_bytes} local_bytes={local_bytes}"
+    )
+    return status
 
 
 def main_loop() -> None:
@@ -263,12 +636,33 @@ def main_loop() -> None:
             run_once()
         except Exception as e:
             logging.error(f"Archiver run_once error: {e}")
+        if ARCHIVER_SCRUB_ENABLED:
+            try:
+                scrub_pass(budget=budget)
+            except Exception as e:
+                logging.error(f"Archiver scrub error: {e}")
+        if cold_store:
+            try:
+                offload_pass(cold_store, budget=budget)
+            except Exception as e:
+                logging.error(f"Archiver cold tier error: {e}")
         time.sleep(ARCHIVER_SCAN_INTERVAL_SECONDS)
 
 
 if __name__ == "__main__":
+    install_signal_handlers(sampler, tracer)
+    lower_priority(ARCHIVER_NICE, ARCHIVER_IONICE_IDLE)
+    if "--scrub" in sys.argv[1:]:
+        # One scrub pass only, e.g. from cron: python archiver.py --scrub
+        scrub_pass(budget=budget)
+    elif "--offload" in sys.argv[1:]:
+        # One cold tier pass only: python archiver.py --offload
+        if cold_store:
+            offload_pass(cold_store, budget=budget)
+        else:
+            logging.error("--offload needs ARCHIVER_COLD_URL")
     # One-shot if ARCHIVER_SCAN_INTERVAL_SECONDS <= 0, else loop
-    if ARCHIVER_SCAN_INTERVAL_SECONDS <= 0:
+    elif ARCHIVER_SCAN_INTERVAL_SECONDS <= 0:
         run_once()
     else:
         main_loop()
@@ -0,0 +1,302 @@
+import heapq
+import json
+import logging
+import lzma
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from iobudget import TokenBucket
+from segments import archived_segments, writable_segment
+
+KLINE_PAGE_LIMIT = 1000  # Bybit returns at most 1000 candles per request
+TRADE_PAGE_LIMIT = {'spot': 60}  # ...and only the most recent public trades, 1000 outside spot, with no paging
+RATE_LIMIT_CODES = (10006, 10018)  # "Too many visits" / IP rate limit
+TIMESTAMP_RE = re.compile(r'"timestamp": "([^"]+)"')
+
+
+def make_http(testnet: bool = False, endpoint: Optional[str] = None):
+    """Build a pybit HTTP session, optionally pointed at another base URL (e.g. a local stand-in)."""
+    from pybit.unified_trading import HTTP
+
+    # Hand rate-limit responses back to the worker instead of letting pybit sleep
+    # inside the request (it would block a pool thread and bypass our bucket)
+    session = HTTP(testnet=testnet, retry_codes={10002}, ignore_codes=set(RATE_LIMIT_CODES))
+    if endpoint:
+        session.endpoint = endpoint.rstrip('/')
+    return session
+
+
+def iso_from_ms(ms: int) -> str:
+    # Same local, naive ISO format main.py writes for live entries
+    return datetime.fromtimestamp(int(ms) / 1000).isoformat()
+
+
+def entry_key(entry: dict):
+    full = entry.get('full_data') or {}
+    data = full.get('data') or {}
+    return full.get('topic'), full.get('ts'), data.get('execId')
+
+
+def merged_lines(paths):
+    """Lines of several timestamp-ordered files (a live day file and its backfill segment), interleaved by timestamp."""
+    def keyed(path):
+        with Path(path).open('r') as f:
+            for line in f:
+                match = TIMESTAMP_RE.search(line)
+                yield (match.group(1) if match else ''), line
+
+    for _ts, line in heapq.merge(*(keyed(p) for p in paths if Path(p).exists()), key=lambda item: item[0]):
+        yield line
+
+
+class BackfillWorker:
+    """
+    Fills gap intervals from Bybit's REST API after a reconnect.
+
+    For each gap it fetches 1m klines, recent public trades and (when it falls
+    inside the gap) the current ticker, with a bounded thread pool and a shared
+    token bucket. Results go to a per-day backfill segment next to the live
+    day file ({prefix}_backfill_{day}.jsonl), sorted by timestamp; readers
+    interleave the two with merged_lines(). A gap record's category and
+    file_prefix (written by the shard that saw it) override the defaults.
+
+    Bybit's REST trade history is only the most recent page, so trades are
+    missing for the part of an older gap before the oldest trade returned
+    (counted in stats['trades_truncated']); the klines still cover it.
+
+    Backfill rows keep Bybit's REST payloads (kline, trade or ticker fields,
+    type 'backfill'); TICK_SCHEMA projection and the journal only apply to
+    live ticks.
+    """
+
+    def __init__(self, http=None, data_dir=None, category: str = "linear", max_workers: int = 4,
+                 rate_per_sec: float = 10.0, file_prefix: str = "price_data", max_retries: int = 5):
+        self.http = http
+        self.data_dir = Path(data_dir) if data_dir else Path(os.path.abspath('ws_data'))
+        self.category = category
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate_per_sec, burst=max(rate_per_sec, 1.0))
+        self.lock = threading.Lock()  # Serializes rewrites of the backfill segments
+        self.file_prefix = file_prefix
+        self.max_retries = max_retries
+        self.queue = queue.Queue()
+        self.thread = None
+        self.stopped = threading.Event()
+        self.stats = {'gaps': 0, 'requests': 0, 'rate_limited': 0, 'merged': 0, 'failed': 0, 'trades_truncated': 0}
+
+    # --- REST access -----------------------------------------------------
+
+    def call(self, method: str, **params) -> dict:
+        """Call a pybit HTTP method with rate limiting and retry on rate-limit errors."""
+        delay = 1.0
+        for attempt in range(1, self.max_retries + 1):
+            self.bucket.consume(1)
+            self.stats['requests'] += 1
+            try:
+                response = getattr(self.http, method)(**params)
+            except Exception as e:
+                # pybit raises on non-zero retCode; the code is in the message
+                rate_limited = any(str(code) in str(e) for code in RATE_LIMIT_CODES) or 'Too many' in str(e)
+                if attempt == self.max_retries:
+                    raise
+                if rate_limited:
+                    self.stats['rate_limited'] += 1
+                    self.bucket.pause(delay)
+                logging.warning(f"Backfill {method} failed (attempt {attempt}/{self.max_retries}): {str(e)}")
+                time.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            if response.get('retCode', 0) in RATE_LIMIT_CODES:
+                self.stats['rate_limited'] += 1
+                self.bucket.pause(delay)
+                time.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            return response
+        raise RuntimeError(f"Backfill {method} gave up after {self.max_retries} attempts")
+
+    def fetch_klines(self, symbol: str, start_ms: int, end_ms: int, category: str) -> list:
+        entries = []
+        cursor = start_ms
+        while cursor <= end_ms:
+            page_end = min(end_ms, cursor + KLINE_PAGE_LIMIT * 60_000 - 1)
+            response = self.call('get_kline', category=category, symbol=symbol, interval="1",
+                                 start=cursor, end=page_end, limit=KLINE_PAGE_LIMIT)
+            for row in response.get('result', {}).get('list', []):
+                start = int(row[0])
+                if not start_ms <= start <= end_ms:
+                    continue
+                data = {
+                    'symbol': symbol,
+                    'start': start,
+                    'open': row[1],
+                    'high': row[2],
+                    'low': row[3],
+                    'close': row[4],
+                    'volume': row[5],
+                    'turnover': row[6],
+                }
+                entries.append(self.make_entry(f'kline.1.{symbol}', start, float(row[4]), data))
+            cursor = page_end + 1
+        return entries
+
+    def fetch_trades(self, symbol: str, start_ms: int, end_ms: int, category: str) -> list:
+        limit = TRADE_PAGE_LIMIT.get(category, 1000)
+        response = self.call('get_public_trade_history', category=category, symbol=symbol, limit=limit)
+        trades = response.get('result', {}).get('list', [])
+        entries = []
+        for trade in trades:
+            ts = int(trade['time'])
+            if start_ms <= ts <= end_ms:
+                entries.append(self.make_entry(f'publicTrade.{symbol}', ts, float(trade['price']), trade))
+        oldest = min((int(trade['time']) for trade in trades), default=None)
+        if len(trades) >= limit and oldest > start_ms:
+            # A full page that starts inside the gap: older trades are out of the REST history's reach
+            self.stats['trades_truncated'] += 1
+            logging.warning(f"Backfill trades for {symbol} only reach back to {oldest}; "
+                            f"{start_ms}..{min(oldest, end_ms)} has klines but no trades")
+        return entries
+
+    def fetch_ticker(self, symbol: str, start_ms: int, end_ms: int, category: str) -> list:
+        response = self.call('get_tickers', category=category, symbol=symbol)
+        ts = int(response.get('time', 0))
+        if not start_ms <= ts <= end_ms:
+            return []
+        return [
+            self.make_entry(f'tickers.{symbol}', ts, float(ticker['lastPrice']), ticker)
+            for ticker in response.get('result', {}).get('list', [])
+        ]
+
+    def make_entry(self, topic: str, ts: int, price: float, data: dict) -> dict:
+        return {
+            'timestamp': iso_from_ms(ts),
+            'recv_ns': ts * 1_000_000,  # Backfill rows are placed at their exchange time
+            'price': price,
+            'full_data': {'topic': topic, 'type': 'backfill', 'ts': ts, 'data': data},
+        }
+
+    # --- Gap processing --------------------------------------------------
+
+    def backfill(self, gap: dict) -> int:
+        """Fetch and merge everything available for one gap; returns entries merged."""
+        symbol, start_ms, end_ms = gap['symbol'], int(gap['start_ms']), int(gap['end_ms'])
+        category = gap.get('category') or self.category
+        fetchers = (self.fetch_klines, self.fetch_trades, self.fetch_ticker)
+        entries = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(fetch, symbol, start_ms, end_ms, category) for fetch in fetchers]
+            for future in futures:
+                try:
+                    entries.extend(future.result())
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    logging.error(f"Backfill fetch failed for {symbol} {start_ms}..{end_ms}: {str(e)}")
+        merged = self.merge_entries(entries, gap.get('file_prefix') or self.file_prefix)
+        self.stats['gaps'] += 1
+        self.stats['merged'] += merged
+        logging.info(f"Backfilled gap for {symbol} {start_ms}..{end_ms}: fetched={len(entries)} merged={merged}")
+        return merged
+
+    def segment_path(self, day: str, file_prefix: Optional[str] = None) -> Path:
+        # <prefix>_backfill_<day>.jsonl: the date stays last, so the archiver and the readers pick it up
+        return self.data_dir / f'{file_prefix or self.file_prefix}_backfill_{day}.jsonl'
+
+    def merge_entries(self, entries: list, file_prefix: Optional[str] = None) -> int:
+        by_file = {}
+        for entry in entries:
+            by_file.setdefault(self.segment_path(entry['timestamp'][:10], file_prefix), []).append(entry)
+        merged = 0
+        for path, day_entries in by_file.items():
+            merged += self.merge_into_file(path, day_entries)
+        return merged
+
+    def merge_into_file(self, path: Path, entries: list) -> int:
+        """
+        Merge entries into a day's backfill segment, kept sorted by timestamp.
+
+        The segment only ever holds backfill rows, so rewriting it is cheap,
+        and the live day file (and its writer) is never touched. Once the
+        segment is archived, later rows go to its next _late segment.
+        """
+        with self.lock:
+            archived = archived_segments(path)
+            path = writable_segment(path)
+            tmp = path.with_suffix(path.suffix + '.part')
+            existing = []
+            if path.exists():
+                with path.open('r') as f:
+                    existing = [json.loads(line) for line in f if line.strip()]
+
+            # Skip anything already present from an earlier backfill of the same window
+            seen = {entry_key(entry) for entry in existing}
+            for xz in archived:
+                with lzma.open(xz, 'rt') as f:
+                    seen.update(entry_key(json.loads(line)) for line in f if line.strip())
+            entries = [e for e in entries if entry_key(e) not in seen]
+            if not entries:
+                return 0
+
+            with tmp.open('w') as out:
+                for entry in sorted(existing + entries, key=lambda e: e['timestamp']):
+                    json.dump(entry, out)
+                    out.write('\n')
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp, path)
+        return len(entries)
+
+    # --- Background operation -------------------------------------------
+
+    def submit(self, gap: dict) -> None:
+        self.queue.put(gap)
+
+    def start(self) -> None:
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.worker, name='backfill', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self.stopped.set()
+        self.queue.put(None)
+        if self.thread:
+            self.thread.join(timeout)
+
+    def worker(self) -> None:
+        while not self.stopped.is_set():
+            gap = self.queue.get()
+            if gap is None:
+                break
+            try:
+                self.backfill(gap)
+            except Exception as e:
+                self.stats['failed'] += 1
+                logging.error(f"Backfill error for gap {gap}: {str(e)}")
+
+
+if __name__ == "__main__":
+    # One-shot: backfill every gap in every shard's gap log, each under the category and prefix it was recorded with
+    from config import (BACKFILL_MAX_WORKERS, BACKFILL_RATE_LIMIT, BACKFILL_REST_ENDPOINT, CHANNEL_TYPE,
+                        GAP_LOG_FILE, TESTNET, WS_DIR_PATH)
+    from gaps import read_gaps
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    worker = BackfillWorker(
+        http=make_http(TESTNET, BACKFILL_REST_ENDPOINT),
+        data_dir=WS_DIR_PATH,
+        category=CHANNEL_TYPE,
+        max_workers=BACKFILL_MAX_WORKERS,
+        rate_per_sec=BACKFILL_RATE_LIMIT,
+    )
+    for gap_file in sorted(Path(GAP_LOG_FILE).parent.glob('*.jsonl')):
+        for gap in read_gaps(gap_file):
+            worker.backfill(gap)
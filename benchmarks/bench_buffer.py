@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory and allocations per buffered tick, list of dicts vs TickBuffer.
+
+Messages are shaped like pybit's ticker callback: a fresh top-level dict per
+update whose 'data' is pybit's merged per-topic dict, updated in place by
+each delta. Run: python benchmarks/bench_buffer.py [ticks]
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from tickbuffer import TickBuffer
+
+SNAPSHOT = {
+    "symbol": "BTCUSDT", "tickDirection": "PlusTick", "price24hPcnt": "0.017103", "lastPrice": "17216.00",
+    "prevPrice24h": "16926.50", "highPrice24h": "17281.50", "lowPrice24h": "16915.00", "prevPrice1h": "17238.00",
+    "markPrice": "17217.33", "indexPrice": "17227.36", "openInterest": "68744.761", "openInterestValue": "1183601235.91",
+    "turnover24h": "1570383121.943499", "volume24h": "91705.276", "nextFundingTime": "1673280000000",
+    "fundingRate": "-0.000212", "bid1Price": "17215.50", "bid1Size": "84.489", "ask1Price": "17216.00",
+    "ask1Size": "83.020", "preOpenPrice": "", "preQty": "", "curPreListingPhase": "",
+}
+
+
+def make_stream(n):
+    """Yield pybit-style callback messages: merged state mutated by small deltas."""
+    state = dict(SNAPSHOT)
+    for i in range(n):
+        # A typical delta touches a handful of fields with freshly parsed strings
+        price = f"{17216.0 + (i % 50) * 0.5:.2f}"
+        state["lastPrice"] = price
+        state["bid1Price"] = price
+        state["bid1Size"] = f"{80 + i % 7}.{i % 1000:03d}"
+        state["ask1Size"] = f"{81 + i % 5}.{i % 997:03d}"
+        message = {"topic": "tickers.BTCUSDT", "type": "snapshot", "data": state, "cs": 24987956059 + i,
+                   "ts": 1673272861686 + i * 100}
+        yield message
+
+
+def buffer_dicts(messages, copy_data):
+    buffer = []
+    for message in messages:
+        if copy_data:
+            # What the old code needed to be correct: pybit's data dict is shared and mutated
+            message = dict(message, data=dict(message["data"]))
+        buffer.append({
+            'timestamp': datetime.now().isoformat(),
+            'price': float(message['data']['lastPrice']),
+            'full_data': message,
+        })
+    return buffer
+
+
+def buffer_compact(messages, buffer):
+    for message in messages:
+        buffer.append(message, float(message['data']['lastPrice']))
+    return buffer
+
+
+def measure(label, fill, n):
+    messages = list(make_stream(n))
+
+    # Memory and live allocations retained by the buffer
+    gc.collect()
+    tracemalloc.start()
+    kept = fill(messages)
+    current, _peak = tracemalloc.get_traced_memory()
+    blocks = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+    del kept
+
+    # Speed and GC pressure without tracemalloc overhead
+    gc.collect()
+    gen0_before = gc.get_stats()[0]['collections']
+    start = time.perf_counter()
+    kept = fill(messages)
+    elapsed = time.perf_counter() - start
+    gen0 = gc.get_stats()[0]['collections'] - gen0_before
+    del kept
+
+    print(f"{label:<36} {current / n:>6.0f} B/tick {blocks / n:>5.1f} blocks/tick "
+          f"{elapsed / n * 1e9:>6.0f} ns/msg {gen0:>5} gen0 GCs")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"Buffering {n} ticker updates\n")
+    measure("list of dicts (aliased, as before)", lambda m: buffer_dicts(m, copy_data=False), n)
+    measure("list of dicts (with data copy)", lambda m: buffer_dicts(m, copy_data=True), n)
+
+    # Steady state: the pool is reused after every flush, so no records are allocated
+    pool = TickBuffer(n)
+
+    def refill(messages):
+        pool.clear()
+        return buffer_compact(messages, pool)
+
+    measure("TickBuffer (reused after flush)", refill, n)
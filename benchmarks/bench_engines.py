@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CPU per message of the two WebSocket engines (WS_ENGINE).
+
+A local mock of Bybit's v5 public stream (subscribe acks, pong, one
+snapshot then ticker deltas round-robin over 50 symbols) runs in its own
+process; each engine runs the real client in a fresh process, pointed at
+the mock, and reports messages per second and process CPU per message
+from the first delta to the last. Nothing leaves localhost.
+Run: python benchmarks/bench_engines.py [messages per connection] [connections]
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+SYMBOLS = [f'S{i}USDT' for i in range(50)]
+ENGINES = ('pybit', 'asyncio')
+
+
+def snapshot(symbol):
+    return {'symbol': symbol, 'lastPrice': '100.5', 'bid1Price': '100.4', 'bid1Size': '3', 'ask1Price': '100.6',
+            'ask1Size': '2', 'markPrice': '100.5', 'indexPrice': '100.5', 'volume24h': '1', 'turnover24h': '1',
+            'openInterest': '1', 'fundingRate': '0.0001', 'nextFundingTime': '1'}
+
+
+def serve(port, n):
+    """Mock server: once a connection has subscribed every symbol, stream n deltas to it."""
+    from websockets.asyncio.server import serve as ws_serve
+    from websockets.exceptions import ConnectionClosed
+
+    async def handler(ws):
+        try:
+            await stream(ws)
+        except ConnectionClosed:
+            pass  # The client exits as soon as it has counted every message
+
+    async def stream(ws):
+        async for raw in ws:
+            request = json.loads(raw)
+            if request['op'] == 'ping':
+                await ws.send(json.dumps({'success': True, 'ret_msg': 'pong', 'op': 'ping'}))
+                continue
+            await ws.send(json.dumps({'success': True, 'ret_msg': '', 'op': 'subscribe',
+                                      'req_id': request.get('req_id')}))
+            if request['args'][-1] != f'tickers.{SYMBOLS[-1]}':
+                continue
+            for symbol in SYMBOLS:
+                await ws.send(json.dumps({'topic': f'tickers.{symbol}', 'type': 'snapshot', 'cs': 1, 'ts': 1,
+                                          'data': snapshot(symbol)}))
+            for i in range(n):
+                symbol = SYMBOLS[i % len(SYMBOLS)]
+                await ws.send(json.dumps({'topic': f'tickers.{symbol}', 'type': 'delta', 'cs': 2 + i,
+                                          'ts': int(time.time() * 1000),
+                                          'data': {'symbol': symbol, 'lastPrice': f'{100 + i % 7}.5',
+                                                   'bid1Price': '100.4', 'bid1Size': str(i % 9)}}))
+
+    async def run():
+        async with ws_serve(handler, '127.0.0.1', port, compression=None):
+            await asyncio.Future()
+
+    asyncio.run(run())
+
+
+def client(engine, connections, port, n):
+    """One engine against the mock, run with its data directory as cwd; prints a result line and exits."""
+    import main
+    import pybit.unified_trading
+
+    pybit.unified_trading.PUBLIC_WSS = f'ws://127.0.0.1:{port}/v5/public/{{CHANNEL_TYPE}}'
+    settings = dict(
+        BACKFILL_ENABLED=False, STATS_METRICS_PORT=0, HEALTH_PORT=0, WS_ENGINE=engine, WS_CONNECTIONS=connections,
+        WS_URL=f'ws://127.0.0.1:{port}/v5/public/linear', WS_STALE_TIMEOUT=600, SYMBOLS=SYMBOLS,
+    )
+    for name, value in settings.items():
+        setattr(main, name, value)
+    ingester = main.BybitWebSocketClient()
+    target = connections * n
+    deltas = itertools.count(1)  # next() is atomic, so pybit's per-connection threads can share it
+    marks = {}
+    handle_ticker = ingester.handle_ticker
+
+    def timed_handle_ticker(message, source=0):
+        # The window runs from the first delta to the last, whichever engine thread sees them. pybit hands
+        # merged tickers on as 'snapshot', so deltas are told apart by the mock's cs (snapshots are cs 1)
+        if message.get('cs', 1) < 2:
+            return handle_ticker(message, source)
+        seen = next(deltas)
+        if seen == 1:
+            marks['start'] = time.perf_counter(), time.process_time()
+        handle_ticker(message, source)
+        if seen == target:
+            marks['end'] = time.perf_counter(), time.process_time()
+
+    ingester.handle_ticker = timed_handle_ticker
+
+    async def run():
+        asyncio.get_running_loop().create_task(ingester.run())
+        deadline = time.monotonic() + 300
+        while 'end' not in marks:
+            if time.monotonic() > deadline:
+                print(f"{engine}: only {next(deltas) - 1} of {target} deltas arrived", flush=True)
+                os._exit(1)
+            await asyncio.sleep(0.05)
+        wall = marks['end'][0] - marks['start'][0]
+        cpu = marks['end'][1] - marks['start'][1]
+        print(f"{engine:<8} {connections:>5} {target:>9} {target / wall:>10,.0f} {cpu / target * 1e6:>10.1f} "
+              f"{threading.active_count():>8}", flush=True)
+        os._exit(0)  # Skip the shutdown path; only the measurement matters here
+
+    asyncio.run(run())
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['--serve']:
+        serve(int(sys.argv[2]), int(sys.argv[3]))
+    elif sys.argv[1:2] == ['--client']:
+        client(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5]))
+    else:
+        n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+        connections = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        script = os.path.abspath(__file__)
+        print(f"{n} ticker deltas per connection over {len(SYMBOLS)} symbols\n")
+        print(f"{'engine':<8} {'conns':>5} {'messages':>9} {'msg/s':>10} {'us CPU/msg':>10} {'threads':>8}")
+        results = {}
+        for engine in ENGINES:
+            port = free_port()
+            server = subprocess.Popen([sys.executable, script, '--serve', str(port), str(n)])
+            # ws_data/, logs, gaps and pid files land in a throwaway cwd, ticker tables next to them
+            with tempfile.TemporaryDirectory(prefix=f'bench-{engine}-') as data_dir:
+                env = dict(os.environ, TICKER_TABLE_DIR=os.path.join(data_dir, 'tickers'))
+                for name in ('SPOOL_DIR', 'PUBSUB_SOCKET_DIR'):
+                    env.pop(name, None)
+                try:
+                    time.sleep(1.0)  # Let the mock bind
+                    out = subprocess.run([sys.executable, script, '--client', engine, str(connections), str(port),
+                                          str(n)], cwd=data_dir, env=env, check=True, timeout=600,
+                                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+                finally:
+                    server.terminate()
+                    server.wait()
+            print(out, end='')
+            results[engine] = int(out.split()[2])
+        # CPU per message only compares like with like if both engines handled the whole workload
+        assert len(set(results.values())) == 1, f"engines processed different message counts: {results}"
@@ -0,0 +1,316 @@
+"""
+Cold tier for the daily archives: an S3-compatible object store.
+
+archiver.py uploads verified .xz archives and their .sha256 manifests
+(offload_pass), checks every upload against the manifest and then prunes
+local copies past the age and size limits. ArchiveReader opens an archive
+wherever it currently is: in ws_data/, in its local read cache, or fetched
+from the store on demand.
+
+Objects are keyed <YYYY-MM>/<file name>. S3Store uses boto3 (imported
+only when an s3:// URL is configured) and works with any S3-compatible
+endpoint (MinIO, R2, ...); LocalStore keeps objects in a directory with
+the same concurrent multipart upload.
+"""
+
+import hashlib
+import json
+import lzma
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+CHUNK_SIZE = 4 * 1024 * 1024
+DAY = re.compile(r'_(\d{4}-\d{2})-\d{2}\.')
+
+
+def archive_key(name: str) -> str:
+    """price_data_linear-0_2024-01-31.jsonl.xz -> 2024-01/price_data_linear-0_2024-01-31.jsonl.xz"""
+    match = DAY.search(name)
+    return f"{match.group(1) if match else 'undated'}/{name}"
+
+
+def file_sha256(path: Path, budget=None):
+    h = hashlib.sha256()
+    size = 0
+    with Path(path).open('rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            if budget:
+                budget.read(len(chunk))
+            h.update(chunk)
+            size += len(chunk)
+    return h.hexdigest(), size
+
+
+class LocalStore:
+    """
+    Directory-backed object store: <root>/<key> plus <root>/<key>.meta.json.
+
+    Uploads are multipart like S3's: parts of part_size are read and written
+    at their offsets by `workers` threads, and the object only appears once
+    every part is in (rename of the completed upload).
+    """
+
+    def __init__(self, root, part_size: int = 16 * 1024 * 1024, workers: int = 4):
+        self.root = Path(root)
+        self.part_size = part_size
+        self.workers = workers
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def upload(self, path: Path, key: str, sha256: str, budget=None) -> None:
+        size = path.stat().st_size
+        target = self.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{target.name}.upload-{uuid.uuid4().hex}")
+
+        src = os.open(path, os.O_RDONLY)
+        dst = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            def put_part(offset):
+                data = os.pread(src, min(self.part_size, size - offset), offset)
+                if budget:
+                    budget.read(len(data))
+                os.pwrite(dst, data, offset)
+
+            with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+                list(pool.map(put_part, range(0, size, self.part_size)))
+            os.fsync(dst)
+        except BaseException:
+            os.close(dst)
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            os.close(src)
+        os.close(dst)
+        os.replace(tmp, target)
+        meta = target.with_name(target.name + '.meta.json')
+        meta.write_text(json.dumps({'size': size, 'sha256': sha256}))
+
+    def head(self, key: str):
+        """{'size', 'sha256'} as recorded at upload, or None if the object does not exist."""
+        target = self.path(key)
+        try:
+            meta = json.loads(target.with_name(target.name + '.meta.json').read_text())
+            meta['size'] = target.stat().st_size
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def hash(self, key: str, budget=None):
+        """(sha256, size) of the stored bytes."""
+        return file_sha256(self.path(key), budget)
+
+    def download(self, key: str, dest: Path, budget=None) -> None:
+        with self.path(key).open('rb') as fin, Path(dest).open('wb') as fout:
+            for chunk in iter(lambda: fin.read(CHUNK_SIZE), b''):
+                if budget:
+                    budget.read(len(chunk))
+                fout.write(chunk)
+
+
+class S3Store:
+    """
+    Bucket (and key prefix) on S3 or an S3-compatible endpoint.
+
+    One boto3 client is shared by all threads; its connection pool is sized
+    for every archive upload running with all of its parts at once.
+    """
+
+    def __init__(self, bucket: str, prefix: str = '', endpoint_url: str = None, part_size: int = 16 * 1024 * 1024,
+                 workers: int = 4, connections: int = 16):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+        except ImportError:
+            raise ImportError("The S3 cold tier needs boto3: pip install boto3")
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url or None,
+            config=Config(max_pool_connections=connections, retries={'max_attempts': 5, 'mode': 'adaptive'}),
+        )
+        self.transfer = TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size,
+                                       max_concurrency=workers, use_threads=True)
+
+    def upload(self, path: Path, key: str, sha256: str, budget=None) -> None:
+        # ChecksumAlgorithm: S3 checks every part as it arrives; the metadata holds the whole-file hash
+        self.client.upload_file(
+            str(path), self.bucket, self.prefix + key,
+            ExtraArgs={'Metadata': {'sha256': sha256}, 'ChecksumAlgorithm': 'SHA256'},
+            Config=self.transfer,
+            Callback=budget.read if budget else None,
+        )
+
+    def head(self, key: str):
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {'size': response['ContentLength'], 'sha256': response.get('Metadata', {}).get('sha256')}
+
+    def hash(self, key: str, budget=None):
+        body = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body']
+        h = hashlib.sha256()
+        size = 0
+        for chunk in body.iter_chunks(CHUNK_SIZE):
+            if budget:
+                budget.read(len(chunk))
+            h.update(chunk)
+            size += len(chunk)
+        return h.hexdigest(), size
+
+    def download(self, key: str, dest: Path, budget=None) -> None:
+        self.client.download_file(self.bucket, self.prefix + key, str(dest), Config=self.transfer,
+                                  Callback=budget.read if budget else None)
+
+
+def store_from_url(url: str, endpoint_url: str = None, part_size: int = 16 * 1024 * 1024, workers: int = 4,
+                   connections: int = 16):
+    """s3://bucket/prefix -> S3Store; file:///path or a plain path -> LocalStore."""
+    if url.startswith('s3://'):
+        bucket, _, prefix = url[5:].partition('/')
+        return S3Store(bucket, prefix, endpoint_url, part_size, workers, connections)
+    return LocalStore(url[7:] if url.startswith('file://') else url, part_size, workers)
+
+
+class ArchiveReader:
+    """
+    Opens daily archives by name, fetching the ones pruned from ws_data/
+    out of the cold tier into a local cache of at most cache_bytes,
+    evicting the least recently used first. Fetched files are checked
+    against their .sha256 manifest (kept locally) or the store's metadata.
+    """
+
+    def __init__(self, ws_dir, store, cache_dir, cache_bytes: int = 2 * 1024 ** 3):
+        self.ws_dir = Path(ws_dir)
+        self.store = store
+        self.cache_dir = Path(cache_dir)
+        self.cache_bytes = cache_bytes
+        self.lock = threading.Lock()
+        self.fetching = {}  # name -> lock, so concurrent readers of one archive download it once
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for part in self.cache_dir.glob('*.part'):
+            part.unlink(missing_ok=True)  # Interrupted downloads
+        # Recency survives restarts through the files' mtime, which every hit refreshes
+        files = sorted(self.cache_dir.glob('*.xz'), key=lambda p: p.stat().st_mtime)
+        self.lru = OrderedDict((p.name, p.stat().st_size) for p in files)
+        self.hits = 0
+        self.misses = 0
+
+    def cached_bytes(self) -> int:
+        return sum(self.lru.values())
+
+    def path(self, name: str) -> Path:
+        """Local path of the archive, downloading it into the cache if it is only in the cold tier."""
+        local = self.ws_dir / name
+        if local.exists():
+            return local
+        with self.lock:
+            cached = self.touch(name)
+            if cached:
+                return cached
+            fetch_lock = self.fetching.setdefault(name, threading.Lock())
+        with fetch_lock:
+            with self.lock:
+                cached = self.touch(name)
+                if cached:
+                    return cached
+            try:
+                path = self.fetch(name)
+            finally:
+                with self.lock:
+                    self.fetching.pop(name, None)
+            with self.lock:
+                self.lru[name] = path.stat().st_size
+                self.evict(keep=name)
+            return path
+
+    def touch(self, name: str):
+        """Called with the lock held: the cached path (marked most recently used) or None."""
+        if name not in self.lru:
+            return None
+        path = self.cache_dir / name
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            del self.lru[name]  # Removed behind our back
+            return None
+        self.lru.move_to_end(name)
+        self.hits += 1
+        return path
+
+    def fetch(self, name: str) -> Path:
+        self.misses += 1
+        key = archive_key(name)
+        expected = self.expected_sha256(name, key)
+        tmp = self.cache_dir / f"{name}.{uuid.uuid4().hex}.part"
+        try:
+            self.store.download(key, tmp)
+            actual, _size = file_sha256(tmp)
+            if expected is None or actual != expected:
+                raise IOError(f"Checksum mismatch for {key} from the cold tier")
+            path = self.cache_dir / name
+            os.replace(tmp, path)
+            return path
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def expected_sha256(self, name: str, key: str):
+        manifest = self.ws_dir / f"{name}.sha256"
+        try:
+            return manifest.read_text().split()[0]
+        except (OSError, IndexError):
+            head = self.store.head(key)
+            if head is None:
+                raise FileNotFoundError(f"{name} is neither in {self.ws_dir} nor in the cold tier")
+            return head.get('sha256')
+
+    def evict(self, keep: str) -> None:
+        """Called with the lock held: drop least recently used files until the cache fits."""
+        total = self.cached_bytes()
+        for name in list(self.lru):
+            if total <= self.cache_bytes:
+                break
+            if name == keep:
+                continue
+            (self.cache_dir / name).unlink(missing_ok=True)
+            total -= self.lru.pop(name)
+
+    def open(self, name: str):
+        """Decompressing binary file object over the archive's lines."""
+        return lzma.open(self.path(name), 'rb')
+
+    def names(self, day) -> list:
+        """Archives of a day (every shard), local or offloaded; the local manifests outlive pruning."""
+        suffix = f"_{day}.jsonl.xz"
+        return sorted({p.name[:-len('.sha256')] for p in self.ws_dir.glob(f"*{suffix}.sha256")}
+                      | {p.name for p in self.ws_dir.glob(f"*{suffix}")})
+
+    def read_day(self, day):
+        """Every line of the day's archives as bytes, shard by shard."""
+        for name in self.names(day):
+            with self.open(name) as f:
+                yield from f
+
+
+def open_reader(ws_dir, cache_dir=None, cache_bytes=None):
+    """ArchiveReader for the cold tier the archiver is configured with (ARCHIVER_COLD_* environment)."""
+    url = os.environ.get('ARCHIVER_COLD_URL', '')
+    if not url:
+        raise ValueError("ARCHIVER_COLD_URL is not set")
+    store = store_from_url(url, os.environ.get('ARCHIVER_COLD_ENDPOINT') or None)
+    if cache_bytes is None:
+        cache_bytes = int(float(os.environ.get('ARCHIVER_COLD_CACHE_MB', '2048')) * 1024 * 1024)
+    return ArchiveReader(ws_dir, store, cache_dir or Path(ws_dir) / 'cold' / 'cache', cache_bytes)
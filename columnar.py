@@ -0,0 +1,274 @@
+"""
+Columnar export of the tick files for analysis.
+
+Converts price_data_*.jsonl(.xz) into one directory per day and symbol,
+holding a typed .npy file per column plus meta.json:
+
+    ws_data/columnar/2024-01-01/BTCUSDT/recv_ns.npy
+                                       /lastPrice.npy ...
+                                       /meta.json
+
+Loading is np.load(mmap_mode='r'), so nothing is parsed and range queries
+are array slices. Run: python columnar.py [--workers N] [--force] [--include-today]
+"""
+
+import argparse
+import json
+import logging
+import lzma
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+from config import EXPORT_DIR, EXPORT_WORKERS, WS_DIR_PATH
+
+FORMAT_VERSION = 1
+
+# Ticker fields exported as float64 columns (NaN where a row does not have the field)
+FLOAT_FIELDS = [
+    'lastPrice', 'bid1Price', 'bid1Size', 'ask1Price', 'ask1Size', 'markPrice', 'indexPrice',
+    'volume24h', 'turnover24h', 'openInterest', 'fundingRate',
+]
+COLUMNS = {
+    'recv_ns': np.int64,  # Receive time, ns since the epoch (the entry's recv_ns; older files: its local 'timestamp')
+    'ts': np.int64,  # Exchange timestamp, ms
+    'cs': np.int64,  # Bybit cross sequence, -1 if absent
+    'kind': np.uint8,  # See KINDS
+    'price': np.float64,  # The entry's price (lastPrice for tickers, close/trade price for backfill)
+    **{field: np.float64 for field in FLOAT_FIELDS},
+}
+KINDS = {'snapshot': 0, 'delta': 1, 'backfill': 2, 'backfill_kline': 3, 'backfill_trade': 4}
+
+
+def day_of(path: Path):
+    """Date a data file covers, from price_data[_<shard>]_YYYY-MM-DD.jsonl[.xz]; None if not a data file."""
+    if not path.name.startswith('price_data'):
+        return None
+    try:
+        return date.fromisoformat(path.name.split('.', 1)[0].rsplit('_', 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def superseded(path: Path) -> bool:
+    """
+    One of a .jsonl/.jsonl.xz pair caught mid-archive, holding the same lines as the other.
+
+    The archiver only renames the .xz into place once it is complete, so the
+    .xz is read and the .jsonl skipped, unless verification failed; then the
+    archiver keeps both and the original .jsonl is the one to trust.
+    """
+    name = path.name
+    if name.endswith('.jsonl.xz'):
+        return path.with_name(name[:-len('.xz')] + '.verify_failed').exists()
+    return path.with_name(name + '.xz').exists() and not path.with_name(name + '.verify_failed').exists()
+
+
+def find_day_files(data_dir) -> dict:
+    days = {}
+    for path in sorted(Path(data_dir).iterdir()):
+        if path.name.endswith(('.jsonl', '.jsonl.xz')) and not superseded(path):
+            day = day_of(path)
+            if day:
+                days.setdefault(day, []).append(path)
+    return days
+
+
+def open_lines(path: Path):
+    return lzma.open(path, 'rt', encoding='utf-8') if path.suffix == '.xz' else path.open('r', encoding='utf-8')
+
+
+class RecvClock:
+    """
+    Parses the local naive ISO 'timestamp' into ns, caching the per-second part.
+
+    Only for entries written before recv_ns was stored: it assumes this host's
+    time zone is the writer's, and the repeated hour after a DST change is ambiguous.
+    """
+
+    def __init__(self):
+        self.second = None
+        self.base = 0
+
+    def __call__(self, iso: str) -> int:
+        second = iso[:19]
+        if second != self.second:
+            self.second = second
+            self.base = int(datetime.fromisoformat(second).timestamp()) * 1_000_000_000
+        micros = iso[20:26]
+        return self.base + (int(micros.ljust(6, '0')) * 1000 if micros else 0)
+
+
+def row_kind(full: dict) -> int:
+    kind = full.get('type')
+    if kind != 'backfill':
+        return KINDS.get(kind, 0)
+    topic = full.get('topic', '')
+    if topic.startswith('kline.'):
+        return KINDS['backfill_kline']
+    if topic.startswith('publicTrade.'):
+        return KINDS['backfill_trade']
+    return KINDS['backfill']
+
+
+def to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def read_rows(paths) -> dict:
+    """Parse the day's files into per-symbol column lists."""
+    symbols = {}
+    clock = RecvClock()
+    for path in paths:
+        with open_lines(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    full = entry['full_data']
+                except (ValueError, KeyError, TypeError):
+                    continue  # Torn last line of a crashed writer, or junk
+                data = full.get('data') or {}
+                raw = full.get('raw') or {}
+                symbol = data.get('symbol') or raw.get('symbol') or full.get('topic', '').rpartition('.')[2]
+                columns = symbols.get(symbol)
+                if columns is None:
+                    columns = symbols[symbol] = {name: [] for name in COLUMNS}
+                recv_ns = entry.get('recv_ns')
+                columns['recv_ns'].append(recv_ns if recv_ns is not None else clock(entry['timestamp']))
+                columns['ts'].append(int(full.get('ts') or 0))
+                columns['cs'].append(int(full.get('cs') if full.get('cs') is not None else -1))
+                columns['kind'].append(row_kind(full))
+                columns['price'].append(float(entry['price']))
+                # Older files hold Bybit's strings, projected ones typed values (and maybe 'raw')
+                for field in FLOAT_FIELDS:
+                    value = data.get(field)
+                    columns[field].append(to_float(raw.get(field) if value is None else value))
+    return symbols
+
+
+def source_signature(paths) -> list:
+    return [[p.name, p.stat().st_size, int(p.stat().st_mtime)] for p in paths]
+
+
+def write_array(path: Path, array: np.ndarray) -> None:
+    tmp = path.with_name(path.name + '.part')
+    with tmp.open('wb') as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def export_day(day: date, paths: list, out_dir, force: bool = False) -> dict:
+    """Export one day; returns {symbol: rows}. Skipped (empty result) if the sources did not change."""
+    day_dir = Path(out_dir) / day.isoformat()
+    signature = source_signature(paths)
+    marker = day_dir / 'sources.json'
+    if not force and marker.exists() and json.loads(marker.read_text()) == signature:
+        return {}
+
+    exported = {}
+    for symbol, columns in read_rows(paths).items():
+        symbol_dir = day_dir / symbol
+        symbol_dir.mkdir(parents=True, exist_ok=True)
+        arrays = {name: np.asarray(values, dtype=COLUMNS[name]) for name, values in columns.items()}
+        if len(paths) > 1:
+            # Several files (shards, or an .xz plus a late .jsonl) may interleave; keep rows in time order
+            order = np.argsort(arrays['recv_ns'], kind='stable')
+            arrays = {name: array[order] for name, array in arrays.items()}
+        for name, array in arrays.items():
+            write_array(symbol_dir / f'{name}.npy', array)
+        rows = len(arrays['recv_ns'])
+        meta = {
+            'version': FORMAT_VERSION,
+            'symbol': symbol,
+            'date': day.isoformat(),
+            'rows': rows,
+            'columns': {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+            'kinds': KINDS,
+            'recv_ns_range': [int(arrays['recv_ns'].min()), int(arrays['recv_ns'].max())] if rows else None,
+            'sources': [p.name for p in paths],
+        }
+        # meta.json goes last: a symbol directory without it is an interrupted export
+        tmp = symbol_dir / 'meta.json.part'
+        tmp.write_text(json.dumps(meta, indent=2))
+        os.replace(tmp, symbol_dir / 'meta.json')
+        exported[symbol] = rows
+
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    marker.write_text(json.dumps(signature))
+    return exported
+
+
+def export_all(data_dir=WS_DIR_PATH, out_dir=EXPORT_DIR, workers: int = EXPORT_WORKERS,
+               force: bool = False, include_today: bool = False) -> dict:
+    """Export every day in parallel, one process per day; returns {date: {symbol: rows}}."""
+    days = find_day_files(data_dir)
+    if not include_today:
+        # Today's file is still growing; export it once the day is complete
+        days.pop(date.today(), None)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(export_day, day, paths, out_dir, force): day for day, paths in sorted(days.items())}
+        for future in as_completed(futures):
+            day = futures[future]
+            try:
+                results[day] = future.result()
+                if results[day]:
+                    logging.info(f"Exported {day}: {sum(results[day].values())} rows, {len(results[day])} symbols")
+            except Exception as e:
+                logging.error(f"Error exporting {day}: {str(e)}")
+    return results
+
+
+# --- Loading ----------------------------------------------------------------
+
+def load_day(symbol: str, day, out_dir=EXPORT_DIR, columns=None) -> dict:
+    """Memory-map one day of a symbol: {column: np.memmap}. Empty dict if not exported."""
+    symbol_dir = Path(out_dir) / str(day) / symbol
+    meta_path = symbol_dir / 'meta.json'
+    if not meta_path.exists():
+        return {}
+    meta = json.loads(meta_path.read_text())
+    names = columns or list(meta['columns'])
+    return {name: np.load(symbol_dir / f'{name}.npy', mmap_mode='r') for name in names}
+
+
+def time_slice(arrays: dict, start_ns: int, end_ns: int) -> dict:
+    """Rows with start_ns <= recv_ns < end_ns, as views into the mapped arrays."""
+    recv_ns = arrays['recv_ns']
+    lo, hi = np.searchsorted(recv_ns, [start_ns, end_ns])
+    return {name: array[lo:hi] for name, array in arrays.items()}
+
+
+def query(symbol: str, start: datetime, end: datetime, out_dir=EXPORT_DIR, columns=None) -> dict:
+    """Rows for symbol between two local datetimes across days (concatenated only if it spans days)."""
+    names = None if columns is None else list(dict.fromkeys(['recv_ns', *columns]))
+    start_ns, end_ns = int(start.timestamp() * 1e9), int(end.timestamp() * 1e9)
+    parts = []
+    day = start.date()
+    while day <= end.date():
+        arrays = load_day(symbol, day, out_dir, names)
+        if arrays:
+            parts.append(time_slice(arrays, start_ns, end_ns))
+        day = date.fromordinal(day.toordinal() + 1)
+    if not parts:
+        return {}
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    parser = argparse.ArgumentParser(description="Export tick files to per-day, per-symbol .npy columns")
+    parser.add_argument('--workers', type=int, default=EXPORT_WORKERS)
+    parser.add_argument('--force', action='store_true', help="Re-export days whose sources did not change")
+    parser.add_argument('--include-today', action='store_true', help="Also export the (incomplete) current day")
+    args = parser.parse_args()
+    export_all(workers=args.workers, force=args.force, include_today=args.include_today)
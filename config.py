@@ -1,7 +1,11 @@
 import os
+import lzma
+import tempfile
 
 # Bybit public settings
 SYMBOL = "BTCUSDT"
+SYMBOLS = [SYMBOL]  # Symbols streamed by a single-process run (main.py)
+CHANNEL_TYPE = "linear"  # Channel for a single-process run: linear, spot or inverse
 TESTNET = False
 
 # Directory setup
@@ -9,24 +13,157 @@ WS_DIR = 'ws_data'
 WS_DIR_PATH = os.path.abspath(WS_DIR)
 os.makedirs(WS_DIR, exist_ok=True)
 
-# Logging — directories only; logging.basicConfig is called in main.py
+# Logging — directories only; main.py sets up the queued logging pipeline (logpipe.py)
 LOG_DIR = os.path.join(WS_DIR, 'logs')
 os.makedirs(LOG_DIR, exist_ok=True)
-LOG_FILE = os.path.join(LOG_DIR, 'ws_log.log')
+LOG_FILE = os.path.join(LOG_DIR, 'ws_log.log')  # Shard workers write ws_log_<shard>.log next to it
+LOG_QUEUE_SIZE = 10000  # Records waiting for the background log writer; further records are dropped and counted
+LOG_REPEAT_INTERVAL = 60  # Seconds per rate-limit window for identical log lines; suppressed counts are summarized after it
+LOG_REPEAT_BURST = 5  # Identical lines let through per window
+LOG_SAVE_EVERY = 1  # Log "Saved N entries" for every Nth flush only (totals since the last line); 1 logs every flush
 
 # Data saving configuration
 BUFFER_SIZE = 100  # Number of entries to buffer before writing
 FLUSH_INTERVAL = 60  # Maximum time (in seconds) between writes
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100 MB, adjust as needed
 
+# Typed field projection per category: full_data['data'] keeps only these ticker fields, converted once on arrival.
+# Types: 'float64', 'int64', 'ts_ns' (ms field stored as ns), 'str'. Off by default because it changes the stored
+# record (fewer fields, numbers instead of strings; see CHANGELOG.md): opt in with TICK_SCHEMA = TYPED_TICK_SCHEMA.
+_DERIVATIVES_TICK_FIELDS = {
+    'symbol': 'str',
+    'lastPrice': 'float64',
+    'bid1Price': 'float64',
+    'bid1Size': 'float64',
+    'ask1Price': 'float64',
+    'ask1Size': 'float64',
+    'markPrice': 'float64',
+    'indexPrice': 'float64',
+    'volume24h': 'float64',
+    'turnover24h': 'float64',
+    'openInterest': 'float64',
+    'fundingRate': 'float64',
+    'nextFundingTime': 'ts_ns',
+}
+TYPED_TICK_SCHEMA = {
+    'linear': _DERIVATIVES_TICK_FIELDS,
+    'inverse': _DERIVATIVES_TICK_FIELDS,
+    'spot': {
+        'symbol': 'str',
+        'lastPrice': 'float64',
+        'highPrice24h': 'float64',
+        'lowPrice24h': 'float64',
+        'prevPrice24h': 'float64',
+        'volume24h': 'float64',
+        'turnover24h': 'float64',
+        'price24hPcnt': 'float64',
+        'usdIndexPrice': 'float64',
+    },
+}
+TICK_SCHEMA = None  # None stores Bybit's full payload as is; a category missing from the schema does too
+TICK_KEEP_RAW = False  # Also keep the full original payload under full_data['raw']
+
+# Memory cap and spill-over while data file writes are failing (full disk, NFS outage, ...)
+BUFFER_MAX_BYTES = 64 * 1024 * 1024  # Hard cap on buffered tick data held in memory
+SPOOL_DIR = os.environ.get('SPOOL_DIR', os.path.join(WS_DIR_PATH, 'spool'))  # <shard>/ chunks; survives restarts, unlike /tmp. Point it at another volume to spill when the data volume is the one failing
+SPOOL_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB of spilled lines before falling back to dropping
+BUFFER_OVERFLOW_POLICY = 'drop_oldest'  # Last resort when the spool is full too: 'drop_oldest' or 'drop_newest'
+FLUSH_RETRY_MAX_DELAY = 30  # Back off failed writes exponentially up to this many seconds
+JOURNAL_ENABLED = True  # Mirror unflushed ticks into a memory-mapped ring so a crash or OOM kill loses nothing
+JOURNAL_DIR = os.path.join(WS_DIR_PATH, 'journal')  # One <shard>.journal file per process; replayed on startup
+JOURNAL_SIZE = int(os.environ.get('JOURNAL_SIZE', 8 * 1024 * 1024))  # Ring capacity per process; ticks past it are counted in journal_skipped and only lack crash safety until the next flush
+
+# Live fan-out to local consumers (pubsub.py)
+PUBSUB_ENABLED = True  # Publish every tick on a Unix-domain socket as it arrives
+PUBSUB_SOCKET_DIR = os.environ.get('PUBSUB_SOCKET_DIR', os.path.join(WS_DIR_PATH, 'pubsub'))  # <shard>.sock per process
+PUBSUB_QUEUE_SIZE = 10000  # Ticks queued per subscriber before it is disconnected as too slow
+
+# Shared-memory latest-ticker table (read with ticker_reader.py)
+TICKER_TABLE_ENABLED = True  # Keep last/bid/ask/mark/index price per symbol in a seqlocked mmap table
+TICKER_TABLE_DIR = os.environ.get('TICKER_TABLE_DIR', '/dev/shm/get_ws_data' if os.path.isdir('/dev/shm') else os.path.join(tempfile.gettempdir(), 'get_ws_data_tickers'))  # <shard>.tickers per process
+
 # WebSocket configuration
+WS_ENGINE = 'pybit'  # 'pybit': a websocket-client thread per connection; 'asyncio': wsengine.py, every connection on the event loop
+WS_URL = ''  # asyncio engine only: fixed endpoint (e.g. a local mock server); empty derives it from TESTNET and WS_DOMAINS
+WS_CONNECT_TIMEOUT = 10  # asyncio engine: seconds to connect and have every subscription acknowledged
+WS_SUBSCRIBE_BATCH = 10  # asyncio engine: topics per subscribe request (Bybit's limit on spot)
 WS_PING_INTERVAL = 30  # Ping the server every 30 seconds
 WS_PING_TIMEOUT = 10  # Wait 10 seconds for a pong before considering the connection dead
-WS_RECONNECT_DELAY = 5  # Wait 5 seconds before attempting to reconnect
+WS_RECONNECT_DELAY = 0.5  # Base delay for jittered exponential reconnect backoff (seconds)
+WS_RECONNECT_MAX_DELAY = 30  # Backoff ceiling, reached after about six failed attempts in a row
+WS_STALE_TIMEOUT = 90  # Replace a connection with neither a message nor a pong for this long (seconds); keep above WS_PING_INTERVAL
+WS_HANDOVER_TIMEOUT = 10  # Wait this long for a replacement's first message before closing the old connection
+WS_MAX_CONNECTION_AGE = 6 * 3600  # Proactively rotate connections after 6 hours (make-before-break); 0 disables
+
+# Redundant connections (hot standby)
+WS_CONNECTIONS = 1  # Independent connections subscribed to the same topics; >1 merges them, first arrival wins
+WS_DOMAINS = ["bybit", "bytick"]  # Endpoints assigned round-robin to connections (stream.bybit.com, stream.bytick.com)
+CONNECTION_STATS_INTERVAL = 60  # Log and export per-connection lead/lag stats every minute
+CONNECTION_STATS_FILE = os.path.join(WS_DIR_PATH, 'logs', 'connection_stats.json')
+
+# Sequencing and gap tracking
+DEDUP_WINDOW = 1024  # Recent (symbol, cs, ts) keys kept to measure standby lag; duplicates are caught per symbol regardless
+GAP_THRESHOLD_MS = 30000  # Record a gap if a symbol is silent for longer than this (30 seconds)
+GAP_LOG_FILE = os.path.join(WS_DIR_PATH, 'gaps', 'gaps.jsonl')  # Kept in a subdirectory so the archiver ignores it; shards write gaps_<shard>.jsonl
+
+# REST backfill of gaps after reconnect
+BACKFILL_ENABLED = True  # Fetch klines/trades/tickers over REST for every recorded gap
+BACKFILL_MAX_WORKERS = 3  # Concurrent REST requests per gap
+BACKFILL_RATE_LIMIT = 10  # Maximum REST requests per second (Bybit allows 600 per 5s per IP)
+BACKFILL_REST_ENDPOINT = os.environ.get('BACKFILL_REST_ENDPOINT')  # Override the REST base URL, e.g. a local stand-in
+
+# Sharded multi-process ingestion (supervisor.py)
+SUBSCRIPTIONS = {  # Symbols per channel type; each channel is split into shards of SHARD_SIZE symbols
+    "linear": [SYMBOL],
+    "spot": [],
+    "inverse": [],
+}
+SHARD_SIZE = 50  # Symbols per worker process
+SUPERVISOR_HEARTBEAT_INTERVAL = 10  # Workers report health/metrics this often (seconds)
+SUPERVISOR_HEARTBEAT_TIMEOUT = 60  # Restart a worker that has not reported for this long
+SUPERVISOR_RESTART_MAX_DELAY = 60  # Ceiling for a crashing shard's restart backoff (seconds)
+SUPERVISOR_STATUS_FILE = os.path.join(WS_DIR_PATH, 'logs', 'supervisor_status.json')
+
+# Streaming rolling statistics (rollingstats.py)
+STATS_ENABLED = True  # Per-symbol VWAP, realized volatility, spread, tick rate and return z-score
+STATS_WINDOWS = [60, 300, 900]  # Rolling windows in seconds
+STATS_CAPACITY = 16384  # Ticks kept per symbol; bounds the longest window for very busy symbols
+STATS_METRICS_PORT = 9092  # Prometheus endpoint for the stats (shards use the following ports); 0 disables it
+
+# Columnar export for analysis (columnar.py)
+EXPORT_DIR = os.path.join(WS_DIR_PATH, 'columnar')  # <day>/<symbol>/<column>.npy + meta.json
+EXPORT_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # Days are exported in parallel, one process each
+
+# Monthly per-symbol packs of closed months (packs.py)
+PACK_DIR = os.path.join(WS_DIR_PATH, 'packs')  # <YYYY-MM>/<symbol>.jsonl.xz + manifest.json
+PACK_BLOCK_DAYS = 7  # Days per xz stream; reading one day decompresses its whole stream
+PACK_DICT_SIZE = 64 * 1024 * 1024  # LZMA dictionary per stream (capped at the stream's size)
+PACK_PRESET = 9 | lzma.PRESET_EXTREME  # Packing runs once per month, so spend the CPU
+PACK_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # Symbols are compressed in parallel, one process each
+PACK_DELETE_SOURCES = False  # Remove the daily archives once a month's packs are verified
+
+# Process discovery and monitoring (monitor.py)
+PID_DIR = os.path.join(WS_DIR_PATH, 'run')  # main.pid, supervisor.pid and <shard>.pid while running
+FLUSH_LATENCY_INTERVAL = 2  # Seconds between updates of <name>.flush.json in PID_DIR (write + fsync latency for the archiver)
+MONITOR_PORT = 9091  # Prometheus endpoint of monitor.py
+MONITOR_INTERVAL = 15  # Seconds between monitor updates
+MONITOR_DAYS = 14  # Report per-day byte counts for this many recent days
+SCRUB_STATUS_FILE = os.path.join(WS_DIR_PATH, 'scrub', 'status.json')  # Written by the archiver's scrubber, read by monitor.py
+
+# Health endpoint (/live, /ready, /health) served by each client
+HEALTH_ENABLED = True
+HEALTH_HOST = '0.0.0.0'  # Reachable from the docker healthcheck and orchestrator probes
+HEALTH_PORT = 8080  # Shards use the following ports; 0 disables it
+HEALTH_MAX_TICK_AGE = 60  # Not ready when no symbol ticked for this many seconds
+HEALTH_WRITER_STALL = 120  # Not live when a single write has been running this long
+HEALTH_LOOP_TIMEOUT = 30  # Not live when the event loop has not run for this long
+CONTROL_ENDPOINTS = False  # POST /profile and /trace on the health port toggle the profiler and span tracing (loopback clients only)
 
-# Error handling
-MAX_RECONNECT_ATTEMPTS = 5  # Maximum number of reconnection attempts before giving up
-ERROR_COOLDOWN_TIME = 300  # Wait 5 minutes (300 seconds) after max reconnect attempts before trying again
+# On-demand profiling (profiler.py): SIGUSR1 toggles the stack sampler, SIGUSR2 the stage timing spans
+PROFILE_DIR = os.path.join(WS_DIR_PATH, 'profiles')  # <name>-<time>.folded and <name>-<time>.trace.json
+PROFILE_INTERVAL = 0.01  # Seconds between stack samples
+TRACE_ENABLED = False  # Record spans from startup
+TRACE_CAPACITY = 100000  # Spans kept in memory; the oldest are dropped
 
 # Performance monitoring
 PERFORMANCE_LOG_INTERVAL = 3600  # Log performance stats every hour (3600 seconds)
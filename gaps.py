@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+
+class SequenceTracker:
+    """
+    Tracks Bybit's per-symbol cs/ts to drop duplicate updates and spot gaps.
+
+    An update is new only if its (ts, cs) is above the last one accepted
+    for its symbol, so the check is exact and O(1) however far a standby
+    connection lags. Gaps are reported through on_gap(symbol, start_ms,
+    end_ms, reason).
+
+    With several connections feeding the same tracker (hot standby), the
+    first arrival wins. When the copy that lost is still among the last
+    `window` accepted keys, its lag is added to its source's stats.
+    """
+
+    def __init__(self, window: int = 1024, gap_threshold_ms: Optional[int] = None, on_gap=None):
+        self.window = window
+        self.gap_threshold_ms = gap_threshold_ms
+        self.on_gap = on_gap
+        self.recent = OrderedDict()
+        self.last_accepted = {}  # symbol -> (ts, cs) of the newest update let through
+        self.last_ts = {}
+        self.pending = {}
+        self.duplicates = 0
+        self.sources = {}
+        self.lock = threading.Lock()
+
+    def observe(self, symbol: str, cs: Optional[int], ts: Optional[int], source=0) -> bool:
+        """Return True if the update is new, False for a duplicate or anything older than the last accepted update."""
+        if ts is None:
+            return True
+
+        key = (symbol, cs, ts)
+        now = time.monotonic()
+        gap = None
+        with self.lock:
+            stats = self.sources.get(source)
+            if stats is None:
+                stats = self.sources[source] = {'leads': 0, 'lags': 0, 'lag_ms_total': 0.0, 'lag_ms_max': 0.0}
+            order = (ts, cs if cs is not None else -1)
+            accepted = self.last_accepted.get(symbol)
+            if accepted is not None and order <= accepted:
+                self.duplicates += 1
+                first = self.recent.get(key)
+                if first is not None and first[0] != source:
+                    lag_ms = (now - first[1]) * 1000
+                    stats['lags'] += 1
+                    stats['lag_ms_total'] += lag_ms
+                    stats['lag_ms_max'] = max(stats['lag_ms_max'], lag_ms)
+                return False
+            stats['leads'] += 1
+            self.last_accepted[symbol] = order
+            self.recent[key] = (source, now)
+            if len(self.recent) > self.window:
+                self.recent.popitem(last=False)
+
+            last = self.last_ts.get(symbol)
+            pending = self.pending.pop(symbol, None)
+            if pending is not None:
+                start_ms, reason = pending
+                if ts > start_ms:
+                    gap = (start_ms, ts, reason)
+            elif last is not None and self.gap_threshold_ms and ts - last > self.gap_threshold_ms:
+                gap = (last, ts, "silence")
+
+            self.last_ts[symbol] = ts
+
+        if gap and self.on_gap:
+            self.on_gap(symbol, gap[0], gap[1], gap[2])
+        return True
+
+    def source_stats(self) -> dict:
+        """Per-source counts of first arrivals (leads) and late duplicates (lags)."""
+        with self.lock:
+            result = {}
+            for source, stats in self.sources.items():
+                total = stats['leads'] + stats['lags']
+                result[source] = {
+                    'leads': stats['leads'],
+                    'lags': stats['lags'],
+                    'lead_ratio': stats['leads'] / total if total else 0.0,
+                    'lag_ms_avg': stats['lag_ms_total'] / stats['lags'] if stats['lags'] else 0.0,
+                    'lag_ms_max': stats['lag_ms_max'],
+                }
+            return result
+
+    def mark_disconnect(self, reason: str) -> None:
+        """Open a gap for every known symbol; it closes on the next update."""
+        with self.lock:
+            for symbol, last in self.last_ts.items():
+                # Keep the earliest start if we reconnect several times in a row
+                if symbol not in self.pending:
+                    self.pending[symbol] = (last, reason)
+
+
+class GapLog:
+    """
+    Append-only JSONL log of gap intervals that readers can query.
+
+    Only the last `keep` gaps of this process and per-symbol counts stay in
+    memory; query() reads the file, which holds the full history. `fields`
+    are added to every record (main adds the shard's category and file
+    prefix, so a later backfill knows where each gap belongs).
+    """
+
+    def __init__(self, path, keep: int = 1000, fields: Optional[dict] = None):
+        self.path = Path(path)
+        self.fields = dict(fields or {})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.recent = deque(maxlen=keep)
+        self.counts = {}  # symbol -> gaps recorded by this process
+
+    def record(self, symbol: str, start_ms: int, end_ms: int, reason: str) -> dict:
+        gap = {
+            'symbol': symbol,
+            'start_ms': int(start_ms),
+            'end_ms': int(end_ms),
+            'reason': reason,
+            'recorded_at': datetime.now().isoformat(),
+            **self.fields,
+        }
+        with self.lock:
+            self.recent.append(gap)
+            self.counts[symbol] = self.counts.get(symbol, 0) + 1
+            try:
+                with self.path.open('a') as f:
+                    f.write(json.dumps(gap) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+            except Exception as e:
+                logging.error(f"Error writing gap log {self.path}: {str(e)}")
+        logging.warning(f"Data gap for {symbol}: {start_ms}..{end_ms} ({end_ms - start_ms} ms, reason={reason})")
+        return gap
+
+    def query(self, symbol: Optional[str] = None, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> list:
+        with self.lock:  # No half-written line from a concurrent record()
+            return read_gaps(self.path, symbol, start_ms, end_ms)
+
+
+def load_gaps(path) -> list:
+    gaps = []
+    path = Path(path)
+    if not path.exists():
+        return gaps
+    with path.open('r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                gaps.append(json.loads(line))
+            except ValueError:
+                logging.error(f"Skipping malformed gap log line in {path}")
+    return gaps
+
+
+def filter_gaps(gaps: list, symbol: Optional[str] = None, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> list:
+    """Return gaps for symbol that overlap [start_ms, end_ms], ordered by start."""
+    result = []
+    for gap in gaps:
+        if symbol is not None and gap['symbol'] != symbol:
+            continue
+        if start_ms is not None and gap['end_ms'] < start_ms:
+            continue
+        if end_ms is not None and gap['start_ms'] > end_ms:
+            continue
+        result.append(gap)
+    return sorted(result, key=lambda g: g['start_ms'])
+
+
+def read_gaps(path, symbol: Optional[str] = None, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> list:
+    """Query a gap log file without holding a GapLog open (for downstream readers)."""
+    return filter_gaps(load_gaps(path), symbol, start_ms, end_ms)
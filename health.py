@@ -0,0 +1,89 @@
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class HealthServer:
+    """
+    Tiny HTTP health endpoint served from a daemon thread of the running client.
+
+    GET /live   200 while the event loop and the writer make progress, else 503
+    GET /ready  200 while ticks are arriving and being written, else 503
+    GET /health full report (tick age per symbol, connections, buffers, writer lag)
+
+    Probes are a plain HTTP request, so the probing side never has to
+    import the ingester. `actions` adds control endpoints: POST /<name>
+    calls actions[name]() and returns its result as JSON. They are not
+    authenticated, so POSTs are only accepted from the `control_from`
+    addresses (loopback) even when the probes listen on every interface.
+    """
+
+    def __init__(self, report, host: str = '127.0.0.1', port: int = 8080, actions=None,
+                 control_from=('127.0.0.1', '::1')):
+        self.report = report  # Callable returning the client's health dict
+        self.host = host
+        self.port = port
+        self.actions = actions or {}
+        self.control_from = set(control_from)
+        self.server = None
+
+    def start(self):
+        report = self.report
+        actions = self.actions
+        control_from = self.control_from
+
+        class Handler(BaseHTTPRequestHandler):
+            def send_json(self, status, body):
+                payload = json.dumps(body, default=str).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                action = actions.get(self.path.split('?', 1)[0].lstrip('/'))
+                if action is None:
+                    self.send_error(404)
+                    return
+                if self.client_address[0] not in control_from:
+                    self.send_error(403)
+                    return
+                try:
+                    self.send_json(200, action())
+                except Exception as e:
+                    self.send_json(500, {'error': str(e)})
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path not in ('/live', '/ready', '/health'):
+                    self.send_error(404)
+                    return
+                try:
+                    body = report()
+                except Exception as e:
+                    body = {'live': False, 'ready': False, 'error': str(e)}
+                if path == '/health':
+                    ok = True
+                else:
+                    ok = body[path[1:]]
+                    body = {path[1:]: ok, 'reasons': body.get('reasons', [])}
+                self.send_json(200 if ok else 503, body)
+
+            def log_message(self, format, *args):
+                pass  # Probes every few seconds would drown the ingest log
+
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logging.error(f"Could not serve health endpoint on {self.host}:{self.port}: {str(e)}")
+            return
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='health', daemon=True).start()
+        logging.info(f"Health endpoint on http://{self.host}:{self.port}/health")
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
@@ -0,0 +1,261 @@
+"""
+Keeps background work (the archiver) inside the capacity the ingest writer leaves.
+
+The writer side publishes its flush latency (FlushLatency, a small JSON
+file per process next to the pid files); the archiver side reads it
+(WriterPressure) and, together with token buckets for read/write bytes
+and a CPU share (IOBudget), slows itself down while the writer suffers.
+
+Stdlib only (psutil is used for ionice when installed).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket; consume() sleeps off any deficit. A rate of 0 means unlimited.
+
+    Used for the archiver's bytes per second and the backfill's REST
+    requests per second. Concurrent callers each reserve their tokens
+    under the lock and sleep outside it, so they queue up fairly.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate  # One second's worth by default
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, n: float = 1, scale: float = 1.0) -> float:
+        """Take n tokens at rate * scale; returns the seconds slept."""
+        if not self.rate:
+            return 0.0
+        rate = self.rate * scale
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * rate)
+            self.last = now
+            self.tokens -= n
+            wait = -self.tokens / rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """Empty the bucket so every caller waits at least `seconds` (the server said slow down)."""
+        with self.lock:
+            self.tokens = -seconds * self.rate
+            self.last = time.monotonic()
+
+
+class CpuBudget:
+    """Sleeps so that this process uses at most `share` of one core over a sliding window."""
+
+    def __init__(self, share: float = 1.0, window: float = 10.0):
+        self.share = share
+        self.window = window
+        self.reset()
+
+    def reset(self) -> None:
+        self.wall_start = time.monotonic()
+        self.cpu_start = time.process_time()
+
+    def check(self, scale: float = 1.0) -> float:
+        if self.share >= 1.0 and scale >= 1.0:
+            return 0.0
+        share = self.share * scale
+        used = time.process_time() - self.cpu_start
+        elapsed = time.monotonic() - self.wall_start
+        wait = used / share - elapsed
+        if wait > 0:
+            time.sleep(wait)
+        if elapsed > self.window:
+            self.reset()
+        return max(wait, 0.0)
+
+
+class FlushLatency:
+    """
+    Writer side: moving average of the data-file write + fsync time, published
+    as <directory>/<name>.flush.json at most every `interval` seconds.
+    """
+
+    def __init__(self, directory, name: str = 'main', interval: float = 2.0, alpha: float = 0.2):
+        self.path = Path(directory) / f'{name}.flush.json'
+        self.interval = interval
+        self.alpha = alpha
+        self.ewma_ms = None
+        self.last_ms = 0.0
+        self.flushes = 0
+        self.published_at = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000.0
+        self.last_ms = ms
+        self.flushes += 1
+        self.ewma_ms = ms if self.ewma_ms is None else self.ewma_ms + self.alpha * (ms - self.ewma_ms)
+        now = time.monotonic()
+        if now - self.published_at >= self.interval:
+            self.published_at = now
+            self.publish()
+
+    def publish(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            tmp.write_text(json.dumps({
+                'flush_ms': round(self.ewma_ms, 3),
+                'last_ms': round(self.last_ms, 3),
+                'flushes': self.flushes,
+                'pid': os.getpid(),
+                'updated_at': time.time(),
+            }))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.warning(f"Could not publish flush latency to {self.path}: {e}")
+
+
+def read_flush_latency(directory, stale_after: float = 60.0):
+    """Highest published writer flush latency (ms) among fresh .flush.json files; None if there is none."""
+    worst = None
+    now = time.time()
+    for path in Path(directory).glob('*.flush.json'):
+        try:
+            entry = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if now - entry.get('updated_at', 0) > stale_after:
+            continue  # Writer gone or idle; nothing to protect
+        if worst is None or entry['flush_ms'] > worst:
+            worst = entry['flush_ms']
+    return worst
+
+
+class WriterPressure:
+    """
+    Archiver side: compares the writer's current flush latency with the
+    baseline seen while the archiver was idle, and turns that into a
+    scale factor for the budgets (halved under pressure, regained slowly).
+    """
+
+    def __init__(self, directory, ratio: float = 2.0, floor_ms: float = 5.0, max_ms: float = 250.0,
+                 min_scale: float = 0.05, check_interval: float = 1.0):
+        self.directory = directory
+        self.ratio = ratio  # Pressure: latency above baseline * ratio ...
+        self.floor_ms = floor_ms  # ... and above baseline + floor_ms (ignore jitter on fast disks) ...
+        self.max_ms = max_ms  # ... or above max_ms regardless of the baseline
+        self.min_scale = min_scale
+        self.check_interval = check_interval
+        self.baseline_ms = None
+        self.scale = 1.0
+        self.checked_at = 0.0
+        self.backoffs = 0
+        self.paused = 0.0
+
+    def observe_idle(self) -> None:
+        """Sample the writer while the archiver does no work to (re)learn the baseline."""
+        latency = read_flush_latency(self.directory)
+        if latency is not None:
+            self.baseline_ms = latency if self.baseline_ms is None else min(
+                latency, self.baseline_ms + 0.2 * (latency - self.baseline_ms))
+
+    def pressured(self, latency) -> bool:
+        if latency is None:
+            return False
+        if latency > self.max_ms:
+            return True
+        if self.baseline_ms is None:
+            return False
+        return latency > self.baseline_ms * self.ratio and latency > self.baseline_ms + self.floor_ms
+
+    def check(self) -> float:
+        """Re-evaluate at most every check_interval; pauses one interval under pressure. Returns the scale."""
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval:
+            return self.scale
+        self.checked_at = now
+        latency = read_flush_latency(self.directory)
+        if self.pressured(latency):
+            self.scale = max(self.min_scale, self.scale / 2)
+            self.backoffs += 1
+            logging.info(f"Writer flush latency {latency:.1f}ms (baseline {self.baseline_ms or 0:.1f}ms): "
+                         f"backing off to {self.scale:.0%} of the budget")
+            time.sleep(self.check_interval)
+            self.paused += self.check_interval
+            self.checked_at = time.monotonic()
+        else:
+            self.scale = min(1.0, self.scale + 0.1)
+        return self.scale
+
+
+class IOBudget:
+    """
+    Read/write byte budgets and a CPU share, all scaled down by writer pressure.
+
+    Safe to share between worker threads: the accounting (and any sleep it
+    imposes) is serialized, so the budget holds for all of them together.
+    """
+
+    def __init__(self, read_bps: float = 0, write_bps: float = 0, cpu_share: float = 1.0, pressure: WriterPressure = None):
+        self.reads = TokenBucket(read_bps)
+        self.writes = TokenBucket(write_bps)
+        self.cpu = CpuBudget(cpu_share)
+        self.pressure = pressure
+        self.throttled = 0.0  # Seconds slept for the byte and CPU budgets
+        self.lock = threading.Lock()
+
+    def scale(self) -> float:
+        return self.pressure.check() if self.pressure else 1.0
+
+    def read(self, n: int) -> None:
+        with self.lock:
+            scale = self.scale()
+            self.throttled += self.reads.consume(n, scale) + self.cpu.check(scale)
+
+    def write(self, n: int) -> None:
+        with self.lock:
+            scale = self.scale()
+            self.throttled += self.writes.consume(n, scale) + self.cpu.check(scale)
+
+
+class ThrottledReader:
+    """File wrapper charging every read() to a budget (for lzma.open and friends)."""
+
+    def __init__(self, f, budget: IOBudget):
+        self.f = f
+        self.budget = budget
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.f.read(size)
+        self.budget.read(len(data))
+        return data
+
+    def close(self) -> None:
+        self.f.close()
+
+
+def lower_priority(nice: int = 10, ionice_idle: bool = True) -> None:
+    """Run this process at a lower CPU priority and, with psutil, in the idle I/O class."""
+    if nice:
+        try:
+            os.nice(nice)
+        except OSError as e:
+            logging.warning(f"Could not renice: {e}")
+    if not ionice_idle:
+        return
+    try:
+        import psutil
+    except ImportError:
+        logging.info("psutil not installed; I/O priority unchanged")
+        return
+    try:
+        psutil.Process().ionice(psutil.IOPRIO_CLASS_IDLE)
+    except (AttributeError, OSError, psutil.Error) as e:
+        logging.warning(f"Could not set idle I/O priority: {e}")
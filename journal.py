@@ -0,0 +1,119 @@
+import logging
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Optional
+
+MAGIC = b'GWSJRNL1'
+HEADER = struct.Struct('<8sQQQ')  # magic, capacity, head, checkpoint
+HEADER_SIZE = 64
+HEAD_OFFSET = 16
+CHECKPOINT_OFFSET = 24
+RECORD = struct.Struct('<II')  # payload length, crc32
+
+
+class RingJournal:
+    """
+    Fixed-size memory-mapped ring of ticks that have not reached the data files yet.
+
+    append() copies a record into the shared mapping and bumps the head, with
+    no syscalls or fsync: the page cache keeps it through a process crash or
+    OOM kill (not through a host power loss). Offsets are logical and only
+    grow; checkpoint() marks everything up to an offset as safely written,
+    and pending() returns what a restart has to replay.
+    """
+
+    def __init__(self, path, capacity: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.skipped = 0
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            existing = None
+            if size >= HEADER_SIZE:
+                existing = HEADER.unpack(os.pread(fd, HEADER.size, 0))
+            if (existing and existing[0] == MAGIC and size == HEADER_SIZE + existing[1]
+                    and (existing[1] == capacity or existing[2] > existing[3])):
+                # Keep the old geometry so pending records can still be read; an empty ring takes the new size
+                capacity = existing[1]
+            else:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, HEADER_SIZE + capacity)
+                os.pwrite(fd, HEADER.pack(MAGIC, capacity, 0, 0), 0)
+            self.mm = mmap.mmap(fd, HEADER_SIZE + capacity)
+        finally:
+            os.close(fd)
+
+        _magic, self.capacity, self.head, self.checkpointed = HEADER.unpack_from(self.mm, 0)
+
+    def used(self) -> int:
+        return self.head - self.checkpointed
+
+    def write_at(self, pos: int, data) -> None:
+        start = pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.mm[HEADER_SIZE + start:HEADER_SIZE + start + first] = data[:first]
+        if first < len(data):
+            self.mm[HEADER_SIZE:HEADER_SIZE + len(data) - first] = data[first:]
+
+    def read_at(self, pos: int, length: int) -> bytes:
+        start = pos % self.capacity
+        first = min(length, self.capacity - start)
+        data = self.mm[HEADER_SIZE + start:HEADER_SIZE + start + first]
+        if first < length:
+            data += self.mm[HEADER_SIZE:HEADER_SIZE + length - first]
+        return data
+
+    def append(self, payload: bytes) -> Optional[int]:
+        """Journal one record; returns its end offset, or None if the ring is full."""
+        size = RECORD.size + len(payload)
+        if self.used() + size > self.capacity:
+            # Never overwrite unflushed records; this one is simply not crash-safe
+            self.skipped += 1
+            return None
+        self.write_at(self.head, RECORD.pack(len(payload), zlib.crc32(payload)))
+        self.write_at(self.head + RECORD.size, payload)
+        self.head += size
+        # Publish the record only after its bytes are in place
+        struct.pack_into('<Q', self.mm, HEAD_OFFSET, self.head)
+        return self.head
+
+    def checkpoint(self, offset: int) -> None:
+        """Everything before offset is in the data files (or spool); it no longer needs replay."""
+        if offset > self.checkpointed:
+            self.checkpointed = min(offset, self.head)
+            struct.pack_into('<Q', self.mm, CHECKPOINT_OFFSET, self.checkpointed)
+
+    def pending(self) -> list:
+        """Return unflushed payloads in order, stopping at the first damaged record."""
+        payloads = []
+        pos = self.checkpointed
+        while pos < self.head:
+            length, crc = RECORD.unpack(self.read_at(pos, RECORD.size))
+            if length > self.head - pos - RECORD.size:
+                logging.error(f"Journal {self.path}: truncated record at offset {pos}, stopping replay")
+                break
+            payload = self.read_at(pos + RECORD.size, length)
+            if zlib.crc32(payload) != crc:
+                logging.error(f"Journal {self.path}: checksum mismatch at offset {pos}, stopping replay")
+                break
+            payloads.append(payload)
+            pos += RECORD.size + length
+        return payloads
+
+    def close(self) -> None:
+        self.mm.flush()
+        self.mm.close()
+
+
+def encode_line(target_name: str, line: str) -> bytes:
+    return target_name.encode('utf-8') + b'\0' + line.encode('utf-8')
+
+
+def decode_line(payload: bytes):
+    target, _, line = payload.partition(b'\0')
+    return target.decode('utf-8'), line.decode('utf-8')
@@ -0,0 +1,140 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+
+class RepeatFilter(logging.Filter):
+    """
+    Lets the first `burst` identical records per `interval` seconds through
+    and counts the rest; summarize() then logs one line per suppressed message.
+
+    Records are identical when level, call site and rendered message match.
+    Runs on the logging thread, before the record is queued, so a flood of
+    repeats costs a dict lookup each instead of queue traffic and disk writes.
+    """
+
+    def __init__(self, interval: float = 60.0, burst: int = 5, max_keys: int = 10000):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.seen = {}  # key -> [window start, records in window, suppressed, last record]
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, 'summary', False):
+            return True
+        key = (record.levelno, record.pathname, record.lineno, record.getMessage())
+        now = time.monotonic()
+        with self.lock:
+            entry = self.seen.get(key)
+            if entry is None or now - entry[0] >= self.interval and not entry[2]:
+                if len(self.seen) >= self.max_keys:
+                    self.seen.clear()  # Unbounded variety of messages; start counting afresh
+                self.seen[key] = [now, 1, 0, record]
+                return True
+            if entry[1] < self.burst:
+                entry[1] += 1
+                return True
+            entry[2] += 1
+            entry[3] = record
+            self.suppressed += 1
+            return False
+
+    def summarize(self, logger: logging.Logger, everything: bool = False) -> None:
+        """Log how often each message was suppressed in its finished window (every window if everything)."""
+        now = time.monotonic()
+        with self.lock:
+            due = [(key, entry) for key, entry in self.seen.items() if everything or now - entry[0] >= self.interval]
+            for key, entry in due:
+                del self.seen[key]
+        for _key, (started, _passed, suppressed, record) in due:
+            if suppressed:
+                logger.log(
+                    record.levelno,
+                    f"Suppressed {suppressed} repeats in the last {now - started:.0f}s of: {record.getMessage()}",
+                    extra={'summary': True},
+                )
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that counts and drops records when the queue is full instead of blocking or raising."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """
+    Root logger -> RepeatFilter -> bounded queue -> QueueListener thread -> file and stdout.
+
+    The threads that log (pybit's callback thread, the flush path) only
+    format the message and enqueue it; the file and console writes happen
+    on the listener thread, so a slow disk or a blocked stdout pipe cannot
+    stall ingestion.
+    """
+
+    def __init__(self, handlers, queue_size: int = 10000, interval: float = 60.0, burst: int = 5,
+                 level: int = logging.INFO):
+        self.queue = queue.Queue(queue_size)
+        self.repeats = RepeatFilter(interval, burst)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.handler.addFilter(self.repeats)
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.level = level
+        self.stopped = threading.Event()
+        self.reported_drops = 0
+
+    def start(self):
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        self.listener.start()
+        threading.Thread(target=self.report, name='log-summary', daemon=True).start()
+        atexit.register(self.stop)  # Write out what is still queued on a clean exit
+        return self
+
+    def report(self):
+        logger = logging.getLogger(__name__)
+        while not self.stopped.wait(self.repeats.interval):
+            self.repeats.summarize(logger)
+            dropped = self.handler.dropped - self.reported_drops
+            if dropped:
+                self.reported_drops += dropped
+                logger.warning(f"Log queue full: dropped {dropped} records", extra={'summary': True})
+
+    def stats(self) -> dict:
+        return {'log_suppressed': self.repeats.suppressed, 'log_dropped': self.handler.dropped}
+
+    def stop(self):
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        self.repeats.summarize(logging.getLogger(__name__), everything=True)
+        try:
+            self.listener.stop()
+        except queue.Full:
+            pass  # No room for the stop sentinel; the listener thread is a daemon and dies with us
+
+
+def setup_logging(log_file, fmt: str, datefmt: str, queue_size: int = 10000, interval: float = 60.0,
+                  burst: int = 5) -> LogPipeline:
+    """File + stdout logging (so docker logs works) behind a queue and the repeat filter."""
+    formatter = logging.Formatter(fmt, datefmt)
+    handlers = [logging.FileHandler(log_file), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return LogPipeline(handlers, queue_size, interval, burst).start()
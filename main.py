@@ -2,6 +2,7 @@ import asyncio
 import json
 import logging
 import os
+import random
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -10,29 +11,202 @@ import threading
 from pybit.unified_trading import WebSocket
 
 from config import *
+from backfill import BackfillWorker, make_http
+from gaps import GapLog, SequenceTracker
+from health import HealthServer
+from iobudget import FlushLatency
+from journal import RingJournal, decode_line, encode_line
+from logpipe import setup_logging
+from pidfile import write_pid_file
+from profiler import SpanRecorder, StackSampler, install_signal_handlers
+from pubsub import TickPublisher
+from rollingstats import RollingStats, RollingStatsCollector
+from segments import writable_segment
+from spool import Spool
+from tickbuffer import FieldProjection, TickBuffer
+from tickertable import TickerTable
+from wsengine import BybitStream, public_url
 
-# Setup logging — file + stdout so docker logs works
+# Logging — file + stdout so docker logs works, written from a background thread
 log_format = '%(asctime)s - %(levelname)s - %(message)s'
 log_datefmt = '%Y-%m-%d %H:%M:%S'
+log_pipeline = None
 
-logging.basicConfig(
-    level=logging.INFO,
-    format=log_format,
-    datefmt=log_datefmt,
-    handlers=[
-        logging.FileHandler(os.path.join(WS_DIR, 'logs', 'ws_log.log')),
-        logging.StreamHandler(),
-    ],
-)
 
-class BybitWebSocketClient:
-    def __init__(self):
+def shard_file(path, shard_id=None) -> str:
+    """<name>_<shard>.<ext> next to path for a shard worker, so no two processes append to the same file."""
+    if not shard_id:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}_{shard_id}{ext}'
+
+
+def start_logging(shard_id=None):
+    """Start this process's logging pipeline, writing ws_data/logs/ws_log[_<shard>].log."""
+    global log_pipeline
+    log_pipeline = setup_logging(
+        shard_file(LOG_FILE, shard_id),
+        log_format,
+        log_datefmt,
+        queue_size=LOG_QUEUE_SIZE,
+        interval=LOG_REPEAT_INTERVAL,
+        burst=LOG_REPEAT_BURST,
+    )
+    return log_pipeline
+
+
+class NotifyingWebSocket(WebSocket):
+    """pybit WebSocket that reports socket closes as they happen instead of waiting to be polled."""
+
+    def __init__(self, on_close=None, on_heartbeat=None, **kwargs):
+        self.on_close_callback = on_close
+        self.on_heartbeat_callback = on_heartbeat
+        super().__init__(**kwargs)
+
+    def _on_pong(self):
+        # Pong to websocket-client's ping: the connection is alive even when the market is quiet
+        if self.on_heartbeat_callback:
+            self.on_heartbeat_callback()
+        super()._on_pong()
+
+    def _on_close(self):
+        super()._on_close()
+        if self.on_close_callback:
+            self.on_close_callback()
+
+
+class Connection:
+    """One WebSocket plus the timestamps and events used to supervise it."""
+
+    def __init__(self, index, loop):
+        self.index = index
+        self.loop = loop
         self.ws = None
+        self.opened_at = time.monotonic()
+        self.last_message_time = 0.0
+        self.last_heartbeat = 0.0  # Last pong; a quiet market is not a stale connection
+        self.first_message = asyncio.Event()
+        self.closed = asyncio.Event()
+
+    def notify_message(self):
+        # Called for every message (on pybit's thread with that engine); only the first one crosses into the loop
+        first = not self.last_message_time
+        self.last_message_time = time.monotonic()
+        if first:
+            self.loop.call_soon_threadsafe(self.first_message.set)
+
+    def notify_heartbeat(self):
+        self.last_heartbeat = time.monotonic()
+
+    def last_activity(self):
+        return max(self.last_message_time, self.last_heartbeat) or self.opened_at
+
+    def notify_close(self):
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.closed.set)
+
+    def is_connected(self):
+        return self.ws is not None and not self.closed.is_set() and self.ws.is_connected()
+
+
+class BybitWebSocketClient:
+    def __init__(self, symbols=None, channel_type=None, shard_id=None, metrics_port=None, health_port=None):
+        # One client per shard; without a shard it is the classic single-process ingester
+        self.symbols = list(symbols or SYMBOLS)
+        self.channel_type = channel_type or CHANNEL_TYPE
+        self.shard_id = shard_id
+        self.file_prefix = f'price_data_{shard_id}' if shard_id else 'price_data'
+        self.messages_received = 0
+        self.entries_written = 0
+        self.connections = [None] * WS_CONNECTIONS
         self.current_file = None
         self.current_date = None
-        self.data_buffer = []
-        self.last_flush_time = datetime.now()
+        schema = (TICK_SCHEMA or {}).get(self.channel_type)
+        projection = FieldProjection(schema) if schema else None
+        self.data_buffer = TickBuffer(BUFFER_SIZE, projection, TICK_KEEP_RAW)
+        self.flush_buffer = TickBuffer(BUFFER_SIZE, projection, TICK_KEEP_RAW)
+        self.buffer_lock = threading.Lock()
+        self.last_flush_time = time.monotonic()
+        self.write_lock = threading.Lock()
+        # Published for the archiver, which backs off while writes slow down
+        self.flush_latency = FlushLatency(PID_DIR, shard_id or 'main', FLUSH_LATENCY_INTERVAL)
+        self.flush_started = 0.0  # monotonic start of the write in progress, 0 when idle
+        self.loop_heartbeat = time.monotonic()
+        self.last_tick_at = {}  # symbol -> monotonic time of its last accepted tick
+        self.unlogged_saves = [0, 0]  # Flushes and entries not yet reported by a "Saved" line
+        self.flush_wanted = None  # asyncio engine: set to wake the writer task (created in run())
+        # On-demand profiling: SIGUSR1/SIGUSR2 or POST /profile, /trace on the health port
+        self.profiler = StackSampler(PROFILE_DIR, shard_id or 'main', PROFILE_INTERVAL)
+        self.tracer = SpanRecorder(PROFILE_DIR, shard_id or 'main', TRACE_CAPACITY, TRACE_ENABLED)
         self.ensure_data_directory()
+
+        # Bounded memory: past BUFFER_MAX_BYTES buffered ticks spill to a local spool
+        self.spool = Spool(Path(SPOOL_DIR) / (shard_id or 'main'), SPOOL_MAX_BYTES)
+        self.record_bytes = 1024.0  # Running estimate of serialized bytes per record
+        self.flush_failures = 0
+        self.next_flush_at = 0.0
+        self.next_spill_at = 0.0
+        self.shedding = False
+        self.overflow_stats = {'spilled_records': 0, 'spilled_bytes': 0, 'drained_records': 0, 'dropped_records': 0}
+
+        # Crash safety: buffered ticks are mirrored into an mmap ring until they are written
+        self.journal = None
+        if JOURNAL_ENABLED:
+            self.journal = RingJournal(Path(JOURNAL_DIR) / f"{shard_id or 'main'}.journal", JOURNAL_SIZE)
+            self.replay_journal()
+
+        # Live consumers subscribe here instead of tailing the data files
+        self.publisher = None
+        if PUBSUB_ENABLED:
+            self.publisher = TickPublisher(Path(PUBSUB_SOCKET_DIR) / f"{shard_id or 'main'}.sock", PUBSUB_QUEUE_SIZE)
+            self.publisher.start()
+
+        # Latest price per symbol for readers that only need the current value
+        self.tickers = None
+        if TICKER_TABLE_ENABLED:
+            self.tickers = TickerTable(Path(TICKER_TABLE_DIR) / f"{shard_id or 'main'}.tickers", self.symbols)
+
+        # Rolling per-symbol stats, queried in process (get_stats) or scraped by Prometheus
+        self.stats = None
+        if STATS_ENABLED:
+            self.stats = RollingStats(STATS_WINDOWS, STATS_CAPACITY)
+            port = STATS_METRICS_PORT if metrics_port is None else metrics_port
+            if port:
+                from prometheus_client import REGISTRY, start_http_server
+
+                try:
+                    REGISTRY.register(RollingStatsCollector(self.stats, shard_id or 'main'))
+                    start_http_server(port)
+                    logging.info(f"Serving rolling stats metrics on port {port}")
+                except (OSError, ValueError) as e:
+                    logging.error(f"Could not serve stats metrics on port {port}: {str(e)}")
+
+        # Liveness/readiness probes (docker healthcheck, orchestrators)
+        self.health_server = None
+        if HEALTH_ENABLED:
+            port = HEALTH_PORT if health_port is None else health_port
+            if port:
+                actions = {'profile': self.toggle_profiler, 'trace': self.toggle_tracer} if CONTROL_ENDPOINTS else None
+                self.health_server = HealthServer(self.health_report, HEALTH_HOST, port, actions)
+                self.health_server.start()
+        gap_fields = {'shard': shard_id, 'category': self.channel_type, 'file_prefix': self.file_prefix}
+        self.gap_log = GapLog(shard_file(GAP_LOG_FILE, shard_id), fields=gap_fields)
+        self.sequencer = SequenceTracker(
+            window=DEDUP_WINDOW,
+            gap_threshold_ms=GAP_THRESHOLD_MS,
+            on_gap=self.handle_gap,
+        )
+        self.backfiller = None
+        if BACKFILL_ENABLED:
+            self.backfiller = BackfillWorker(
+                http=make_http(TESTNET, BACKFILL_REST_ENDPOINT),
+                data_dir=WS_DIR_PATH,
+                category=self.channel_type,
+                file_prefix=self.file_prefix,
+                max_workers=BACKFILL_MAX_WORKERS,
+                rate_per_sec=BACKFILL_RATE_LIMIT,
+            )
+            self.backfiller.start()
         
         # Public mode only
         logging.info("Startup mode: PUBLIC (no API keys)")
@@ -47,128 +221,527 @@ class BybitWebSocketClient:
         current_date = datetime.now().date()
         if self.current_date != current_date:
             self.current_date = current_date
-            file_name = f'price_data_{self.current_date.isoformat()}.jsonl'
+            file_name = f'{self.file_prefix}_{self.current_date.isoformat()}.jsonl'
             self.current_file = Path(WS_DIR_PATH) / file_name
         return self.current_file
 
-    def handle_ticker(self, message):
+    def handle_gap(self, symbol, start_ms, end_ms, reason):
+        gap = self.gap_log.record(symbol, start_ms, end_ms, reason)
+        if self.backfiller:
+            self.backfiller.submit(gap)
+
+    def is_new_message(self, message, source=0):
+        data = message.get('data') or {}
+        symbol = data.get('symbol') or message.get('topic', '').rpartition('.')[2]
+        return self.sequencer.observe(symbol, message.get('cs'), message.get('ts'), source)
+
+    def handle_ticker(self, message, source=0):
+        with self.tracer.span('handle_ticker'):
+            self.process_ticker(message, source)
+
+    def process_ticker(self, message, source):
         try:
+            if not self.is_new_message(message, source):
+                return
+
             current_price = float(message['data']['lastPrice'])
-            timestamp = datetime.now().isoformat()
-            
-            price_entry = {
-                'timestamp': timestamp,
-                'price': current_price,
-                'full_data': message
-            }
-            
-            self.data_buffer.append(price_entry)
-            
-            if len(self.data_buffer) >= BUFFER_SIZE or (datetime.now() - self.last_flush_time).seconds >= FLUSH_INTERVAL:
-                self.save_price_data()
-        
-        except KeyError:
-            logging.error(f"Unexpected message format: {message}")
+            line = None
+
+            with self.buffer_lock:
+                if self.shedding:
+                    # drop_newest overflow policy: memory is full and nothing can take the data
+                    self.overflow_stats['dropped_records'] += 1
+                else:
+                    record = self.data_buffer.append(message, current_price)
+                    if self.journal or self.publisher:
+                        with self.tracer.span('serialize'):
+                            serialized = record.to_line()
+                        if self.journal:
+                            record.jpos = self.journal.append(encode_line(self.get_current_file().name, serialized))
+                        if self.publisher:
+                            line = serialized
+                if self.tickers:
+                    data = message['data']
+                    self.tickers.update(data.get('symbol'), data, message.get('ts'))
+                now = time.monotonic()
+                self.last_tick_at[message['data'].get('symbol')] = now
+                due = len(self.data_buffer) >= BUFFER_SIZE or now - self.last_flush_time >= FLUSH_INTERVAL or self.shedding
+                due = due and now >= self.next_flush_at
+                over = self.buffered_bytes() > BUFFER_MAX_BYTES
+
+            if line:
+                self.publisher.publish(line.encode('utf-8'))
+            if self.stats:
+                self.stats.observe(message['data'].get('symbol'), message.get('ts'), message['data'])
+            if due or over:
+                self.request_flush()
+
+        except KeyError as e:
+            # Only the shape of the message: a feed format change would otherwise log every payload in full
+            logging.error(f"Unexpected message format: missing {e} in {message.get('topic')!r} message with keys {sorted(message)}")
         except Exception as e:
             logging.error(f"Error in handle_ticker: {str(e)}")
 
+    def log_saved(self, count, current_file):
+        # With LOG_SAVE_EVERY > 1 only every Nth flush is logged, with the totals since the last line
+        self.unlogged_saves[0] += 1
+        self.unlogged_saves[1] += count
+        flushes, entries = self.unlogged_saves
+        if flushes >= LOG_SAVE_EVERY:
+            logging.info(f"Saved {entries} entries to {current_file}" + (f" in {flushes} flushes" if flushes > 1 else ""))
+            self.unlogged_saves = [0, 0]
+
+    def replay_journal(self):
+        """
+        Write ticks a previous run buffered but never flushed, before any new data arrives.
+
+        A day the archiver has compressed meanwhile gets its lines in a _late segment instead.
+        """
+        payloads = self.journal.pending()
+        if not payloads:
+            return
+
+        # Group consecutive lines by the file they were meant for, keeping order
+        runs = []
+        for payload in payloads:
+            target, line = decode_line(payload)
+            if runs and runs[-1][0] == target:
+                runs[-1][1].append(line)
+            else:
+                runs.append((target, [line]))
+
+        written = 0
+        try:
+            if self.spool.pending():
+                self.overflow_stats['drained_records'] += self.spool.drain(WS_DIR_PATH)
+            for target, lines in runs:
+                path = writable_segment(Path(WS_DIR_PATH) / target)
+                if path.name != target:
+                    logging.warning(f"{target} is already archived; replaying {len(lines)} entries into {path.name}")
+                with path.open('a') as f:
+                    f.writelines(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+                written += 1
+            logging.warning(f"Replayed {len(payloads)} unflushed entries from {self.journal.path}")
+        except Exception as e:
+            logging.error(f"Error replaying journal into {WS_DIR_PATH}: {str(e)}; spilling to {self.spool.directory}")
+            try:
+                for target, lines in runs[written:]:
+                    self.spool.spill(target, lines)
+            except Exception as e:
+                # Leave the journal as it is; the next start tries again
+                logging.error(f"Error spilling journal to {self.spool.directory}: {str(e)}")
+                return
+        self.journal.checkpoint(self.journal.head)
+
+    def buffered_bytes(self):
+        return int((len(self.data_buffer) + len(self.flush_buffer)) * self.record_bytes)
+
+    def update_record_bytes(self, nbytes, records):
+        if records:
+            self.record_bytes = 0.8 * self.record_bytes + 0.2 * (nbytes / records)
+
+    def request_flush(self):
+        if self.flush_wanted is None:
+            self.save_price_data()  # pybit engine: write on the callback thread
+        else:
+            self.flush_wanted.set()
+
     def save_price_data(self):
-        if not self.data_buffer:
+        # Serializes concurrent flushes from several connection threads (and the writer task)
+        with self.write_lock, self.tracer.span('save_price_data'):
+            self.flush_started = time.monotonic()
+            try:
+                self.write_pending()
+            finally:
+                self.flush_started = 0.0
+
+    def write_pending(self):
+        """Called with write_lock held: move buffered ticks to the data file (or spool)."""
+        with self.buffer_lock:
+            # Hand the filled buffer to the writer; ingestion continues into the emptied one.
+            # Records from a failed earlier flush stay in flush_buffer ahead of the new ones.
+            self.flush_buffer.take(self.data_buffer)
+        if not self.flush_buffer and not self.spool.pending():
+            return
+
+        if time.monotonic() < self.next_flush_at:
+            # Still backing off after a failed write; only keep memory in bounds
+            self.enforce_memory_cap()
             return
 
         try:
+            # Spilled lines are older than anything buffered, so they go first
+            if self.spool.pending():
+                drained = self.spool.drain(WS_DIR_PATH)
+                self.overflow_stats['drained_records'] += drained
+                logging.info(f"Drained {drained} spilled entries back into {WS_DIR_PATH}")
+
             current_file = self.get_current_file()
-            with current_file.open('a') as f:
-                for entry in self.data_buffer:
-                    json.dump(entry, f)
-                    f.write('\n')
+            with self.tracer.span('serialize'):
+                lines = [record.to_line() for record in self.flush_buffer]
+            write_started = time.perf_counter()
+            with self.tracer.span('write'), current_file.open('a') as f:
+                f.writelines(lines)
                 f.flush()
                 os.fsync(f.fileno())
+            self.flush_latency.observe(time.perf_counter() - write_started)
 
-            data_count = len(self.data_buffer)
-            self.data_buffer.clear()
-            self.last_flush_time = datetime.now()
-            logging.info(f"Saved {data_count} entries to {current_file}")
+            data_count = len(self.flush_buffer)
+            self.update_record_bytes(sum(map(len, lines)), data_count)
+            self.entries_written += data_count
+            self.checkpoint_journal()
+            self.flush_buffer.clear()
+            self.last_flush_time = time.monotonic()
+            self.flush_failures = 0
+            self.next_flush_at = 0.0
+            self.shedding = False
+            if data_count:
+                self.log_saved(data_count, current_file)
+            if self.stats:
+                self.stats.flush()
 
         except Exception as e:
-            logging.error(f"Error saving price data: {str(e)}")
+            self.flush_failures += 1
+            delay = min(FLUSH_RETRY_MAX_DELAY, 2 ** (self.flush_failures - 1))
+            self.next_flush_at = time.monotonic() + delay
+            logging.error(f"Error saving price data: {str(e)} (retrying in {delay}s, {self.buffered_bytes()} bytes buffered)")
+            self.enforce_memory_cap()
+
+    def checkpoint_journal(self):
+        # flush_buffer is durable now (data file or spool), so the journal can forget it
+        if self.journal:
+            jpos = self.flush_buffer.last_jpos()
+            if jpos is not None:
+                self.journal.checkpoint(jpos)
+
+    def enforce_memory_cap(self):
+        """Called with write_lock held: spill, then drop, until buffered data fits BUFFER_MAX_BYTES."""
+        if self.buffered_bytes() <= BUFFER_MAX_BYTES:
+            self.shedding = False
+            return
+
+        now = time.monotonic()
+        if now >= self.next_spill_at and self.flush_buffer:
+            try:
+                lines = [record.to_line() for record in self.flush_buffer]
+                nbytes = self.spool.spill(self.get_current_file().name, lines)
+                count = len(self.flush_buffer)
+                self.update_record_bytes(nbytes, count)
+                self.checkpoint_journal()
+                self.flush_buffer.clear()
+                self.overflow_stats['spilled_records'] += count
+                self.overflow_stats['spilled_bytes'] += nbytes
+                self.shedding = False
+                logging.warning(f"Spilled {count} entries ({nbytes} bytes) to {self.spool.directory}")
+                return
+            except Exception as e:
+                self.next_spill_at = now + FLUSH_RETRY_MAX_DELAY
+                logging.error(f"Error spilling to {self.spool.directory}: {str(e)}")
+
+        if BUFFER_OVERFLOW_POLICY == 'drop_oldest':
+            excess = len(self.flush_buffer) - int(BUFFER_MAX_BYTES / self.record_bytes)
+            with self.buffer_lock:
+                excess += len(self.data_buffer)
+            dropped = self.flush_buffer.drop_oldest(max(excess, 0))
+            self.overflow_stats['dropped_records'] += dropped
+            logging.error(f"Memory cap reached: dropped {dropped} oldest entries")
+        else:
+            if not self.shedding:
+                logging.error("Memory cap reached: dropping new entries until writes recover")
+            self.shedding = True
+
+    def connection_domain(self, index):
+        # Spread connections over the configured endpoints (stream.bybit.com, stream.bytick.com, ...)
+        return WS_DOMAINS[index % len(WS_DOMAINS)] if WS_DOMAINS else ""
+
+    def open_connection(self, conn):
+        domain = self.connection_domain(conn.index)
+        logging.info(f"Initializing public WebSocket #{conn.index} (no credentials, domain={domain or 'default'})")
+        conn.ws = NotifyingWebSocket(
+            on_close=conn.notify_close,
+            on_heartbeat=conn.notify_heartbeat,
+            testnet=TESTNET,
+            channel_type=self.channel_type,
+            domain=domain,
+            ping_interval=WS_PING_INTERVAL,
+            ping_timeout=WS_PING_TIMEOUT,
+            # We own reconnects (make-before-break); pybit's own are break-before-make.
+            # retries=2 because pybit raises after its last attempt even when it succeeded.
+            restart_on_error=False,
+            retries=2,
+        )
+
+        # Subscribe to ticker stream (public topic)
+        logging.info(f"Subscribing WebSocket #{conn.index} to public {self.channel_type} ticker stream for symbols: {', '.join(self.symbols)}")
+        conn.ws.ticker_stream(symbol=self.symbols, callback=lambda message: self.handle_message(conn, message))
+        return conn
+
+    async def open_stream(self, conn):
+        """asyncio engine: connect and subscribe on the event loop; messages are handled there too."""
+        url = WS_URL or public_url(self.channel_type, TESTNET, self.connection_domain(conn.index))
+        logging.info(f"Connecting WebSocket #{conn.index} to {url} for {len(self.symbols)} ticker streams")
+        conn.ws = BybitStream(
+            url,
+            [f'tickers.{symbol}' for symbol in self.symbols],
+            on_message=lambda message: self.handle_message(conn, message),
+            on_close=conn.notify_close,
+            on_pong=conn.notify_heartbeat,
+            ping_interval=WS_PING_INTERVAL,
+            ping_timeout=WS_PING_TIMEOUT,
+            subscribe_batch=WS_SUBSCRIBE_BATCH,
+        )
+        await conn.ws.connect(WS_CONNECT_TIMEOUT)
+
+    def handle_message(self, conn, message):
+        conn.notify_message()
+        self.messages_received += 1
+        self.handle_ticker(message, source=conn.index)
+
+    def is_live(self, index):
+        conn = self.connections[index]
+        return conn is not None and conn.is_connected()
+
+    def get_connection_stats(self):
+        stats = self.sequencer.source_stats()
+        return {
+            index: dict(stats.get(index, {}), connected=self.is_live(index))
+            for index in range(len(self.connections))
+        }
+
+    def get_health(self):
+        return {
+            'shard': self.shard_id,
+            'pid': os.getpid(),
+            'channel_type': self.channel_type,
+            'symbols': len(self.symbols),
+            'messages': self.messages_received,
+            'written': self.entries_written,
+            'buffered': len(self.data_buffer) + len(self.flush_buffer),
+            'buffered_bytes': self.buffered_bytes(),
+            'spool_bytes': self.spool.bytes,
+            'journal_bytes': self.journal.used() if self.journal else 0,
+            'journal_skipped': self.journal.skipped if self.journal else 0,
+            'subscribers': self.publisher.stats['subscribers'] if self.publisher else 0,
+            'evicted_subscribers': self.publisher.stats['evicted'] if self.publisher else 0,
+            **self.overflow_stats,
+            'duplicates': self.sequencer.duplicates,
+            **(log_pipeline.stats() if log_pipeline else {}),
+            'connections': self.get_connection_stats(),
+            'time': time.time(),
+        }
+
+    def health_report(self):
+        """Liveness, readiness and the figures behind them; served by HealthServer."""
+        now = time.monotonic()
+        problems = []
+        loop_age = now - self.loop_heartbeat
+        if loop_age > HEALTH_LOOP_TIMEOUT:
+            problems.append(f"event loop unresponsive for {loop_age:.0f}s")
+        flush_age = now - self.flush_started if self.flush_started else 0.0
+        if flush_age > HEALTH_WRITER_STALL:
+            problems.append(f"write stuck for {flush_age:.0f}s")
+        live = not problems
+
+        tick_age = {
+            symbol: round(now - self.last_tick_at[symbol], 3) if symbol in self.last_tick_at else None
+            for symbol in self.symbols
+        }
+        newest = min((age for age in tick_age.values() if age is not None), default=None)
+        # Writer lag: how long the oldest tick not yet on disk has been waiting
+        oldest_ns = None
+        with self.buffer_lock:
+            for buffer in (self.flush_buffer, self.data_buffer):
+                if len(buffer):
+                    oldest_ns = buffer.records[0].ts_ns
+                    break
+        writer_lag = max(0.0, (time.time_ns() - oldest_ns) / 1e9) if oldest_ns else 0.0
+
+        if not any(self.is_live(index) for index in range(len(self.connections))):
+            problems.append("no live connection")
+        if newest is None or newest > HEALTH_MAX_TICK_AGE:
+            problems.append(f"no tick in the last {HEALTH_MAX_TICK_AGE}s")
+        if self.flush_failures:
+            problems.append(f"{self.flush_failures} failed writes in a row")
+        if writer_lag > FLUSH_INTERVAL + HEALTH_WRITER_STALL:
+            problems.append(f"oldest buffered tick waiting {writer_lag:.0f}s")
+
+        return {
+            'live': live,
+            'ready': not problems,
+            'reasons': problems,
+            'shard': self.shard_id,
+            'pid': os.getpid(),
+            'loop_age': round(loop_age, 3),
+            'flush_age': round(flush_age, 3),
+            'tick_age': tick_age,
+            'connections': self.get_connection_stats(),
+            'buffered': len(self.data_buffer) + len(self.flush_buffer),
+            'buffered_bytes': self.buffered_bytes(),
+            'writer_lag': round(writer_lag, 3),
+            'flush_ms': round(self.flush_latency.ewma_ms or 0.0, 3),
+            'last_write_age': round(now - self.last_flush_time, 3),
+            'flush_failures': self.flush_failures,
+            'spool_bytes': self.spool.bytes,
+            'profiling': self.profiler.running,
+            'tracing': self.tracer.enabled,
+            'time': time.time(),
+        }
+
+    def toggle_profiler(self):
+        path = self.profiler.toggle()
+        return {'profiling': self.profiler.running, 'file': path}
+
+    def toggle_tracer(self):
+        summary = self.tracer.summary() if self.tracer.enabled else {}
+        path = self.tracer.toggle()
+        return {'tracing': self.tracer.enabled, 'file': path, 'stages': summary}
+
+    def get_stats(self, symbol=None):
+        """Rolling stats per symbol and window, e.g. get_stats('BTCUSDT')['60s']['vwap']."""
+        return self.stats.query(symbol) if self.stats else {}
+
+    def reconnect_delay(self, attempt):
+        # Exponential backoff with full jitter so redundant connections don't retry in lockstep
+        return random.uniform(0, min(WS_RECONNECT_MAX_DELAY, WS_RECONNECT_DELAY * (2 ** attempt)))
+
+    async def close_connection(self, conn):
+        if conn.ws:
+            try:
+                if isinstance(conn.ws, BybitStream):
+                    await conn.ws.close()
+                else:
+                    await asyncio.to_thread(conn.ws.exit)
+            except Exception:
+                pass
 
     async def run(self):
         # Public mode: no API key checks
         logging.info("Public mode: starting WebSocket without authentication")
+        if WS_CONNECTIONS > 1:
+            logging.info(f"Hot standby: {WS_CONNECTIONS} redundant connections, first arrival wins")
 
-        reconnect_attempts = 0
+        tasks = [
+            *(self.maintain_connection(index) for index in range(WS_CONNECTIONS)),
+            self.report_connection_stats(),
+            self.heartbeat(),
+        ]
+        if WS_ENGINE == 'asyncio':
+            logging.info("WebSocket engine: asyncio (all connections on the event loop)")
+            self.flush_wanted = asyncio.Event()
+            tasks.append(self.writer())
+        await asyncio.gather(*tasks)
 
+    async def heartbeat(self):
+        # /live reports the loop as stalled when this stops ticking
         while True:
-            try:
-                # Public WebSocket (no credentials)
-                logging.info("Initializing public WebSocket (no credentials)")
-                self.ws = WebSocket(
-                    testnet=TESTNET,
-                    channel_type="linear",
-                )
+            self.loop_heartbeat = time.monotonic()
+            await asyncio.sleep(1)
 
-                # Subscribe to ticker stream (public topic)
-                logging.info(f"Subscribing to public ticker stream for symbol: {SYMBOL}")
-                self.ws.ticker_stream(symbol=SYMBOL, callback=self.handle_ticker)
-
-                # Reset reconnect attempts on successful connection
-                reconnect_attempts = 0
-                last_data_time = datetime.now()
-
-                # Keep the connection alive, but detect dead connections.
-                # pybit's internal reconnect can silently give up after DNS
-                # failures (all retries fire within ~1s, exhaust limit, then
-                # the exception is raised in pybit's thread — never reaches
-                # our except block).  We poll is_connected() to catch this.
-                while True:
-                    await asyncio.sleep(5)
-
-                    # Check if pybit still has a live socket
-                    if not self.ws.is_connected():
-                        logging.warning("WebSocket disconnected (is_connected=False), triggering reconnect")
-                        break
-
-                    # Track data freshness — if no data for 60s the stream is stale
-                    if self.data_buffer or self.last_flush_time > last_data_time:
-                        last_data_time = datetime.now()
-                    elif (datetime.now() - last_data_time).total_seconds() > 60:
-                        logging.warning("No data received for 60s, triggering reconnect")
-                        break
+    async def writer(self):
+        # asyncio engine: ticks are parsed and buffered on the loop; the write + fsync runs off it,
+        # so a slow disk delays the flush but not the sockets
+        while True:
+            await self.flush_wanted.wait()
+            self.flush_wanted.clear()
+            await asyncio.to_thread(self.save_price_data)
 
+    async def maintain_connection(self, index):
+        loop = asyncio.get_running_loop()
+        attempt = 0
+
+        while True:
+            # Make: open and subscribe the replacement while the old connection (if any) keeps streaming
+            conn = Connection(index, loop)
+            try:
+                if WS_ENGINE == 'asyncio':
+                    await self.open_stream(conn)
+                else:
+                    # pybit blocks until connected and subscribed; keep the loop free for other connections
+                    await asyncio.to_thread(self.open_connection, conn)
             except Exception as e:
-                logging.error(f"WebSocket error: {str(e)}")
+                logging.error(f"WebSocket #{index} error: {str(e)}")
+                asyncio.create_task(self.close_connection(conn))
+                wait_time = self.reconnect_delay(attempt)
+                attempt += 1
+                logging.info(f"Reconnecting WebSocket #{index} in {wait_time:.2f}s (attempt {attempt})")
+                await asyncio.sleep(wait_time)
+                continue
 
-            # Clean up old connection before reconnecting
-            if self.ws:
+            old = self.connections[index]
+            if old is not None:
+                # Break only once the new connection is actually delivering
                 try:
-                    self.ws.exit()
-                except Exception:
+                    await asyncio.wait_for(conn.first_message.wait(), WS_HANDOVER_TIMEOUT)
+                except asyncio.TimeoutError:
+                    logging.warning(f"WebSocket #{index}: no data on replacement within {WS_HANDOVER_TIMEOUT}s, switching anyway")
+                asyncio.create_task(self.close_connection(old))
+            self.connections[index] = conn
+            attempt = 0
+
+            reason = await self.watch_connection(conn)
+            if reason != "disconnect":
+                # Stale or due for rotation: leave it in place until the replacement is up
+                logging.info(f"WebSocket #{index} {reason}, opening replacement before closing it")
+                continue
+
+            logging.warning(f"WebSocket #{index} disconnected, reconnecting")
+            self.connections[index] = None
+            asyncio.create_task(self.close_connection(conn))
+
+            # Only a gap if no other connection is still delivering the same topics
+            if not any(self.is_live(other) for other in range(len(self.connections))):
+                self.sequencer.mark_disconnect(reason)
+
+            await asyncio.sleep(self.reconnect_delay(attempt))
+            attempt += 1
+
+    async def watch_connection(self, conn):
+        """Wait until the connection closes, goes stale (no message and no pong) or is due for rotation."""
+        while True:
+            deadline = conn.last_activity() + WS_STALE_TIMEOUT
+            if WS_MAX_CONNECTION_AGE:
+                deadline = min(deadline, conn.opened_at + WS_MAX_CONNECTION_AGE)
+            timeout = deadline - time.monotonic()
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(conn.closed.wait(), timeout)
+                except asyncio.TimeoutError:
                     pass
-                self.ws = None
 
-            reconnect_attempts += 1
-            if reconnect_attempts <= MAX_RECONNECT_ATTEMPTS:
-                wait_time = WS_RECONNECT_DELAY * reconnect_attempts
-                logging.info(f"Reconnecting in {wait_time}s (attempt {reconnect_attempts}/{MAX_RECONNECT_ATTEMPTS})")
-                await asyncio.sleep(wait_time)
-            else:
-                logging.error(f"Max reconnect attempts reached. Cooling down for {ERROR_COOLDOWN_TIME}s")
-                await asyncio.sleep(ERROR_COOLDOWN_TIME)
-                reconnect_attempts = 0
-
-def healthcheck():
-    # Return True if runtime appears healthy; minimal check:
-    # - data directory exists
-    # - SYMBOL is a non-empty string
-    # More elaborate checks would require internal state.
-    try:
-        import os
-        from config import WS_DIR_PATH, SYMBOL
-        return bool(SYMBOL) and os.path.isdir(WS_DIR_PATH)
-    except Exception:
-        return False
+            now = time.monotonic()
+            if conn.closed.is_set() or not conn.is_connected():
+                return "disconnect"
+            if now - conn.last_activity() >= WS_STALE_TIMEOUT:
+                return "stale"
+            if WS_MAX_CONNECTION_AGE and now - conn.opened_at >= WS_MAX_CONNECTION_AGE:
+                return "due for rotation"
+
+    async def report_connection_stats(self):
+        while True:
+            await asyncio.sleep(CONNECTION_STATS_INTERVAL)
+            stats = self.get_connection_stats()
+            for index, conn in stats.items():
+                logging.info(
+                    f"WebSocket #{index}: connected={conn['connected']} leads={conn.get('leads', 0)} "
+                    f"lags={conn.get('lags', 0)} lag_ms_avg={conn.get('lag_ms_avg', 0.0):.1f} "
+                    f"lag_ms_max={conn.get('lag_ms_max', 0.0):.1f}"
+                )
+            try:
+                path = CONNECTION_STATS_FILE
+                if self.shard_id:
+                    path = path.replace('.json', f'_{self.shard_id}.json')
+                tmp = path + '.part'
+                with open(tmp, 'w') as f:
+                    json.dump({'updated_at': datetime.now().isoformat(), 'connections': stats}, f)
+                os.replace(tmp, path)
+            except Exception as e:
+                logging.error(f"Error writing connection stats: {str(e)}")
 
 if __name__ == "__main__":
+    start_logging()
+    write_pid_file(PID_DIR, 'main')
     client = BybitWebSocketClient()
+    install_signal_handlers(client.profiler, client.tracer)
     asyncio.run(client.run())
@@ -2,36 +2,297 @@ from prometheus_client import start_http_server, Counter, Gauge
 import psutil
 import time
 import os
+import json
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from config import MONITOR_DAYS, MONITOR_INTERVAL, MONITOR_PORT, PID_DIR, SCRUB_STATUS_FILE, WS_DIR_PATH
+from pidfile import read_pid_files
+
+# Same setting the archiver reads: days kept uncompressed before a file is due for archiving
+ARCHIVER_UNCOMPRESSED_DAYS = int(os.environ.get("ARCHIVER_UNCOMPRESSED_DAYS", "2"))
+TAIL_BYTES = 16 * 1024  # Read this much from the end of the newest file to find the last tick
 
 # Metrics
 WS_DATA_FILES = Gauge('ws_data_files', 'Number of data files')
+ARCHIVED_FILES = Gauge('ws_data_archived_files', 'Number of archived (.jsonl.xz) data files')
 MEMORY_USAGE = Gauge('getws_memory_mb', 'Memory usage in MB')
 CPU_USAGE = Gauge('getws_cpu_percent', 'CPU usage percentage')
+PROCESSES = Gauge('getws_processes', 'Running ingester processes found through pid files')
+DAY_BYTES = Gauge('ws_data_day_bytes', 'Bytes on disk per day', ['day', 'kind'])
+UNCOMPRESSED_BYTES = Gauge('ws_data_uncompressed_bytes', 'Bytes in uncompressed .jsonl files')
+ARCHIVED_BYTES = Gauge('ws_data_archived_bytes', 'Bytes in .jsonl.xz archives')
+COMPRESSION_RATIO = Gauge('ws_data_compression_ratio', 'Original / compressed bytes over archived files')
+NEWEST_TICK_AGE = Gauge('ws_data_newest_tick_age_seconds', 'Age of the last tick written to disk')
+BACKLOG_FILES = Gauge('archiver_backlog_files', 'Data files old enough to be archived but still uncompressed')
+BACKLOG_BYTES = Gauge('archiver_backlog_bytes', 'Bytes in data files waiting for the archiver')
+UPDATE_SECONDS = Gauge('monitor_update_seconds', 'Time the last monitor update took')
+RESCANS = Counter('monitor_directory_rescans', 'Full listings of the data directory')
+SCRUB_CORRUPT = Gauge('archive_scrub_corrupt_files', 'Archives that failed their last integrity check')
+SCRUB_UNVERIFIABLE = Gauge('archive_scrub_unverifiable_files', 'Archives without a manifest to check against')
+SCRUB_OVERDUE = Gauge('archive_scrub_overdue_files', 'Archives due for a check that the last pass did not reach')
+SCRUB_NEVER = Gauge('archive_scrub_never_verified_files', 'Archives the scrubber has not checked yet')
+SCRUB_OLDEST_AGE = Gauge('archive_scrub_oldest_verification_age_seconds', 'Time since the least recently verified archive was checked')
+SCRUB_LAST_PASS = Gauge('archive_scrub_last_pass_timestamp_seconds', 'When the last scrub pass finished')
+
+
+def classify(name: str):
+    """(kind, day) for price_data files: kind is 'jsonl', 'xz' or 'hash' (original checksum); None otherwise."""
+    if not name.startswith('price_data'):
+        return None
+    if name.endswith('.jsonl'):
+        kind = 'jsonl'
+    elif name.endswith('.jsonl.xz'):
+        kind = 'xz'
+    elif name.endswith('.jsonl.sha256'):
+        kind = 'hash'
+    else:
+        return None
+    try:
+        return kind, date.fromisoformat(name.split('.', 1)[0].rsplit('_', 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def read_original_size(path: Path):
+    # The archiver's "<hex>  <name>  <size>" line for the .jsonl records its size before compression
+    try:
+        return int(path.read_text().split()[-1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class DataDirStats:
+    """
+    Incrementally maintained totals for the data directory.
+
+    The directory is only listed again when its mtime changes (a file was
+    created, renamed or removed); otherwise just the uncompressed .jsonl
+    files, the only ones still growing, are stat'ed. Archives never
+    change once written, so their number does not affect the cost.
+    """
+
+    def __init__(self, path, keep_days: int = ARCHIVER_UNCOMPRESSED_DAYS):
+        self.path = Path(path)
+        self.keep_days = keep_days
+        self.dir_mtime_ns = None
+        self.files = {}  # name -> (kind, day, size, mtime)
+        self.jsonl = set()  # Names of the uncompressed files, the only ones that still change
+        self.original_sizes = {}  # .jsonl name -> size before compression
+        self.days = defaultdict(lambda: {'jsonl': 0, 'xz': 0})
+        self.totals = defaultdict(int)
+        self.tail = (None, None, None)  # (file name, mtime, last tick time) of the newest file
+
+    def pair(self, base: str, sign: int) -> None:
+        # Compression ratio only counts archives whose original size is known
+        xz = self.files.get(base + '.xz')
+        original = self.original_sizes.get(base)
+        if xz and original is not None:
+            self.totals['archived_original'] += sign * original
+            self.totals['archived_paired'] += sign * xz[2]
+
+    def add(self, name: str, kind: str, day: date, size: int, mtime: float) -> None:
+        if kind == 'hash':
+            base = name[:-len('.sha256')]
+            original = read_original_size(self.path / name)
+            self.files[name] = (kind, day, size, mtime)
+            if original is not None:
+                self.original_sizes[base] = original
+                self.pair(base, +1)
+            return
+        self.files[name] = (kind, day, size, mtime)
+        if kind == 'jsonl':
+            self.jsonl.add(name)
+        self.days[day][kind] += size
+        self.totals[kind] += size
+        self.totals[f'{kind}_files'] += 1
+        if kind == 'xz':
+            self.pair(name[:-len('.xz')], +1)
+
+    def remove(self, name: str) -> None:
+        kind, day, size, _mtime = self.files[name]
+        if kind == 'hash':
+            base = name[:-len('.sha256')]
+            self.pair(base, -1)
+            self.original_sizes.pop(base, None)
+            del self.files[name]
+            return
+        if kind == 'xz':
+            self.pair(name[:-len('.xz')], -1)
+        del self.files[name]
+        self.jsonl.discard(name)
+        self.days[day][kind] -= size
+        self.totals[kind] -= size
+        self.totals[f'{kind}_files'] -= 1
+        if not any(self.days[day].values()):
+            del self.days[day]
+
+    def update_file(self, name: str, kind: str, day: date) -> None:
+        try:
+            st = os.stat(self.path / name)
+        except FileNotFoundError:
+            if name in self.files:
+                self.remove(name)
+            return
+        known = self.files.get(name)
+        if known and known[2] == st.st_size and known[3] == st.st_mtime:
+            return
+        if known:
+            self.remove(name)
+        self.add(name, kind, day, st.st_size, st.st_mtime)
 
-def get_process_metrics():
-    for proc in psutil.process_iter(['pid', 'name']):
-        if 'python' in proc.info['name']:
+    def refresh(self) -> None:
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        if mtime_ns != self.dir_mtime_ns:
+            self.dir_mtime_ns = mtime_ns
+            RESCANS.inc()
+            seen = set()
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    parsed = classify(entry.name)
+                    if parsed is None:
+                        continue
+                    seen.add(entry.name)
+                    # Known archives and checksums are immutable; new names and .jsonl files get a stat
+                    if entry.name not in self.files or parsed[0] == 'jsonl':
+                        self.update_file(entry.name, *parsed)
+            for name in [n for n in self.files if n not in seen]:
+                self.remove(name)
+        else:
+            for name in list(self.jsonl):
+                self.update_file(name, 'jsonl', self.files[name][1])
+
+    def newest_tick_time(self):
+        """Local time of the last tick in the most recently written .jsonl (cached per mtime)."""
+        newest = max(((self.files[name][3], name) for name in self.jsonl), default=None)
+        if newest is None:
+            return None
+        mtime, name = newest
+        if self.tail[:2] == (name, mtime):
+            return self.tail[2]
+        tick_time = None
+        try:
+            with open(self.path / name, 'rb') as f:
+                f.seek(max(0, os.fstat(f.fileno()).st_size - TAIL_BYTES))
+                for line in reversed(f.read().splitlines()):
+                    start = line.find(b'"timestamp": "')
+                    if start >= 0:
+                        start += len(b'"timestamp": "')
+                        stamp = line[start:line.index(b'"', start)].decode()
+                        tick_time = datetime.fromisoformat(stamp).timestamp()
+                        break
+        except (OSError, ValueError):
+            pass
+        self.tail = (name, mtime, tick_time)
+        return tick_time
+
+    def backlog(self):
+        cutoff = date.today() - timedelta(days=self.keep_days)
+        files = nbytes = 0
+        for name in self.jsonl:
+            _kind, day, size, _mtime = self.files[name]
+            if day < cutoff:
+                files += 1
+                nbytes += size
+        return files, nbytes
+
+
+class IngesterProcesses:
+    """Finds main.py / supervisor / shard workers through their pid files instead of scanning the process table."""
+
+    def __init__(self, pid_dir):
+        self.pid_dir = pid_dir
+        self.processes = {}  # name -> psutil.Process, kept so cpu_percent() measures between updates
+
+    def update(self):
+        pids = read_pid_files(self.pid_dir)
+        for name in [n for n in self.processes if n not in pids or self.processes[n].pid != pids[n]]:
+            del self.processes[name]
+        for name, pid in pids.items():
+            if name not in self.processes:
+                try:
+                    self.processes[name] = psutil.Process(pid)
+                    self.processes[name].cpu_percent()  # First call only sets the baseline
+                except psutil.Error:
+                    continue
+        rss = cpu = 0.0
+        running = 0
+        for name, process in list(self.processes.items()):
             try:
-                p = psutil.Process(proc.info['pid'])
-                if 'main.py' in ' '.join(p.cmdline()):
-                    MEMORY_USAGE.set(p.memory_info().rss / 1024 / 1024)
-                    CPU_USAGE.set(p.cpu_percent())
-            except:
-                pass
-
-def count_data_files():
+                if not process.is_running():
+                    raise psutil.NoSuchProcess(process.pid)
+                with process.oneshot():
+                    rss += process.memory_info().rss
+                    cpu += process.cpu_percent()
+                running += 1
+            except psutil.Error:
+                del self.processes[name]  # Stale pid file; the process is gone
+        return running, rss, cpu
+
+
+def get_process_metrics(processes: IngesterProcesses):
+    running, rss, cpu = processes.update()
+    PROCESSES.set(running)
+    MEMORY_USAGE.set(rss / 1024 / 1024)
+    CPU_USAGE.set(cpu)
+
+
+def report_data_dir(stats: DataDirStats, reported_days: set):
+    stats.refresh()
+    WS_DATA_FILES.set(stats.totals['jsonl_files'])
+    ARCHIVED_FILES.set(stats.totals['xz_files'])
+    UNCOMPRESSED_BYTES.set(stats.totals['jsonl'])
+    ARCHIVED_BYTES.set(stats.totals['xz'])
+    if stats.totals['archived_paired']:
+        COMPRESSION_RATIO.set(stats.totals['archived_original'] / stats.totals['archived_paired'])
+
+    today = date.today()
+    recent = {today - timedelta(days=n) for n in range(MONITOR_DAYS + 1)} & stats.days.keys()
+    for day in reported_days - recent:
+        for kind in ('jsonl', 'xz'):
+            DAY_BYTES.remove(day.isoformat(), kind)
+    for day in recent:
+        for kind, size in stats.days[day].items():
+            DAY_BYTES.labels(day.isoformat(), kind).set(size)
+    reported_days.clear()
+    reported_days.update(recent)
+
+    tick_time = stats.newest_tick_time()
+    if tick_time is not None:
+        NEWEST_TICK_AGE.set(max(0.0, time.time() - tick_time))
+    files, nbytes = stats.backlog()
+    BACKLOG_FILES.set(files)
+    BACKLOG_BYTES.set(nbytes)
+
+
+def report_scrub(path=SCRUB_STATUS_FILE):
     try:
-        data_path = '/home/getws/get_ws_data_crypto/ws_data'
-        files = [f for f in os.listdir(data_path) if f.endswith('.jsonl')]
-        count = len(files)
-        WS_DATA_FILES.set(count)
-        print(f"Found {count} files in {data_path}")  # Debug logging
-    except Exception as e:
-        print(f"Error counting files: {str(e)}")
-        WS_DATA_FILES.set(0)
+        with open(path) as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        return  # Scrubber has not run yet
+    SCRUB_CORRUPT.set(len(status.get('corrupt', [])))
+    SCRUB_UNVERIFIABLE.set(len(status.get('unverifiable', [])))
+    SCRUB_OVERDUE.set(status.get('overdue', 0))
+    SCRUB_NEVER.set(status.get('never_verified', 0))
+    if status.get('oldest_verified_at'):
+        SCRUB_OLDEST_AGE.set(time.time() - status['oldest_verified_at'])
+    SCRUB_LAST_PASS.set(status.get('updated_at', 0))
+
+
 if __name__ == '__main__':
-    start_http_server(9091)
+    start_http_server(MONITOR_PORT)
+    stats = DataDirStats(WS_DIR_PATH)
+    processes = IngesterProcesses(PID_DIR)
+    reported_days = set()
     while True:
-        get_process_metrics()
-        count_data_files()
-        time.sleep(15)
+        started = time.perf_counter()
+        try:
+            get_process_metrics(processes)
+            report_data_dir(stats, reported_days)
+            report_scrub()
+        except Exception as e:
+            print(f"Error updating metrics: {str(e)}")
+        UPDATE_SECONDS.set(time.perf_counter() - started)
+        time.sleep(MONITOR_INTERVAL)
@@ -0,0 +1,393 @@
+"""
+Monthly per-symbol packs of the archived tick files.
+
+Daily price_data[_<shard>]_YYYY-MM-DD.jsonl.xz archives each start with a
+cold dictionary and interleave every symbol. Once a month is closed and
+fully archived, pack_month() regroups its lines by symbol into one file
+per symbol:
+
+    ws_data/packs/2024-01/BTCUSDT.jsonl.xz
+    ws_data/packs/2024-01/manifest.json         per-day index, hashes, sources, report
+    ws_data/packs/2024-01/manifest.json.sha256
+
+A pack is a sequence of xz streams holding PACK_BLOCK_DAYS days each with
+a dictionary of up to PACK_DICT_SIZE, so `xz -dc` still reads the whole
+pack while read_day() only decompresses the stream that holds the day.
+Lines are kept byte for byte; within a day they stay in file order.
+
+Run: python packs.py [--month 2024-01] [--block-days N] [--workers N] [--delete-sources] [--force]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import lzma
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+
+from config import (PACK_BLOCK_DAYS, PACK_DELETE_SOURCES, PACK_DICT_SIZE, PACK_DIR, PACK_PRESET, PACK_WORKERS,
+                    WS_DIR_PATH)
+
+FORMAT_VERSION = 1
+CHUNK_SIZE = 4 * 1024 * 1024
+TOPIC = re.compile(rb'"topic": "([^"]*)"')
+
+
+def day_of(path: Path):
+    """Date of a daily archive price_data[_<shard>]_YYYY-MM-DD.jsonl.xz; None for anything else."""
+    if not path.name.startswith('price_data') or not path.name.endswith('.jsonl.xz'):
+        return None
+    try:
+        return date.fromisoformat(path.name.split('.', 1)[0].rsplit('_', 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def find_closed_months(data_dir=WS_DIR_PATH, today: date = None) -> dict:
+    """
+    {'YYYY-MM': {day: [archives]}} for months before the current one with no unarchived .jsonl left.
+
+    Archives the archiver offloaded to the cold tier and pruned are listed
+    through the .jsonl.xz.sha256 manifests it keeps locally; their paths
+    do not exist and pack_month() reads them through a coldstore reader.
+    """
+    today = today or date.today()
+    current = today.strftime('%Y-%m')
+    months, open_months = {}, set()
+    for path in sorted(Path(data_dir).iterdir()):
+        if path.name.endswith('.jsonl') and path.name.startswith('price_data'):
+            open_months.add(path.name.rsplit('_', 1)[-1][:7])  # Still waiting for the archiver
+            continue
+        if path.name.endswith('.jsonl.xz.sha256'):
+            path = path.with_name(path.name[:-len('.sha256')])
+            if path.exists():
+                continue  # Listed through the archive itself
+        day = day_of(path)
+        if day:
+            months.setdefault(day.strftime('%Y-%m'), {}).setdefault(day, []).append(path)
+    return {m: days for m, days in sorted(months.items()) if m < current and m not in open_months}
+
+
+def symbol_of(line: bytes) -> str:
+    # tickers.BTCUSDT, kline.1.BTCUSDT, publicTrade.BTCUSDT; parsing JSON is only the fallback
+    match = TOPIC.search(line)
+    if match:
+        return match.group(1).decode().rpartition('.')[2]
+    try:
+        data = json.loads(line)['full_data'].get('data') or {}
+        return data.get('symbol') or 'unknown'
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return 'unknown'
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open('rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def open_source(path: Path, reader=None):
+    """A daily archive, from ws_data/ or, once pruned, through the cold tier reader."""
+    if path.exists() or reader is None:
+        return lzma.open(path, 'rb')
+    return reader.open(path.name)
+
+
+def source_info(path: Path) -> dict:
+    """name, size and sha256 of a source archive; a pruned one is described by its local manifest."""
+    if path.exists():
+        return {'name': path.name, 'size': path.stat().st_size, 'sha256': file_sha256(path)}
+    # Same "<hex>  <name>  <size>" line the archiver writes
+    parts = path.with_name(path.name + '.sha256').read_text().split()
+    return {'name': path.name, 'size': int(parts[-1]), 'sha256': parts[0]}
+
+
+def split_month(days: dict, work_dir: Path, reader=None):
+    """
+    Regroup a month's lines by symbol into gzip'd temp files (cheap to keep many open).
+    Returns ({symbol: {day: [offset, length, lines, sha256]}}, source line count).
+    """
+    writers, offsets, index = {}, {}, {}
+    total = 0
+    try:
+        for day in sorted(days):
+            hashes = {}
+            for path in sorted(days[day]):
+                with open_source(path, reader) as f:
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            line += b'\n'  # Torn last line of a crashed writer; keep it, but as a line
+                        symbol = symbol_of(line)
+                        writer = writers.get(symbol)
+                        if writer is None:
+                            writer = writers[symbol] = gzip.open(work_dir / f'{symbol}.gz', 'wb', compresslevel=1)
+                            offsets[symbol] = 0
+                            index[symbol] = {}
+                        entry = index[symbol].get(day.isoformat())
+                        if entry is None:
+                            entry = index[symbol][day.isoformat()] = [offsets[symbol], 0, 0, None]
+                            hashes[symbol] = hashlib.sha256()
+                        writer.write(line)
+                        hashes[symbol].update(line)
+                        entry[1] += len(line)
+                        entry[2] += 1
+                        offsets[symbol] += len(line)
+                        total += 1
+            for symbol, h in hashes.items():
+                index[symbol][day.isoformat()][3] = h.hexdigest()
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return index, total
+
+
+def write_pack(symbol: str, tmp_path: Path, days: dict, out_path: Path, block_days: int,
+               dict_size: int, preset: int) -> dict:
+    """Compress one symbol's month into consecutive xz streams of block_days days; returns its manifest entry."""
+    names = sorted(days)
+    entries = {}
+    with gzip.open(tmp_path, 'rb') as src, out_path.open('wb') as out:
+        for start in range(0, len(names), block_days):
+            block = names[start:start + block_days]
+            block_bytes = sum(days[d][1] for d in block)
+            # A dictionary larger than the data only costs encoder memory
+            size = max(1 << 20, min(dict_size, 1 << max(block_bytes - 1, 1).bit_length()))
+            compressor = lzma.LZMACompressor(
+                format=lzma.FORMAT_XZ, check=lzma.CHECK_CRC64,
+                filters=[{'id': lzma.FILTER_LZMA2, 'preset': preset, 'dict_size': size}],
+            )
+            stream_offset = out.tell()
+            position = 0
+            for d in block:
+                _offset, length, lines, digest = days[d]
+                remaining = length
+                while remaining:
+                    chunk = src.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise EOFError(f"{tmp_path} ended early")
+                    out.write(compressor.compress(chunk))
+                    remaining -= len(chunk)
+                entries[d] = {'stream_offset': stream_offset, 'offset': position, 'length': length,
+                              'lines': lines, 'sha256': digest}
+                position += length
+            out.write(compressor.flush())
+            stream_size = out.tell() - stream_offset
+            for d in block:
+                entries[d]['stream_size'] = stream_size
+        out.flush()
+        os.fsync(out.fileno())
+    return {
+        'file': out_path.name,
+        'size': out_path.stat().st_size,
+        'sha256': file_sha256(out_path),
+        'raw_bytes': sum(days[d][1] for d in names),
+        'lines': sum(days[d][2] for d in names),
+        'days': entries,
+    }
+
+
+def read_stream(pack_path: Path, entry: dict) -> bytes:
+    with pack_path.open('rb') as f:
+        f.seek(entry['stream_offset'])
+        return lzma.decompress(f.read(entry['stream_size']), format=lzma.FORMAT_XZ)
+
+
+def verify_pack(pack_path: Path, pack: dict) -> bool:
+    """Whole-file hash plus every day's bytes against the index."""
+    if file_sha256(pack_path) != pack['sha256']:
+        return False
+    streams = {}
+    for day, entry in pack['days'].items():
+        key = entry['stream_offset']
+        if key not in streams:
+            streams = {key: read_stream(pack_path, entry)}  # Days of a stream are consecutive; keep one
+        data = streams[key][entry['offset']:entry['offset'] + entry['length']]
+        if len(data) != entry['length'] or hashlib.sha256(data).hexdigest() != entry['sha256']:
+            return False
+    return True
+
+
+def measure_read_cost(month_dir: Path, packs: dict, samples: int = 10) -> dict:
+    """What extracting one day of one symbol costs: compressed bytes read, bytes decompressed, time."""
+    picks = [(p, d) for p in packs.values() for d in p['days']]
+    picks = picks[::max(1, len(picks) // samples)][:samples]
+    if not picks:
+        return {}
+    timings = []
+    for pack, day in picks:
+        started = time.perf_counter()
+        read_stream(month_dir / pack['file'], pack['days'][day])
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    entries = [p['days'][d] for p, d in picks]
+    return {
+        'samples': len(picks),
+        'compressed_bytes_per_day': sum(e['stream_size'] for e in entries) // len(entries),
+        'decompressed_bytes_per_day': sum(e['offset'] + e['length'] for e in entries) // len(entries),
+        'ms_p50': round(timings[len(timings) // 2] * 1000, 1),
+        'ms_max': round(timings[-1] * 1000, 1),
+    }
+
+
+def write_json(path: Path, data) -> str:
+    text = json.dumps(data, indent=1)
+    path.write_text(text)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def pack_month(month: str, days: dict, out_dir=PACK_DIR, block_days: int = PACK_BLOCK_DAYS,
+               dict_size: int = PACK_DICT_SIZE, preset: int = PACK_PRESET, workers: int = PACK_WORKERS,
+               delete_sources: bool = PACK_DELETE_SOURCES, force: bool = False, reader=None):
+    """
+    Pack one closed month ({day: [archives]}); returns the manifest, or None if already packed.
+
+    reader (coldstore.ArchiveReader) fetches the archives already pruned to
+    the cold tier; without one a month with pruned days is refused rather
+    than packed partially.
+    """
+    month_dir = Path(out_dir) / month
+    if month_dir.exists() and not force:
+        return None
+    sources = [path for day in sorted(days) for path in sorted(days[day])]
+    pruned = [p.name for p in sources if not p.exists()]
+    if pruned and reader is None:
+        raise RuntimeError(f"Cannot pack {month}: {len(pruned)} archives are only in the cold tier "
+                           f"(e.g. {pruned[0]}); set ARCHIVER_COLD_URL")
+    work_dir = Path(out_dir) / f'{month}.part'
+    shutil.rmtree(work_dir, ignore_errors=True)
+    (work_dir / 'tmp').mkdir(parents=True)
+    started = time.monotonic()
+
+    index, source_lines = split_month(days, work_dir / 'tmp', reader)
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            symbol: pool.submit(write_pack, symbol, work_dir / 'tmp' / f'{symbol}.gz', symbol_days,
+                                work_dir / f'{symbol}.jsonl.xz', block_days, dict_size, preset)
+            for symbol, symbol_days in index.items()
+        }
+        packs = {symbol: future.result() for symbol, future in sorted(futures.items())}
+    shutil.rmtree(work_dir / 'tmp')
+
+    bad = [s for s, pack in packs.items() if not verify_pack(work_dir / pack['file'], pack)]
+    packed_lines = sum(pack['lines'] for pack in packs.values())
+    if bad or packed_lines != source_lines:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise RuntimeError(f"Pack verification failed for {month}: symbols={bad} lines {packed_lines}/{source_lines}")
+
+    source_list = [source_info(p) for p in sources]
+    source_bytes = sum(s['size'] for s in source_list)
+    pack_bytes = sum(pack['size'] for pack in packs.values())
+    manifest = {
+        'version': FORMAT_VERSION,
+        'month': month,
+        'block_days': block_days,
+        'dict_size': dict_size,
+        'preset': preset,
+        'verified_at': time.time(),
+        'sources': source_list,
+        'packs': packs,
+        'report': {
+            'lines': source_lines,
+            'raw_bytes': sum(pack['raw_bytes'] for pack in packs.values()),
+            'source_bytes': source_bytes,
+            'pack_bytes': pack_bytes,
+            'saved_bytes': source_bytes - pack_bytes,
+            'saved_ratio': round(1 - pack_bytes / source_bytes, 4) if source_bytes else 0.0,
+            'pack_seconds': round(time.monotonic() - started, 1),
+            'read_cost': measure_read_cost(work_dir, packs),
+        },
+    }
+    digest = write_json(work_dir / 'manifest.json', manifest)
+    # Same "<hex>  <name>  <size>" line the archiver writes next to its archives
+    (work_dir / 'manifest.json.sha256').write_text(
+        f"{digest}  manifest.json  {(work_dir / 'manifest.json').stat().st_size}\n")
+    if month_dir.exists():
+        shutil.rmtree(month_dir)
+    os.replace(work_dir, month_dir)
+
+    report = manifest['report']
+    logging.info(
+        f"Packed {month}: {len(sources)} archives, {len(packs)} symbols, {source_bytes} -> {pack_bytes} bytes "
+        f"({report['saved_ratio']:.1%} saved); one day costs {report['read_cost'].get('compressed_bytes_per_day', 0)} "
+        f"bytes read, {report['read_cost'].get('ms_p50', 0)}ms"
+    )
+    if delete_sources:
+        for path in sources:
+            for extra in (path, path.with_name(path.name + '.sha256'), path.with_name(path.name[:-3] + '.sha256')):
+                extra.unlink(missing_ok=True)
+    return manifest
+
+
+def cold_reader(data_dir=WS_DIR_PATH):
+    """The archiver's cold tier reader when ARCHIVER_COLD_URL is set, else None."""
+    if not os.environ.get('ARCHIVER_COLD_URL'):
+        return None
+    from coldstore import open_reader
+    return open_reader(data_dir)
+
+
+def pack_all(data_dir=WS_DIR_PATH, out_dir=PACK_DIR, **kwargs) -> dict:
+    results = {}
+    kwargs.setdefault('reader', cold_reader(data_dir))
+    for month, days in find_closed_months(data_dir).items():
+        try:
+            manifest = pack_month(month, days, out_dir, **kwargs)
+            if manifest:
+                results[month] = manifest['report']
+        except Exception as e:
+            logging.error(f"Error packing {month}: {str(e)}")
+    return results
+
+
+# --- Reading ----------------------------------------------------------------
+
+@lru_cache(maxsize=32)
+def load_manifest(month_dir: str, mtime_ns: int) -> dict:
+    return json.loads((Path(month_dir) / 'manifest.json').read_text())
+
+
+def read_day(symbol: str, day, out_dir=PACK_DIR) -> bytes:
+    """The day's original lines for one symbol (b'' if not packed); decompresses one stream only."""
+    day = date.fromisoformat(str(day))
+    month_dir = Path(out_dir) / day.strftime('%Y-%m')
+    manifest_path = month_dir / 'manifest.json'
+    if not manifest_path.exists():
+        return b''
+    pack = load_manifest(str(month_dir), manifest_path.stat().st_mtime_ns)['packs'].get(symbol)
+    entry = pack and pack['days'].get(day.isoformat())
+    if not entry:
+        return b''
+    data = read_stream(month_dir / pack['file'], entry)
+    return data[entry['offset']:entry['offset'] + entry['length']]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    parser = argparse.ArgumentParser(description="Repack closed months of daily archives into per-symbol packs")
+    parser.add_argument('--month', help="Only this month (YYYY-MM)")
+    parser.add_argument('--block-days', type=int, default=PACK_BLOCK_DAYS)
+    parser.add_argument('--workers', type=int, default=PACK_WORKERS)
+    parser.add_argument('--delete-sources', action='store_true', default=PACK_DELETE_SOURCES,
+                        help="Remove the daily archives once the month's packs are verified")
+    parser.add_argument('--force', action='store_true', help="Repack months that already have packs")
+    args = parser.parse_args()
+    options = dict(block_days=args.block_days, workers=args.workers, delete_sources=args.delete_sources,
+                   force=args.force, reader=cold_reader())
+    months = find_closed_months()
+    if args.month:
+        months = {args.month: months[args.month]} if args.month in months else {}
+    for month, days in months.items():
+        manifest = pack_month(month, days, **options)
+        if manifest:
+            print(json.dumps({month: manifest['report']}, indent=1))
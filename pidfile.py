@@ -0,0 +1,32 @@
+import atexit
+import os
+from pathlib import Path
+
+
+def write_pid_file(directory, name: str) -> Path:
+    """Record this process as <directory>/<name>.pid for the monitor; removed again on a clean exit."""
+    path = Path(directory) / f'{name}.pid'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(f'{os.getpid()}\n')
+    os.replace(tmp, path)
+    pid = os.getpid()
+
+    def remove():
+        # Forked children inherit atexit hooks; only the owner removes its file
+        if os.getpid() == pid:
+            path.unlink(missing_ok=True)
+
+    atexit.register(remove)
+    return path
+
+
+def read_pid_files(directory) -> dict:
+    """{name: pid} for every pid file in directory."""
+    pids = {}
+    for path in Path(directory).glob('*.pid'):
+        try:
+            pids[path.stem] = int(path.read_text().strip())
+        except (OSError, ValueError):
+            continue
+    return pids
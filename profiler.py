@@ -0,0 +1,210 @@
+"""
+On-demand profiling for the long-running processes (main.py, shard workers, archiver.py).
+
+StackSampler periodically snapshots every thread's Python stack from a
+background thread and writes collapsed stacks ("a;b;c 42" per line),
+which flamegraph.pl, speedscope and inferno read directly. SpanRecorder
+times named stages into a bounded in-memory buffer and dumps them in the
+Chrome trace event format (chrome://tracing, Perfetto).
+
+Both are off until toggled, at runtime, by signal:
+
+    kill -USR1 <pid>   start / stop the sampler (writes <name>-<time>.folded on stop)
+    kill -USR2 <pid>   start / stop span tracing (writes <name>-<time>.trace.json on stop)
+
+Stdlib only, so the archiver image can use it without extra dependencies.
+"""
+
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+
+
+class StackSampler:
+    """Samples all Python threads every `interval` seconds and aggregates the stacks."""
+
+    def __init__(self, out_dir, name: str = 'main', interval: float = 0.01):
+        self.out_dir = Path(out_dir)
+        self.name = name
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.started_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.stacks = Counter()
+        self.samples = 0
+        self.stop_event.clear()
+        self.started_at = time.time()
+        self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+        self.thread.start()
+        logging.info(f"Stack sampler started every {self.interval * 1000:.0f}ms")
+
+    def stop(self):
+        """Stop sampling and write the collapsed stacks; returns the file path (None if not running)."""
+        if not self.running:
+            return None
+        self.stop_event.set()
+        self.thread.join()
+        return self.write()
+
+    def toggle(self):
+        return self.stop() if self.running else self.start()
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        code_names = {}  # code object -> "func (file:line)", so each frame is formatted once
+        while not self.stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                parts = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = code_names.get(code)
+                    if label is None:
+                        label = code_names[code] = \
+                            f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    parts.append(label)
+                    frame = frame.f_back
+                parts.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(parts))] += 1
+            self.samples += 1
+
+    def write(self) -> Path:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        path = self.out_dir / f"{self.name}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))}.folded"
+        with path.open('w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logging.info(f"Stack sampler stopped: {self.samples} samples written to {path}")
+        return path
+
+
+class Span:
+    __slots__ = ('recorder', 'stage', 'start')
+
+    def __init__(self, recorder, stage):
+        self.recorder = recorder
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.recorder.spans.append((self.stage, self.start, end - self.start, threading.get_ident()))
+        return False
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class SpanRecorder:
+    """
+    Bounded buffer of (stage, start, duration, thread) timings.
+
+    While disabled span() hands out a shared no-op context manager, so the
+    hooks can stay in the hot path. Once capacity is reached the oldest
+    spans are dropped.
+    """
+
+    def __init__(self, out_dir, name: str = 'main', capacity: int = 100000, enabled: bool = False):
+        self.out_dir = Path(out_dir)
+        self.name = name
+        self.spans = deque(maxlen=capacity)
+        self.enabled = enabled
+        self.started_at = time.time()
+
+    def span(self, stage: str):
+        return Span(self, stage) if self.enabled else NULL_SPAN
+
+    def start(self) -> None:
+        self.spans.clear()
+        self.started_at = time.time()
+        self.enabled = True
+        logging.info(f"Span tracing started (last {self.spans.maxlen} spans kept)")
+
+    def stop(self):
+        """Stop tracing and dump the buffer; returns the file path (None if not running)."""
+        if not self.enabled:
+            return None
+        self.enabled = False
+        path = self.dump()
+        logging.info(f"Span tracing stopped: {len(self.spans)} spans written to {path}")
+        return path
+
+    def toggle(self):
+        return self.stop() if self.enabled else self.start()
+
+    def summary(self) -> dict:
+        """{stage: {count, total_ms, p50_us, p99_us, max_us}} over the buffered spans."""
+        durations = {}
+        for stage, _start, duration, _thread in list(self.spans):
+            durations.setdefault(stage, []).append(duration)
+        result = {}
+        for stage, values in durations.items():
+            values.sort()
+            n = len(values)
+            result[stage] = {
+                'count': n,
+                'total_ms': sum(values) / 1e6,
+                'p50_us': values[n // 2] / 1e3,
+                'p99_us': values[min(n - 1, n * 99 // 100)] / 1e3,
+                'max_us': values[-1] / 1e3,
+            }
+        return result
+
+    def dump(self, path=None) -> Path:
+        if path is None:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))
+            path = self.out_dir / f"{self.name}-{stamp}.trace.json"
+        pid = os.getpid()
+        events = [
+            {'name': stage, 'ph': 'X', 'ts': start / 1e3, 'dur': duration / 1e3, 'pid': pid, 'tid': thread}
+            for stage, start, duration, thread in list(self.spans)
+        ]
+        tmp = Path(path).with_name(Path(path).name + '.part')
+        with tmp.open('w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        os.replace(tmp, path)
+        return Path(path)
+
+
+def install_signal_handlers(sampler: StackSampler, tracer: SpanRecorder) -> None:
+    """SIGUSR1 toggles the sampler, SIGUSR2 the span tracing. Must be called from the main thread."""
+    def toggle(what):
+        def handler(signum, frame):
+            # Stopping writes a file; keep that off the interrupted code path
+            threading.Thread(target=what.toggle, name='profile-toggle', daemon=True).start()
+        return handler
+
+    signal.signal(signal.SIGUSR1, toggle(sampler))
+    signal.signal(signal.SIGUSR2, toggle(tracer))
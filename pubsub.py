@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import selectors
+import socket
+import threading
+from collections import deque
+from pathlib import Path
+
+
+class Subscriber:
+    """One connected consumer and the ticks queued for it."""
+
+    def __init__(self, sock, max_queue: int):
+        self.sock = sock
+        self.queue = deque()
+        self.max_queue = max_queue
+        self.pending = b''  # Partially sent bytes from the last write
+        self.evicted = False
+        self.sent = 0
+
+
+class TickPublisher:
+    """
+    Fans out every normalized tick to local consumers over a Unix-domain socket.
+
+    Consumers connect to the socket and receive the same JSON lines that go
+    into the data files, as they arrive instead of after the next flush.
+    publish() only appends to each subscriber's bounded queue; a single I/O
+    thread writes the queues out without blocking. A subscriber whose queue
+    fills up is too slow to keep up and gets disconnected rather than
+    holding back the ingester or the other subscribers.
+    """
+
+    def __init__(self, path, max_queue: int = 10000):
+        self.path = Path(path)
+        self.max_queue = max_queue
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.selector = selectors.DefaultSelector()
+        self.server = None
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+        self.woken = False
+        self.running = False
+        self.thread = None
+        self.stats = {'subscribers': 0, 'published': 0, 'evicted': 0}
+
+    def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self.path.unlink()  # Stale socket from a previous run
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(str(self.path))
+        self.server.listen(64)
+        self.server.setblocking(False)
+        self.selector.register(self.server, selectors.EVENT_READ, 'accept')
+        self.selector.register(self.wake_r, selectors.EVENT_READ, 'wake')
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='tick-publisher', daemon=True)
+        self.thread.start()
+        logging.info(f"Publishing ticks on {self.path}")
+
+    def stop(self):
+        self.running = False
+        self.wake()
+        if self.thread:
+            self.thread.join(timeout=5)
+        for sub in list(self.subscribers):
+            self.drop(sub)
+        if self.server:
+            self.server.close()
+            self.path.unlink(missing_ok=True)
+
+    def wake(self):
+        try:
+            self.wake_w.send(b'\0')
+        except BlockingIOError:
+            pass  # Already plenty of wake-ups pending
+
+    def publish(self, payload: bytes):
+        """Queue one line for every subscriber; called on the ingest thread, never blocks."""
+        with self.lock:
+            if not self.subscribers:
+                return
+            self.stats['published'] += 1
+            for sub in self.subscribers:
+                if len(sub.queue) >= sub.max_queue:
+                    sub.evicted = True
+                else:
+                    sub.queue.append(payload)
+            if self.woken:
+                return
+            self.woken = True
+        self.wake()
+
+    def drop(self, sub, reason=None):
+        with self.lock:
+            if sub in self.subscribers:
+                self.subscribers.remove(sub)
+        self.stats['subscribers'] = len(self.subscribers)
+        try:
+            self.selector.unregister(sub.sock)
+        except (KeyError, ValueError):
+            pass
+        sub.sock.close()
+        if reason:
+            logging.warning(f"Dropped subscriber on {self.path}: {reason} ({sub.sent} ticks sent)")
+
+    def run(self):
+        while self.running:
+            for key, events in self.selector.select(timeout=1):
+                if key.data == 'accept':
+                    self.accept()
+                elif key.data == 'wake':
+                    try:
+                        while self.wake_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    with self.lock:
+                        self.woken = False
+                    self.arm_writers()
+                elif events & selectors.EVENT_READ and not self.sock_alive(key.data):
+                    self.drop(key.data)
+                elif events & selectors.EVENT_WRITE:
+                    self.send(key.data)
+
+    def accept(self):
+        try:
+            sock, _ = self.server.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        sub = Subscriber(sock, self.max_queue)
+        self.selector.register(sock, selectors.EVENT_READ, sub)
+        with self.lock:
+            self.subscribers.append(sub)
+        self.stats['subscribers'] = len(self.subscribers)
+
+    def arm_writers(self):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            if sub.evicted:
+                self.stats['evicted'] += 1
+                self.drop(sub, f"queue exceeded {sub.max_queue} ticks")
+            elif sub.queue or sub.pending:
+                self.selector.modify(sub.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, sub)
+
+    def sock_alive(self, sub) -> bool:
+        # Subscribers do not send anything; a readable socket means it was closed
+        try:
+            return sub.sock.recv(4096) != b''
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+
+    def send(self, sub):
+        if not sub.pending:
+            with self.lock:
+                batch = list(sub.queue)
+                sub.queue.clear()
+            sub.pending = b''.join(batch)
+            sub.sent += len(batch)
+        try:
+            written = sub.sock.send(sub.pending)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self.drop(sub, str(e))
+            return
+        sub.pending = sub.pending[written:]
+        if not sub.pending and not sub.queue:
+            self.selector.modify(sub.sock, selectors.EVENT_READ, sub)
+
+
+def subscribe(path):
+    """Yield ticks published on the socket at path as dicts (for consumers)."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(path))
+        with sock.makefile('rb') as stream:
+            for line in stream:
+                yield json.loads(line)
+
+
+if __name__ == "__main__":
+    # Print live ticks: python pubsub.py [socket path]
+    import sys
+    from config import PUBSUB_SOCKET_DIR
+
+    for tick in subscribe(sys.argv[1] if len(sys.argv) > 1 else os.path.join(PUBSUB_SOCKET_DIR, 'main.sock')):
+        print(tick['timestamp'], tick['full_data']['topic'], tick['price'])
@@ -0,0 +1,244 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+
+def to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class SymbolWindows:
+    """
+    Ring buffer of recent ticks for one symbol plus running sums for each window.
+
+    Ticks are added in vectorized batches; each window keeps the logical
+    index of its oldest tick and the sums of log returns, squared log
+    returns, spreads and traded turnover/volume over [start, head), so
+    adding and expiring ticks costs O(1) per tick and queries are O(1).
+
+    Tickers carry no trades, only Bybit's rolling 24h volume and turnover,
+    so a tick's traded volume is how much they rose since the previous
+    tick. Ticks where trades rolling out of the 24h window outweigh the new
+    ones (a fall in either figure) add nothing to the VWAP.
+    """
+
+    def __init__(self, windows, capacity: int):
+        self.windows = list(windows)
+        self.capacity = capacity
+        self.t = np.zeros(capacity)  # Exchange time, seconds
+        self.price = np.zeros(capacity)
+        self.ret = np.zeros(capacity)  # Log return versus the previous tick
+        self.spread = np.zeros(capacity)  # ask - bid, 0 where unknown
+        self.has_spread = np.zeros(capacity)
+        self.traded_turnover = np.zeros(capacity)  # Rise in 24h turnover / volume since the previous tick
+        self.traded_volume = np.zeros(capacity)
+        self.head = 0  # Logical index of the next tick; physical slot is head % capacity
+        self.starts = [0] * len(self.windows)
+        self.sums = np.zeros((len(self.windows), 7))  # ret, ret^2, spread, spread count, turnover, volume, trading ticks
+        self.last_price = math.nan
+        self.last_volume = math.nan
+        self.last_turnover = math.nan
+
+    def segments(self, start: int, end: int):
+        """Physical slices covering logical indices [start, end) of the ring."""
+        if start >= end:
+            return []
+        a, b = start % self.capacity, end % self.capacity
+        if a < b:
+            return [slice(a, b)]
+        return [slice(a, self.capacity), slice(0, b)]
+
+    def window_sums(self, start: int, end: int) -> np.ndarray:
+        total = np.zeros(7)
+        for s in self.segments(start, end):
+            ret = self.ret[s]
+            volume = self.traded_volume[s]
+            total += (ret.sum(), np.dot(ret, ret), self.spread[s].sum(), self.has_spread[s].sum(),
+                      self.traded_turnover[s].sum(), volume.sum(), np.count_nonzero(volume))
+        return total
+
+    def first_at_or_after(self, start: int, cutoff: float) -> int:
+        """Logical index of the first tick in [start, head) with t >= cutoff."""
+        index = start
+        for s in self.segments(start, self.head):
+            times = self.t[s]
+            n = int(np.searchsorted(times, cutoff, side='left'))
+            index += n
+            if n < len(times):
+                break
+        return index
+
+    def add(self, t, price, bid, ask, volume, turnover) -> None:
+        d_volume = np.diff(volume, prepend=self.last_volume)
+        d_turnover = np.diff(turnover, prepend=self.last_turnover)
+        traded = (d_volume > 0) & (d_turnover > 0)  # False for NaN too
+        d_volume = np.where(traded, d_volume, 0.0)
+        d_turnover = np.where(traded, d_turnover, 0.0)
+        if np.isfinite(volume[-1]) and np.isfinite(turnover[-1]):
+            self.last_volume, self.last_turnover = float(volume[-1]), float(turnover[-1])
+        if len(t) > self.capacity:
+            t, price, bid, ask, d_volume, d_turnover = (a[-self.capacity:]
+                                                        for a in (t, price, bid, ask, d_volume, d_turnover))
+        k = len(t)
+        logp = np.log(price)
+        previous = math.log(self.last_price) if self.last_price > 0 else logp[0]
+        ret = np.diff(logp, prepend=previous)
+        ret[~np.isfinite(ret)] = 0.0
+        spread = ask - bid
+        has_spread = np.isfinite(spread).astype(np.float64)
+        spread = np.where(has_spread > 0, spread, 0.0)
+
+        # Ticks about to be overwritten leave every window first
+        overflow_start = self.head + k - self.capacity
+        for i in range(len(self.windows)):
+            if self.starts[i] < overflow_start:
+                self.sums[i] -= self.window_sums(self.starts[i], overflow_start)
+                self.starts[i] = overflow_start
+
+        slots = (self.head + np.arange(k)) % self.capacity
+        self.t[slots] = t
+        self.price[slots] = price
+        self.ret[slots] = ret
+        self.spread[slots] = spread
+        self.has_spread[slots] = has_spread
+        self.traded_turnover[slots] = d_turnover
+        self.traded_volume[slots] = d_volume
+        self.head += k
+        self.last_price = float(price[-1])
+        self.sums += (ret.sum(), np.dot(ret, ret), spread.sum(), has_spread.sum(), d_turnover.sum(), d_volume.sum(),
+                      np.count_nonzero(d_volume))
+        self.expire(float(t[-1]))
+
+    def expire(self, now: float) -> None:
+        for i, window in enumerate(self.windows):
+            start = self.first_at_or_after(self.starts[i], now - window)
+            if start > self.starts[i]:
+                self.sums[i] -= self.window_sums(self.starts[i], start)
+                self.starts[i] = start
+
+    def stats(self) -> dict:
+        result = {}
+        last = (self.head - 1) % self.capacity
+        for i, window in enumerate(self.windows):
+            n = self.head - self.starts[i]
+            sum_r, sum_r2, sum_spread, spread_n, sum_turnover, sum_volume, traded_n = self.sums[i].tolist()
+            entry = {
+                'ticks': n,
+                'tick_rate': n / window,
+                'realized_volatility': math.sqrt(max(sum_r2, 0.0)) if n else math.nan,
+                'spread_avg': sum_spread / spread_n if spread_n else math.nan,
+                'vwap': sum_turnover / sum_volume if traded_n else math.nan,
+                'zscore': math.nan,
+            }
+            if n >= 2:
+                mean = sum_r / n
+                var = sum_r2 / n - mean * mean
+                if var > 1e-30:
+                    entry['zscore'] = (float(self.ret[last]) - mean) / math.sqrt(var)
+            result[f'{window}s'] = entry
+        return result
+
+
+class RollingStats:
+    """
+    Streaming per-symbol statistics over several time windows.
+
+    observe() only queues the tick; the queue is applied in vectorized
+    batches (every batch_size ticks, on flush() and before a query), so
+    the ingest path pays one tuple append per tick.
+    """
+
+    def __init__(self, windows=(60, 300, 900), capacity: int = 16384, batch_size: int = 256):
+        self.windows = tuple(windows)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.symbols = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def observe(self, symbol: str, ts_ms, data: dict) -> None:
+        tick = (
+            (ts_ms / 1000.0) if ts_ms else time.time(),
+            to_float(data.get('lastPrice')),
+            to_float(data.get('bid1Price')),
+            to_float(data.get('ask1Price')),
+            to_float(data.get('volume24h')),
+            to_float(data.get('turnover24h')),
+        )
+        with self.lock:
+            queue = self.pending.get(symbol)
+            if queue is None:
+                queue = self.pending[symbol] = []
+            queue.append(tick)
+            if len(queue) >= self.batch_size:
+                self.apply(symbol)
+
+    def apply(self, symbol: str) -> None:
+        queue = self.pending.get(symbol)
+        if not queue:
+            return
+        columns = np.array(queue, dtype=np.float64).T
+        queue.clear()
+        keep = np.isfinite(columns[1]) & (columns[1] > 0)
+        if not keep.all():
+            columns = columns[:, keep]
+        if not columns.shape[1]:
+            return
+        windows = self.symbols.get(symbol)
+        if windows is None:
+            windows = self.symbols[symbol] = SymbolWindows(self.windows, self.capacity)
+        windows.add(*columns)
+
+    def flush(self) -> None:
+        with self.lock:
+            for symbol in list(self.pending):
+                self.apply(symbol)
+
+    def query(self, symbol: str = None) -> dict:
+        """Current stats: {symbol: {'last_price', '<window>s': {...}}}, or one symbol's dict."""
+        with self.lock:
+            for name in ([symbol] if symbol else list(self.pending)):
+                self.apply(name)
+            wanted = [symbol] if symbol else list(self.symbols)
+            result = {}
+            for name in wanted:
+                windows = self.symbols.get(name)
+                if windows is not None:
+                    windows.expire(time.time())  # A quiet symbol's old ticks still age out
+                    result[name] = {'last_price': windows.last_price, **windows.stats()}
+        return result.get(symbol, {}) if symbol else result
+
+
+class RollingStatsCollector:
+    """Prometheus collector that reads RollingStats at scrape time (no per-tick metric updates)."""
+
+    METRICS = {
+        'vwap': 'Rolling VWAP from the rise in 24h turnover/volume between ticks',
+        'realized_volatility': 'Realized volatility (sqrt of summed squared log returns) over the window',
+        'spread_avg': 'Average ask - bid over the window',
+        'tick_rate': 'Ticks per second over the window',
+        'zscore': 'Z-score of the latest log return against the window',
+    }
+
+    def __init__(self, stats: RollingStats, shard: str = 'main'):
+        self.stats = stats
+        self.shard = shard
+
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+
+        families = {
+            name: GaugeMetricFamily(f'getws_{name}', help_text, labels=['shard', 'symbol', 'window'])
+            for name, help_text in self.METRICS.items()
+        }
+        for symbol, stats in self.stats.query().items():
+            for window in self.stats.windows:
+                values = stats[f'{window}s']
+                for name, family in families.items():
+                    family.add_metric([self.shard, symbol, f'{window}s'], values[name])
+        return list(families.values())
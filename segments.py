@@ -0,0 +1,44 @@
+from pathlib import Path
+
+
+def is_archived(path: Path) -> bool:
+    """The archiver has compressed this day file (its .xz exists, or only its manifest after a cold-tier prune)."""
+    path = Path(path)
+    return any(path.with_name(path.name + suffix).exists() for suffix in ('.xz', '.xz.sha256'))
+
+
+def late_segments(path: Path):
+    """<prefix>_<day>.jsonl, then <prefix>_late_<day>.jsonl, <prefix>_late2_<day>.jsonl, ..."""
+    path = Path(path)
+    prefix, _, day = path.name[:-len('.jsonl')].rpartition('_')
+    yield path
+    n = 1
+    while True:
+        yield path.with_name(f"{prefix}_late{n if n > 1 else ''}_{day}.jsonl")
+        n += 1
+
+
+def writable_segment(path: Path) -> Path:
+    """
+    Where lines for a day file may still be appended.
+
+    Once a day is archived its .jsonl must not come back: the archiver
+    would check it against the old manifest. Late lines (journal replay,
+    spool drain, backfill) go to the first _late segment of that day that
+    is not archived yet; the date stays last, so the archiver, packs and
+    the columnar export pick it up like any other shard file.
+    """
+    for candidate in late_segments(path):
+        if not is_archived(candidate):
+            return candidate
+
+
+def archived_segments(path: Path) -> list:
+    """The day's already archived segments (base file first) that are still on local disk as .xz."""
+    found = []
+    for candidate in late_segments(path):
+        if not is_archived(candidate):
+            return found
+        xz = candidate.with_name(candidate.name + '.xz')
+        if xz.exists():
+            found.append(xz)
@@ -0,0 +1,71 @@
+import logging
+import os
+import threading
+from pathlib import Path
+
+from segments import writable_segment
+
+
+class SpoolFullError(Exception):
+    pass
+
+
+class Spool:
+    """
+    Ordered on-disk overflow for serialized lines while the primary data path fails.
+
+    Every spill becomes one chunk file named <seq>__<target file name>, so a
+    drain can replay chunks in the order they were written and append each
+    one to the segment file it was meant for.
+    """
+
+    def __init__(self, directory, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        chunks = self.chunks()
+        self.seq = max((int(p.name.split('__', 1)[0]) for p in chunks), default=0)
+        self.bytes = sum(p.stat().st_size for p in chunks)
+        if chunks:
+            logging.warning(f"Spool {self.directory} has {len(chunks)} chunks ({self.bytes} bytes) waiting to drain")
+
+    def chunks(self) -> list:
+        return sorted(p for p in self.directory.glob('*__*') if not p.name.endswith('.part'))
+
+    def pending(self) -> bool:
+        return self.bytes > 0
+
+    def spill(self, target_name: str, lines: list) -> int:
+        """Write lines destined for target_name as a new chunk; returns bytes written."""
+        payload = ''.join(lines).encode('utf-8')
+        with self.lock:
+            if self.bytes + len(payload) > self.max_bytes:
+                raise SpoolFullError(f"spool would exceed {self.max_bytes} bytes")
+            self.seq += 1
+            chunk = self.directory / f'{self.seq:012d}__{target_name}'
+            tmp = chunk.with_name(chunk.name + '.part')
+            with tmp.open('wb') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, chunk)
+            self.bytes += len(payload)
+        return len(payload)
+
+    def drain(self, target_dir) -> int:
+        """Append every chunk to its target file in order, or its _late segment once archived; returns lines drained."""
+        drained = 0
+        with self.lock:
+            for chunk in self.chunks():
+                target = writable_segment(Path(target_dir) / chunk.name.split('__', 1)[1])
+                payload = chunk.read_bytes()
+                with target.open('ab') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # A crash between append and unlink replays this chunk; duplicates beat loss
+                chunk.unlink()
+                self.bytes -= len(payload)
+                drained += payload.count(b'\n')
+        return drained
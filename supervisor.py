@@ -0,0 +1,225 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+from queue import Empty
+
+from config import *
+from pidfile import write_pid_file
+from profiler import install_signal_handlers
+
+
+def build_shards(subscriptions, shard_size):
+    """Split {channel_type: [symbols]} into shards of at most shard_size symbols."""
+    shards = []
+    for channel_type, symbols in subscriptions.items():
+        for n, start in enumerate(range(0, len(symbols), shard_size)):
+            shards.append({
+                'id': f'{channel_type}-{n}',
+                'channel_type': channel_type,
+                'symbols': list(symbols[start:start + shard_size]),
+                # Each worker serves its own stats and health endpoints
+                'metrics_port': STATS_METRICS_PORT + 1 + len(shards) if STATS_METRICS_PORT else 0,
+                'health_port': HEALTH_PORT + 1 + len(shards) if HEALTH_PORT else 0,
+            })
+    return shards
+
+
+def run_worker(shard, status_queue):
+    """Worker process entry point: one client for one shard, reporting health on status_queue."""
+    # Imported here so the supervisor itself never loads pybit or opens an ingest log
+    from main import BybitWebSocketClient, start_logging
+
+    start_logging(shard['id'])
+
+    # Turn SIGTERM into a normal exit so the buffer is flushed below
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    write_pid_file(PID_DIR, shard['id'])
+
+    client = BybitWebSocketClient(
+        symbols=shard['symbols'],
+        channel_type=shard['channel_type'],
+        shard_id=shard['id'],
+        metrics_port=shard.get('metrics_port', 0),
+        health_port=shard.get('health_port', 0),
+    )
+    install_signal_handlers(client.profiler, client.tracer)
+
+    async def heartbeat():
+        while True:
+            status_queue.put(client.get_health())
+            await asyncio.sleep(SUPERVISOR_HEARTBEAT_INTERVAL)
+
+    async def work():
+        await asyncio.gather(client.run(), heartbeat())
+
+    try:
+        asyncio.run(work())
+    finally:
+        client.save_price_data()
+
+
+class Supervisor:
+    """
+    Runs one worker process per shard, restarts crashed or silent workers
+    with their own shard, and aggregates their heartbeats into a status file.
+    """
+
+    def __init__(self, shards):
+        self.shards = {shard['id']: shard for shard in shards}
+        self.ctx = multiprocessing.get_context('spawn')
+        self.status_queue = self.ctx.Queue()
+        self.processes = {}
+        self.health = {}
+        self.restarts = {shard_id: 0 for shard_id in self.shards}
+        self.failures = {shard_id: 0 for shard_id in self.shards}
+        self.restart_at = {}
+        self.started_at = {}
+        self.running = True
+
+    def start_worker(self, shard_id):
+        shard = self.shards[shard_id]
+        process = self.ctx.Process(
+            target=run_worker,
+            args=(shard, self.status_queue),
+            name=f'ingest-{shard_id}',
+            daemon=True,
+        )
+        process.start()
+        self.processes[shard_id] = process
+        self.started_at[shard_id] = time.time()
+        self.restart_at.pop(shard_id, None)
+        logging.info(f"Started worker for shard {shard_id} pid={process.pid} symbols={len(shard['symbols'])}")
+
+    def drain_status(self):
+        while True:
+            try:
+                report = self.status_queue.get_nowait()
+            except Empty:
+                return
+            report['received_at'] = time.time()
+            self.health[report['shard']] = report
+
+    def check_workers(self):
+        now = time.time()
+        for shard_id in self.shards:
+            if shard_id in self.restart_at:
+                if now >= self.restart_at[shard_id]:
+                    self.restarts[shard_id] += 1
+                    self.start_worker(shard_id)
+                continue
+
+            process = self.processes.get(shard_id)
+            if process is None:
+                self.start_worker(shard_id)
+                continue
+
+            if process.is_alive():
+                last_seen = self.health.get(shard_id, {}).get('received_at', self.started_at[shard_id])
+                if now - last_seen > SUPERVISOR_HEARTBEAT_TIMEOUT:
+                    logging.error(f"Shard {shard_id} pid={process.pid} silent for {now - last_seen:.0f}s, killing it")
+                    process.kill()
+                    process.join(5)
+                else:
+                    # A worker that has stayed up for a while has recovered
+                    if now - self.started_at[shard_id] > SUPERVISOR_HEARTBEAT_TIMEOUT:
+                        self.failures[shard_id] = 0
+                    continue
+
+            # Dead (crashed or killed above): restart with exponential backoff
+            self.failures[shard_id] += 1
+            delay = min(SUPERVISOR_RESTART_MAX_DELAY, 2 ** (self.failures[shard_id] - 1))
+            logging.error(f"Shard {shard_id} exited with code {process.exitcode}, restarting in {delay}s")
+            self.health.pop(shard_id, None)
+            self.restart_at[shard_id] = now + delay
+
+    def get_status(self):
+        now = time.time()
+        shards = {}
+        totals = {'messages': 0, 'written': 0, 'buffered': 0, 'duplicates': 0}
+        for shard_id, shard in self.shards.items():
+            process = self.processes.get(shard_id)
+            report = self.health.get(shard_id, {})
+            shards[shard_id] = {
+                'channel_type': shard['channel_type'],
+                'symbols': len(shard['symbols']),
+                'pid': process.pid if process else None,
+                'alive': bool(process and process.is_alive()),
+                'restarts': self.restarts[shard_id],
+                'heartbeat_age': now - report['received_at'] if report else None,
+                'report': report,
+            }
+            for key in totals:
+                totals[key] += report.get(key, 0)
+        healthy = sum(
+            1 for s in shards.values()
+            if s['alive'] and s['heartbeat_age'] is not None and s['heartbeat_age'] <= SUPERVISOR_HEARTBEAT_TIMEOUT
+        )
+        return {
+            'updated_at': datetime.now().isoformat(),
+            'shards_total': len(shards),
+            'shards_healthy': healthy,
+            'totals': totals,
+            'shards': shards,
+        }
+
+    def write_status(self):
+        status = self.get_status()
+        try:
+            tmp = SUPERVISOR_STATUS_FILE + '.part'
+            with open(tmp, 'w') as f:
+                json.dump(status, f, default=str)
+            os.replace(tmp, SUPERVISOR_STATUS_FILE)
+        except Exception as e:
+            logging.error(f"Error writing supervisor status: {str(e)}")
+        return status
+
+    def stop(self):
+        self.running = False
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(10)
+            if process.is_alive():
+                process.kill()
+
+    def run(self):
+        logging.info(f"Supervisor starting {len(self.shards)} shards")
+        last_status = 0.0
+        try:
+            while self.running:
+                self.drain_status()
+                self.check_workers()
+                if time.time() - last_status >= SUPERVISOR_HEARTBEAT_INTERVAL:
+                    status = self.write_status()
+                    logging.info(
+                        f"Supervisor: healthy={status['shards_healthy']}/{status['shards_total']} "
+                        f"messages={status['totals']['messages']} written={status['totals']['written']} "
+                        f"buffered={status['totals']['buffered']}"
+                    )
+                    last_status = time.time()
+                time.sleep(1)
+        finally:
+            self.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        handlers=[
+            logging.FileHandler(os.path.join(WS_DIR, 'logs', 'supervisor.log')),
+            logging.StreamHandler(),
+        ],
+    )
+    write_pid_file(PID_DIR, 'supervisor')
+    supervisor = Supervisor(build_shards(SUBSCRIPTIONS, SHARD_SIZE))
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    supervisor.run()
@@ -39,6 +39,26 @@ def main():
         "test_import.py",
         "test_main.py",
         "test_functionality.py",
+        "test_gaps.py",
+        "test_backfill.py",
+        "test_reconnect.py",
+        "test_supervisor.py",
+        "test_tickbuffer.py",
+        "test_spool.py",
+        "test_journal.py",
+        "test_pubsub.py",
+        "test_ticker_table.py",
+        "test_columnar.py",
+        "test_rollingstats.py",
+        "test_monitor.py",
+        "test_health.py",
+        "test_logpipe.py",
+        "test_profiler.py",
+        "test_iobudget.py",
+        "test_scrub.py",
+        "test_packs.py",
+        "test_wsengine.py",
+        "test_coldstore.py",
 ]
 
     all_output = []
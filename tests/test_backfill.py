@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Test script for REST gap backfill against a local HTTP stand-in for Bybit.
+pybit's HTTP client is pointed at the stand-in; nothing leaves localhost.
+"""
+
+import os
+import sys
+import json
+import lzma
+import tempfile
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+# Ensure project root on sys.path to import backfill
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backfill import BackfillWorker, iso_from_ms, make_http, merged_lines
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+GAP_START = 1_700_000_000_000
+GAP_END = GAP_START + 5 * 60_000
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves canned /v5/market responses; rate-limits the first kline call"""
+    kline_calls = 0
+    categories = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        StandInHandler.categories.append(params.get('category'))
+        if url.path == '/v5/market/kline':
+            StandInHandler.kline_calls += 1
+            if StandInHandler.kline_calls == 1:
+                return self.reply({'retCode': 10006, 'retMsg': 'Too many visits!', 'result': {}, 'time': GAP_END})
+            start = int(params['start'])
+            rows = [[str(start + i * 60_000), '100', '101', '99', str(100 + i), '1', '100'] for i in range(5)]
+            return self.reply({'retCode': 0, 'retMsg': 'OK', 'result': {'list': rows[::-1]}, 'time': GAP_END})
+        if url.path == '/v5/market/recent-trade' and params['symbol'] == 'BUSYUSDT':
+            # A full page of trades, all from the last minute of the gap
+            trades = [{'execId': f'busy-{i}', 'symbol': 'BUSYUSDT', 'price': '100', 'size': '1', 'side': 'Buy',
+                       'time': str(GAP_END - i)} for i in range(int(params['limit']))]
+            return self.reply({'retCode': 0, 'retMsg': 'OK', 'result': {'list': trades}, 'time': GAP_END})
+        if url.path == '/v5/market/recent-trade':
+            trades = [
+                {'execId': 'a', 'symbol': params['symbol'], 'price': '100.5', 'size': '1', 'side': 'Buy',
+                 'time': str(GAP_START + 30_000)},
+                {'execId': 'b', 'symbol': params['symbol'], 'price': '99.5', 'size': '1', 'side': 'Sell',
+                 'time': str(GAP_END + 30_000)},
+            ]
+            return self.reply({'retCode': 0, 'retMsg': 'OK', 'result': {'list': trades}, 'time': GAP_END})
+        if url.path == '/v5/market/tickers':
+            tickers = [{'symbol': params['symbol'], 'lastPrice': '104'}]
+            return self.reply({'retCode': 0, 'retMsg': 'OK', 'result': {'list': tickers}, 'time': GAP_END + 1})
+        self.send_error(404)
+
+    def reply(self, body):
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_backfill_merges_in_order():
+    """Gap data is fetched through pybit and written to the shard's backfill segment in timestamp order"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            http = make_http(endpoint=f'http://127.0.0.1:{server.server_port}')
+            worker = BackfillWorker(http=http, data_dir=tmp, rate_per_sec=50, file_prefix='price_data_linear-0')
+
+            # Live lines on either side of the gap
+            day = iso_from_ms(GAP_START)[:10]
+            path = Path(tmp) / f'price_data_linear-0_{day}.jsonl'
+            with path.open('w') as f:
+                for ms in (GAP_START - 1000, GAP_END + 1000):
+                    f.write(json.dumps({'timestamp': iso_from_ms(ms), 'price': 1.0, 'full_data': {}}) + '\n')
+            live = path.read_text()
+
+            gap = {'symbol': 'BTCUSDT', 'start_ms': GAP_START, 'end_ms': GAP_END, 'reason': 'disconnect'}
+            merged = worker.backfill(gap)
+            # 5 candles + 1 trade inside the gap; the ticker and the late trade fall outside
+            assert merged == 6, merged
+            assert worker.stats['rate_limited'] >= 1
+
+            # The live day file is left alone; the rows go to the shard's segment, date last
+            segment = Path(tmp) / f'price_data_linear-0_backfill_{day}.jsonl'
+            assert path.read_text() == live
+            assert sorted(p.name for p in Path(tmp).iterdir()) == sorted([path.name, segment.name])
+            rows = [json.loads(line) for line in segment.read_text().splitlines()]
+            assert len(rows) == 6 and all(r['full_data']['type'] == 'backfill' for r in rows)
+            stamps = [r['timestamp'] for r in rows]
+            assert stamps == sorted(stamps)
+
+            # Readers interleave the live file and the segment by timestamp
+            lines = [json.loads(line) for line in merged_lines([path, segment])]
+            stamps = [line['timestamp'] for line in lines]
+            assert stamps == sorted(stamps) and len(lines) == 8
+            assert lines[0]['full_data'] == {} and lines[-1]['full_data'] == {}
+
+            # Re-running the same gap does not duplicate entries
+            assert worker.backfill(gap) == 0
+            assert len(segment.read_text().splitlines()) == 6
+    finally:
+        server.shutdown()
+    logger.info("Backfill merge works")
+
+
+def serve():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_gap_record_picks_category_and_prefix():
+    """A gap recorded by a spot shard is fetched as spot and lands in that shard's segment"""
+    server = serve()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            worker = BackfillWorker(http=make_http(endpoint=f'http://127.0.0.1:{server.server_port}'),
+                                    data_dir=tmp, rate_per_sec=50)
+            StandInHandler.categories = []
+            gap = {'symbol': 'BTCUSDT', 'start_ms': GAP_START, 'end_ms': GAP_END, 'reason': 'disconnect',
+                   'category': 'spot', 'file_prefix': 'price_data_spot-0'}
+            assert worker.backfill(gap) == 6
+            assert StandInHandler.categories and set(StandInHandler.categories) == {'spot'}
+            day = iso_from_ms(GAP_START)[:10]
+            assert [p.name for p in Path(tmp).iterdir()] == [f'price_data_spot-0_backfill_{day}.jsonl']
+    finally:
+        server.shutdown()
+    logger.info("Gap records choose the category and prefix")
+
+
+def test_archived_day_goes_to_late_segment():
+    """Rows for a day whose segment is already archived go to a _late segment, without repeating archived rows"""
+    server = serve()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            worker = BackfillWorker(http=make_http(endpoint=f'http://127.0.0.1:{server.server_port}'),
+                                    data_dir=tmp, rate_per_sec=50)
+            day = iso_from_ms(GAP_START)[:10]
+            segment = Path(tmp) / f'price_data_backfill_{day}.jsonl'
+            first = {'symbol': 'BTCUSDT', 'start_ms': GAP_START, 'end_ms': GAP_START + 2 * 60_000,
+                     'reason': 'disconnect'}
+            assert worker.backfill(first) == 4  # 3 candles + 1 trade
+
+            # Archive it the way the archiver leaves it: .xz plus manifest, .jsonl gone
+            xz = segment.with_name(segment.name + '.xz')
+            xz.write_bytes(lzma.compress(segment.read_bytes()))
+            xz.with_name(xz.name + '.sha256').write_text('0' * 64 + '\n')
+            segment.unlink()
+
+            gap = {'symbol': 'BTCUSDT', 'start_ms': GAP_START, 'end_ms': GAP_END, 'reason': 'disconnect'}
+            assert worker.backfill(gap) == 2  # Only the two candles the archive does not hold
+            late = Path(tmp) / f'price_data_backfill_late_{day}.jsonl'
+            assert not segment.exists() and late.exists()
+            assert len(late.read_text().splitlines()) == 2
+            assert worker.backfill(gap) == 0
+    finally:
+        server.shutdown()
+    logger.info("Archived days get a late segment")
+
+
+def test_truncated_trade_history_is_counted():
+    """A full page of trades that starts inside the gap is reported as truncated"""
+    server = serve()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            worker = BackfillWorker(http=make_http(endpoint=f'http://127.0.0.1:{server.server_port}'),
+                                    data_dir=tmp, rate_per_sec=50, category='spot')
+            gap = {'symbol': 'BUSYUSDT', 'start_ms': GAP_START, 'end_ms': GAP_END, 'reason': 'disconnect'}
+            assert worker.backfill(gap) == 5 + 60  # Spot pages hold 60 trades
+            assert worker.stats['trades_truncated'] == 1
+
+            worker.stats['trades_truncated'] = 0
+            gap = {'symbol': 'BTCUSDT', 'start_ms': GAP_START, 'end_ms': GAP_END, 'reason': 'disconnect'}
+            worker.backfill(gap)
+            assert worker.stats['trades_truncated'] == 0
+    finally:
+        server.shutdown()
+    logger.info("Truncated trade history is counted")
+
+
+if __name__ == "__main__":
+    print("\n=== Backfill Test ===\n")
+    try:
+        test_backfill_merges_in_order()
+        test_gap_record_picks_category_and_prefix()
+        test_archived_day_goes_to_late_segment()
+        test_truncated_trade_history_is_counted()
+    except AssertionError as e:
+        logger.error(f"Backfill test failed: {e}")
+        print("\n❌ Backfill tests failed")
+        sys.exit(1)
+    print("\n✅ All backfill tests passed")
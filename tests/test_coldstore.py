@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Test script for the cold tier, against the directory-backed store and a local HTTP stand-in for S3.
+Checks upload verification, age and size pruning, and the reader's on-demand fetch and LRU cache.
+S3Store runs through boto3 against the stand-in; nothing leaves localhost.
+"""
+
+import os
+import re
+import sys
+import uuid
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Ensure project root on sys.path to import archiver and coldstore
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import archiver
+from coldstore import ArchiveReader, LocalStore, S3Store, archive_key
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+class S3StandIn(BaseHTTPRequestHandler):
+    """
+    Path-style S3 in memory: PUT/HEAD/GET (with Range) of objects and their
+    x-amz-meta-* metadata, and multipart create/upload part/complete/abort.
+    """
+    protocol_version = 'HTTP/1.1'  # boto3 sends Expect: 100-continue with bodies
+    objects = {}  # (bucket, key) -> (bytes, metadata)
+    uploads = {}  # upload id -> (bucket, key, metadata, {part number: bytes})
+    requests = []  # (method, operation)
+    lock = threading.Lock()
+
+    def target(self):
+        url = urlparse(self.path)
+        bucket, _, key = unquote(url.path).lstrip('/').partition('/')
+        return bucket, key, {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+
+    def body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def metadata(self) -> dict:
+        return {k[len('x-amz-meta-'):].lower(): v for k, v in self.headers.items()
+                if k.lower().startswith('x-amz-meta-')}
+
+    def do_PUT(self):
+        bucket, key, query = self.target()
+        data = self.body()
+        with self.lock:
+            if 'uploadId' in query:
+                self.requests.append(('PUT', 'part'))
+                self.uploads[query['uploadId']][3][int(query['partNumber'])] = data
+            else:
+                self.requests.append(('PUT', 'object'))
+                self.objects[bucket, key] = data, self.metadata()
+        self.reply(200, headers={'ETag': f'"{uuid.uuid4().hex}"'})
+
+    def do_POST(self):
+        bucket, key, query = self.target()
+        body = self.body()
+        with self.lock:
+            if 'uploads' in query:
+                self.requests.append(('POST', 'create'))
+                upload_id = uuid.uuid4().hex
+                self.uploads[upload_id] = bucket, key, self.metadata(), {}
+                return self.reply(200, f'<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>'
+                                       f'<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>')
+            self.requests.append(('POST', 'complete'))
+            _bucket, _key, meta, parts = self.uploads.pop(query['uploadId'])
+            order = [int(n) for n in re.findall(rb'<PartNumber>(\d+)</PartNumber>', body)]
+            self.objects[bucket, key] = b''.join(parts[n] for n in order), meta
+        self.reply(200, f'<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>'
+                        f'<ETag>"{uuid.uuid4().hex}-{len(order)}"</ETag></CompleteMultipartUploadResult>')
+
+    def do_DELETE(self):
+        _bucket, _key, query = self.target()
+        with self.lock:
+            self.uploads.pop(query.get('uploadId'), None)
+        self.reply(204)
+
+    def do_HEAD(self):
+        self.get(head=True)
+
+    def do_GET(self):
+        self.get(head=False)
+
+    def get(self, head: bool):
+        bucket, key, _query = self.target()
+        with self.lock:
+            self.requests.append(('HEAD' if head else 'GET', 'object'))
+            stored = self.objects.get((bucket, key))
+        if stored is None:
+            return self.reply(404, '' if head else '<Error><Code>NoSuchKey</Code></Error>')
+        data, meta = stored
+        headers = {f'x-amz-meta-{k}': v for k, v in meta.items()}
+        headers['ETag'] = '"stand-in"'
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        status = 200
+        if match:
+            start, end = int(match.group(1)), int(match.group(2) or len(data) - 1)
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(data)}'
+            data, status = data[start:end + 1], 206
+        self.reply(status, data, headers, head)
+
+    def reply(self, status, body=b'', headers=None, head=False):
+        payload = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def s3_stand_in():
+    """An S3 endpoint on localhost with throwaway credentials in the environment"""
+    S3StandIn.objects, S3StandIn.uploads, S3StandIn.requests = {}, {}, []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), S3StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = {'AWS_ACCESS_KEY_ID': 'test', 'AWS_SECRET_ACCESS_KEY': 'test', 'AWS_DEFAULT_REGION': 'us-east-1'}
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def make_archive(data_dir: Path, day: str, shard: str = '') -> Path:
+    src = data_dir / f"price_data{'_' + shard if shard else ''}_{day}.jsonl"
+    src.write_bytes(b''.join(b'{"day": "%s", "shard": "%s", "n": %d}\n' % (day.encode(), shard.encode(), i)
+                             for i in range(20000)))
+    archiver.write_hash_file(src, *archiver.compute_sha256(src))
+    xz = data_dir / f'{src.name}.xz'
+    archiver.compress_xz(src, xz, level=1)
+    archiver.write_hash_file(xz, *archiver.compute_sha256(xz))
+    src.unlink()
+    return xz
+
+
+def paths(tmp: str):
+    data_dir = Path(tmp) / 'ws_data'
+    data_dir.mkdir()
+    store = LocalStore(Path(tmp) / 'bucket', part_size=4096, workers=4)  # Many parts per archive
+    kwargs = dict(state_path=data_dir / 'cold' / 'state.json', status_path=data_dir / 'cold' / 'status.json')
+    return data_dir, store, kwargs
+
+
+def test_offload_then_prune_by_age_and_size():
+    """Everything is uploaded; only stored, verified archives past the age or size limit are pruned"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir, store, kwargs = paths(tmp)
+        today = date.today()
+        old = [make_archive(data_dir, f'2024-01-0{d}') for d in range(1, 4)]
+        recent = [make_archive(data_dir, (today - timedelta(days=d)).isoformat()) for d in (2, 1)]
+        corrupt = make_archive(data_dir, '2024-01-05')
+        (data_dir / f'{corrupt.name}.corrupt').write_text('bit rot\n')
+
+        status = archiver.offload_pass(store, data_dir, keep_days=30, **kwargs)
+        assert status['uploaded_this_pass'] == 5 and status['failed'] == []
+        assert status['pruned_this_pass'] == 3 and not any(p.exists() for p in old)
+        assert all(p.exists() for p in recent) and corrupt.exists()
+        assert store.head(archive_key(corrupt.name)) is None
+        for p in old:
+            assert (data_dir / f'{p.name}.sha256').exists()  # Manifests stay local
+            assert store.head(archive_key(p.name + '.sha256')) is not None
+            assert store.hash(archive_key(p.name)) == archiver.parse_hash_file(data_dir / f'{p.name}.sha256')
+
+        # Over the size limit the oldest stored archive goes first, even if it is recent
+        status = archiver.offload_pass(store, data_dir, keep_days=30,
+                                       max_local_bytes=recent[1].stat().st_size + corrupt.stat().st_size, **kwargs)
+        assert status['uploaded_this_pass'] == 0 and status['pruned_this_pass'] == 1
+        assert not recent[0].exists() and recent[1].exists()
+    logger.info("Offload then prune by age and size")
+
+
+def test_bad_upload_keeps_local_copy():
+    """A stored copy that does not hash to the manifest is never trusted"""
+    class FlakyStore(LocalStore):
+        def upload(self, path, key, sha256, budget=None):
+            super().upload(path, key, sha256, budget)
+            if key.endswith('.xz'):
+                data = bytearray(self.path(key).read_bytes())
+                data[len(data) // 2] ^= 0x01
+                self.path(key).write_bytes(bytes(data))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir, store, kwargs = paths(tmp)
+        archive = make_archive(data_dir, '2024-02-01')
+        flaky = FlakyStore(store.root, store.part_size, store.workers)
+        status = archiver.offload_pass(flaky, data_dir, keep_days=0, **kwargs)
+        assert status['failed'] == [archive.name] and status['pruned_this_pass'] == 0 and archive.exists()
+
+        # An object that disappears after its upload is noticed before pruning, and uploaded again
+        assert archiver.offload_pass(store, data_dir, keep_days=10 ** 5, **kwargs)['uploaded_this_pass'] == 1
+        store.path(archive_key(archive.name)).unlink()
+        assert archiver.offload_pass(store, data_dir, keep_days=0, **kwargs)['pruned_this_pass'] == 0
+        assert archive.exists()
+        status = archiver.offload_pass(store, data_dir, keep_days=0, **kwargs)
+        assert status['uploaded_this_pass'] == 1 and status['pruned_this_pass'] == 1
+        assert not archive.exists()
+    logger.info("Bad upload keeps the local copy")
+
+
+def test_reader_fetches_on_demand_with_lru_cache():
+    """Pruned archives are fetched, verified, cached and evicted least recently used first"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir, store, kwargs = paths(tmp)
+        archives = [make_archive(data_dir, '2024-03-01', shard) for shard in ('linear-0', 'linear-1')]
+        archives.append(make_archive(data_dir, '2024-03-02'))
+        expected = {p.name: archiver.lzma.decompress(p.read_bytes()) for p in archives}
+        sizes = {p.name: p.stat().st_size for p in archives}
+        archiver.offload_pass(store, data_dir, keep_days=0, **kwargs)
+        assert not any(p.exists() for p in archives)
+
+        reader = ArchiveReader(data_dir, store, Path(tmp) / 'cache', cache_bytes=max(sizes.values()) * 2 + 1)
+        assert b''.join(reader.read_day('2024-03-01')) == expected[archives[0].name] + expected[archives[1].name]
+        assert reader.misses == 2
+        reader.path(archives[0].name)  # Hit: now the most recently used
+        assert reader.hits == 1
+        with reader.open(archives[2].name) as f:
+            assert f.read() == expected[archives[2].name]
+        cached = sorted(p.name for p in (Path(tmp) / 'cache').iterdir())
+        assert cached == sorted([archives[0].name, archives[2].name])  # linear-1 was least recently used
+
+        # A tampered object is refused instead of cached
+        key = archive_key(archives[1].name)
+        store.path(key).write_bytes(store.path(key).read_bytes()[:-10])
+        try:
+            reader.path(archives[1].name)
+        except IOError as e:
+            assert 'mismatch' in str(e)
+        else:
+            assert False, "tampered archive was accepted"
+        assert not list((Path(tmp) / 'cache').glob('*.part'))
+    logger.info("Reader fetches on demand with an LRU cache")
+
+
+def test_s3_store_round_trip():
+    """Multipart upload with the hash in the object metadata, head, streamed hash and ranged download"""
+    with tempfile.TemporaryDirectory() as tmp, s3_stand_in() as endpoint:
+        store = S3Store('cold', 'ticks', endpoint_url=endpoint, part_size=5 * 1024 * 1024, workers=4)
+        src = Path(tmp) / 'price_data_2024-04-01.jsonl.xz'
+        src.write_bytes(os.urandom(12 * 1024 * 1024))  # Three 5 MB parts, the minimum boto3 allows
+        sha256, size = archiver.file_sha256(src)
+        store.upload(src, archive_key(src.name), sha256)
+
+        assert ('cold', 'ticks/2024-04/price_data_2024-04-01.jsonl.xz') in S3StandIn.objects
+        assert S3StandIn.requests.count(('PUT', 'part')) == 3 and ('POST', 'complete') in S3StandIn.requests
+        assert store.head(archive_key(src.name)) == {'size': size, 'sha256': sha256}
+        assert store.head('2024-04/missing.jsonl.xz') is None
+        assert store.hash(archive_key(src.name)) == (sha256, size)
+        dest = Path(tmp) / 'fetched.xz'
+        store.download(archive_key(src.name), dest)
+        assert dest.read_bytes() == src.read_bytes()
+        assert S3StandIn.uploads == {}
+    logger.info("S3 store round trip")
+
+
+def test_offload_pass_to_s3():
+    """The archiver's offload, both verify modes and the reader work the same against S3"""
+    with tempfile.TemporaryDirectory() as tmp, s3_stand_in() as endpoint:
+        data_dir, _store, kwargs = paths(tmp)
+        store = S3Store('cold', '', endpoint_url=endpoint)
+        archives = [make_archive(data_dir, f'2024-05-0{d}') for d in (1, 2)]
+        expected = {p.name: archiver.lzma.decompress(p.read_bytes()) for p in archives}
+
+        status = archiver.offload_pass(store, data_dir, keep_days=0, verify='download', **kwargs)
+        assert status['uploaded_this_pass'] == 2 and status['failed'] == [] and status['pruned_this_pass'] == 2
+        assert ('cold', archive_key(archives[0].name + '.sha256')) in S3StandIn.objects
+        reader = ArchiveReader(data_dir, store, Path(tmp) / 'cache')
+        assert b''.join(reader.read_day('2024-05-01')) == expected[archives[0].name]
+
+        # A stored object whose metadata hash is not the manifest's is refused, even with head verification
+        archive = make_archive(data_dir, '2024-05-03')
+        key = archive_key(archive.name)
+        real_upload = store.upload
+
+        def mislabelled_upload(path, key, sha256, budget=None):
+            real_upload(path, key, '0' * 64 if key.endswith('.xz') else sha256, budget)
+
+        def bit_rot_upload(path, key, sha256, budget=None):
+            real_upload(path, key, sha256, budget)
+            data, meta = S3StandIn.objects['cold', key]
+            S3StandIn.objects['cold', key] = data[:-1] + bytes([data[-1] ^ 1]), meta
+
+        store.upload = mislabelled_upload
+        try:
+            archiver.offload_archive(archive, store, verify='head')
+        except IOError as e:
+            assert 'does not match the manifest' in str(e)
+        else:
+            assert False, "object with the wrong hash accepted"
+
+        # Bytes that do not match the manifest are caught by the download check
+        store.upload = bit_rot_upload
+        try:
+            archiver.offload_archive(archive, store, verify='download')
+        except IOError as e:
+            assert 'hashes to' in str(e)
+        else:
+            assert False, "corrupt stored object accepted"
+
+        store.upload = real_upload
+        assert archiver.offload_archive(archive, store, verify='download')['key'] == key
+    logger.info("Offload pass to S3")
+
+
+if __name__ == "__main__":
+    print("\n=== Cold Tier Test ===\n")
+    try:
+        test_offload_then_prune_by_age_and_size()
+        test_bad_upload_keeps_local_copy()
+        test_reader_fetches_on_demand_with_lru_cache()
+        test_s3_store_round_trip()
+        test_offload_pass_to_s3()
+    except AssertionError as e:
+        logger.error(f"Cold tier test failed: {e}")
+        print("\n❌ Cold tier test failed")
+        sys.exit(1)
+    print("\n✅ Cold tier test passed")
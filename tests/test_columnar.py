@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for the columnar NumPy export.
+Exports a plain and an xz day file (raw and projected formats) in parallel and reads them back memory-mapped,
+and checks that a day caught mid-archive is read once.
+"""
+
+import os
+import sys
+import json
+import lzma
+import logging
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Ensure project root on sys.path to import columnar
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from columnar import export_all, load_day, query
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def tick_line(when: datetime, symbol: str, price: float, cs: int, typed: bool = False) -> str:
+    # typed=True is the projected format (TYPED_TICK_SCHEMA), otherwise Bybit's strings
+    convert = float if typed else str
+    data = {'symbol': symbol, 'lastPrice': convert(price), 'bid1Price': convert(price - 0.5),
+            'ask1Price': convert(price + 0.5)}
+    entry = {'timestamp': when.isoformat(), 'price': price,
+             'full_data': {'topic': f'tickers.{symbol}', 'type': 'snapshot', 'data': data, 'cs': cs, 'ts': cs}}
+    return json.dumps(entry) + '\n'
+
+
+def test_export_and_memmap_query():
+    """Both days export per symbol with typed columns and load back as memmaps"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir, out_dir = Path(tmp) / 'ws_data', Path(tmp) / 'columnar'
+        data_dir.mkdir()
+        day1 = [tick_line(datetime(2024, 1, 1, 12, 0, s, 250000), sym, 100.0 + s, s)
+                for s in range(10) for sym in ('BTCUSDT', 'ETHUSDT')]
+        (data_dir / 'price_data_2024-01-01.jsonl').write_text(''.join(day1) + '{"torn')
+        with lzma.open(data_dir / 'price_data_2024-01-02.jsonl.xz', 'wt') as f:
+            f.writelines(tick_line(datetime(2024, 1, 2, 0, 0, s), 'BTCUSDT', 200.0 + s, 100 + s, typed=True)
+                         for s in range(5))
+
+        results = export_all(data_dir, out_dir, workers=2)
+        assert results[datetime(2024, 1, 1).date()] == {'BTCUSDT': 10, 'ETHUSDT': 10}
+        assert results[datetime(2024, 1, 2).date()] == {'BTCUSDT': 5}
+
+        arrays = load_day('BTCUSDT', '2024-01-01', out_dir)
+        assert isinstance(arrays['lastPrice'], np.memmap)
+        assert arrays['lastPrice'].dtype == np.float64 and arrays['cs'].dtype == np.int64
+        assert list(arrays['lastPrice'][:3]) == [100.0, 101.0, 102.0]
+        assert np.isnan(arrays['markPrice']).all()
+        assert arrays['recv_ns'][0] == int(datetime(2024, 1, 1, 12, 0, 0).timestamp()) * 10**9 + 250_000_000
+
+        window = query('BTCUSDT', datetime(2024, 1, 1, 12, 0, 8), datetime(2024, 1, 2, 0, 0, 2), out_dir,
+                       columns=['lastPrice'])
+        assert list(window['lastPrice']) == [108.0, 109.0, 200.0, 201.0]
+
+        # Unchanged sources are not exported again
+        assert export_all(data_dir, out_dir, workers=1) == {datetime(2024, 1, 1).date(): {},
+                                                            datetime(2024, 1, 2).date(): {}}
+    logger.info("Columnar export works")
+
+
+def test_mid_archive_day_is_read_once():
+    """A .jsonl next to its finished .xz is skipped, unless the archive failed verification"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir, out_dir = Path(tmp) / 'ws_data', Path(tmp) / 'columnar'
+        data_dir.mkdir()
+        lines = []
+        for s in range(4):
+            entry = json.loads(tick_line(datetime(2024, 1, 1, 12, 0, s), 'BTCUSDT', 100.0 + s, s))
+            entry['recv_ns'] = 1_704_110_400_000_000_000 + s * 10**9  # 2024-01-01T12:00:00Z + s
+            lines.append(json.dumps(entry) + '\n')
+        path = data_dir / 'price_data_2024-01-01.jsonl'
+        path.write_text(''.join(lines))
+        with lzma.open(path.with_name(path.name + '.xz'), 'wt') as f:
+            f.writelines(lines)
+
+        assert export_all(data_dir, out_dir, workers=1)[datetime(2024, 1, 1).date()] == {'BTCUSDT': 4}
+        arrays = load_day('BTCUSDT', '2024-01-01', out_dir)
+        # The stored receive time is used as is, whatever the local time zone
+        assert list(arrays['recv_ns']) == [1_704_110_400_000_000_000 + s * 10**9 for s in range(4)]
+
+        # A failed verification means the .xz is suspect; the original is read instead
+        path.with_name(path.name + '.xz').write_bytes(lzma.compress(b'{"torn'))
+        path.with_name(path.name + '.verify_failed').write_text('hash mismatch\n')
+        assert export_all(data_dir, out_dir, workers=1, force=True)[datetime(2024, 1, 1).date()] == {'BTCUSDT': 4}
+    logger.info("Mid-archive days are read once")
+
+
+if __name__ == "__main__":
+    print("\n=== Columnar Export Test ===\n")
+    try:
+        test_export_and_memmap_query()
+        test_mid_archive_day_is_read_once()
+    except AssertionError as e:
+        logger.error(f"Columnar export test failed: {e}")
+        print("\n❌ Columnar export tests failed")
+        sys.exit(1)
+    print("\n✅ All columnar export tests passed")
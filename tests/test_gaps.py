@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for sequence-based deduplication and the gap log.
+Runs without a WebSocket connection or any third-party packages.
+"""
+
+import os
+import sys
+import tempfile
+import logging
+from pathlib import Path
+
+# Ensure project root on sys.path to import gaps
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from gaps import GapLog, SequenceTracker, read_gaps
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def test_duplicates_dropped():
+    """Repeats of a symbol's (cs, ts) are dropped, newer updates pass"""
+    tracker = SequenceTracker(window=4)
+    assert tracker.observe("BTCUSDT", 1, 1000)
+    assert not tracker.observe("BTCUSDT", 1, 1000)
+    assert tracker.observe("BTCUSDT", 2, 1100)
+    assert tracker.observe("ETHUSDT", 1, 1000)
+    assert tracker.duplicates == 1
+
+    # Window is bounded; the oldest key is forgotten
+    for i in range(10):
+        tracker.observe("BTCUSDT", 100 + i, 2000 + i)
+    assert len(tracker.recent) == 4
+    logger.info("Duplicate suppression works")
+
+
+def test_first_arrival_wins_across_connections():
+    """Redundant connections are merged; late copies count as lag for their source"""
+    tracker = SequenceTracker()
+    assert tracker.observe("BTCUSDT", 1, 1000, source=0)
+    assert not tracker.observe("BTCUSDT", 1, 1000, source=1)
+    assert tracker.observe("BTCUSDT", 2, 1100, source=1)
+    assert not tracker.observe("BTCUSDT", 2, 1100, source=0)
+
+    stats = tracker.source_stats()
+    assert stats[0]['leads'] == 1 and stats[0]['lags'] == 1
+    assert stats[1]['leads'] == 1 and stats[1]['lags'] == 1
+    assert stats[0]['lead_ratio'] == 0.5
+    logger.info("Redundant connection merge works")
+
+
+def test_lagging_standby_beyond_the_window():
+    """A standby stream delayed past the key window across many symbols still writes no duplicate"""
+    tracker = SequenceTracker(window=16)
+    symbols = [f'S{i}USDT' for i in range(60)]  # More symbols than the window holds keys
+    updates = [(symbol, cs, 1000 * cs) for cs in range(1, 6) for symbol in symbols]
+    delay = 120  # The standby delivers each update this many messages after the primary
+    accepted = []
+    for i in range(len(updates) + delay):
+        if i < len(updates):
+            if tracker.observe(*updates[i], source=0):
+                accepted.append(updates[i])
+        if i >= delay and tracker.observe(*updates[i - delay], source=1):
+            accepted.append(updates[i - delay])
+    assert accepted == updates, len(accepted)
+    assert tracker.duplicates == len(updates)
+    assert tracker.source_stats()[1]['leads'] == 0
+
+    # An older update for a symbol is dropped too, not just an exact repeat
+    assert not tracker.observe('S0USDT', 4, 4000, source=1)
+    assert tracker.observe('S0USDT', 6, 6000, source=1)
+    logger.info("Lagging standby beyond the window handled")
+
+
+def test_gap_recorded_across_reconnect():
+    """A disconnect opens a gap that closes on the first update after reconnect"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "gaps" / "gaps.jsonl"
+        log = GapLog(path)
+        tracker = SequenceTracker(gap_threshold_ms=5000, on_gap=log.record)
+
+        tracker.observe("BTCUSDT", 1, 1000)
+        tracker.observe("BTCUSDT", 2, 1100)
+        tracker.mark_disconnect("disconnect")
+        # The resent snapshot is a duplicate and must not close the gap
+        assert not tracker.observe("BTCUSDT", 2, 1100)
+        tracker.observe("BTCUSDT", 3, 4100)
+        # Silence longer than the threshold is a gap too
+        tracker.observe("BTCUSDT", 4, 20000)
+
+        gaps = log.query(symbol="BTCUSDT")
+        assert [(g['start_ms'], g['end_ms'], g['reason']) for g in gaps] == [
+            (1100, 4100, "disconnect"),
+            (4100, 20000, "silence"),
+        ]
+
+        # Readers can query the file directly
+        assert len(read_gaps(path, "BTCUSDT", start_ms=5000, end_ms=6000)) == 1
+        assert read_gaps(path, "ETHUSDT") == []
+        # History comes from the file; memory only holds a bounded recent window
+        reopened = GapLog(path, keep=1)
+        assert len(reopened.query()) == 2 and len(reopened.recent) == 0
+        reopened.record("ETHUSDT", 1, 2, "silence")
+        reopened.record("ETHUSDT", 3, 4, "silence")
+        assert len(reopened.recent) == 1 and reopened.counts == {"ETHUSDT": 2}
+        assert len(reopened.query()) == 4
+
+        # Fields given to the log are stamped on every record
+        tagged = GapLog(path, fields={"category": "spot", "file_prefix": "price_data_spot-0"})
+        tagged.record("SOLUSDT", 5, 6, "silence")
+        assert read_gaps(path, "SOLUSDT")[0]["category"] == "spot"
+    logger.info("Gap logging works")
+
+
+if __name__ == "__main__":
+    print("\n=== Gap Tracking Test ===\n")
+    try:
+        test_duplicates_dropped()
+        test_first_arrival_wins_across_connections()
+        test_lagging_standby_beyond_the_window()
+        test_gap_recorded_across_reconnect()
+    except AssertionError as e:
+        logger.error(f"Gap tracking test failed: {e}")
+        print("\n❌ Gap tracking test failed")
+        sys.exit(1)
+    print("\n✅ Gap tracking test passed")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script for the HTTP health endpoint.
+Checks that /live and /ready map the client's report to 200/503 and /health returns it in full.
+"""
+
+import os
+import sys
+import json
+import logging
+import urllib.error
+import urllib.request
+
+# Ensure project root on sys.path to import health
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from health import HealthServer
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def get(port, path):
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        return e.code, json.loads(body) if e.headers.get('Content-Type') == 'application/json' else None
+
+
+def test_probes_follow_report():
+    """/live and /ready answer 200 or 503 from the report; /health always returns it"""
+    state = {'live': True, 'ready': False, 'reasons': ['no live connection'], 'tick_age': {'BTCUSDT': None}}
+    server = HealthServer(lambda: dict(state), port=0)
+    server.start()
+    try:
+        port = server.server.server_address[1]
+        assert get(port, '/live') == (200, {'live': True, 'reasons': ['no live connection']})
+        assert get(port, '/ready')[0] == 503
+        status, body = get(port, '/health')
+        assert status == 200 and body['tick_age'] == {'BTCUSDT': None}
+
+        state.update(live=False, reasons=['event loop unresponsive for 45s'])
+        assert get(port, '/live') == (503, {'live': False, 'reasons': ['event loop unresponsive for 45s']})
+
+        state.update(live=True, ready=True, reasons=[])
+        assert get(port, '/ready') == (200, {'ready': True, 'reasons': []})
+        assert get(port, '/metrics')[0] == 404
+    finally:
+        server.stop()
+    logger.info("Health probes follow the report")
+
+
+def test_control_actions():
+    """POST /<action> runs the registered callable; unknown actions are 404"""
+    calls = []
+    server = HealthServer(lambda: {'live': True, 'ready': True}, port=0,
+                          actions={'profile': lambda: calls.append('profile') or {'profiling': True}})
+    server.start()
+    try:
+        port = server.server.server_address[1]
+        request = urllib.request.Request(f'http://127.0.0.1:{port}/profile', data=b'', method='POST')
+        with urllib.request.urlopen(request, timeout=5) as response:
+            assert response.status == 200 and json.loads(response.read()) == {'profiling': True}
+        assert calls == ['profile']
+        try:
+            urllib.request.urlopen(urllib.request.Request(f'http://127.0.0.1:{port}/reboot', data=b''), timeout=5)
+            assert False, "unknown action accepted"
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+    finally:
+        server.stop()
+    logger.info("Control actions work")
+
+
+def test_control_refused_when_disabled_or_remote():
+    """Without actions every POST is refused; with actions only control_from clients may call them"""
+    def post(port, path):
+        try:
+            urllib.request.urlopen(urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=b''), timeout=5)
+        except urllib.error.HTTPError as e:
+            return e.code
+        return 200
+
+    calls = []
+    disabled = HealthServer(lambda: {'live': True, 'ready': True}, port=0)
+    remote_only = HealthServer(lambda: {'live': True, 'ready': True}, port=0,
+                               actions={'profile': lambda: calls.append('profile') or {}}, control_from=())
+    disabled.start()
+    remote_only.start()
+    try:
+        assert post(disabled.server.server_address[1], '/profile') == 404
+        assert post(disabled.server.server_address[1], '/trace') == 404
+        assert post(remote_only.server.server_address[1], '/profile') == 403
+        assert get(remote_only.server.server_address[1], '/live')[0] == 200  # Probes stay open
+        assert calls == []
+    finally:
+        disabled.stop()
+        remote_only.stop()
+    logger.info("Control POSTs refused when disabled or not from loopback")
+
+
+def test_failing_report_is_unhealthy():
+    """A report that raises makes both probes fail instead of hanging the request"""
+    def broken():
+        raise RuntimeError("buffer lock poisoned")
+
+    server = HealthServer(broken, port=0)
+    server.start()
+    try:
+        port = server.server.server_address[1]
+        assert get(port, '/live')[0] == 503
+        assert get(port, '/ready')[0] == 503
+    finally:
+        server.stop()
+    logger.info("Failing report is reported as unhealthy")
+
+
+if __name__ == "__main__":
+    print("\n=== Health Endpoint Test ===\n")
+    try:
+        test_probes_follow_report()
+        test_control_actions()
+        test_control_refused_when_disabled_or_remote()
+        test_failing_report_is_unhealthy()
+    except AssertionError as e:
+        logger.error(f"Health endpoint test failed: {e}")
+        print("\n❌ Health endpoint test failed")
+        sys.exit(1)
+    print("\n✅ Health endpoint test passed")
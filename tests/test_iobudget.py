@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test script for the archiver's resource budget.
+Checks the token bucket rate, the back-off on rising writer flush latency and a throttled archive round trip.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+
+# Ensure project root on sys.path to import iobudget
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from iobudget import FlushLatency, IOBudget, TokenBucket, WriterPressure
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def test_token_bucket_rate():
+    """Consuming past the burst sleeps so the long-run rate holds"""
+    bucket = TokenBucket(rate=1_000_000, burst=100_000)
+    started = time.monotonic()
+    for _ in range(5):
+        bucket.consume(100_000)
+    elapsed = time.monotonic() - started
+    assert 0.35 <= elapsed < 1.0, elapsed  # 500 kB at 1 MB/s, the first 100 kB from the burst
+    assert TokenBucket(0).consume(10 ** 9) == 0.0
+    logger.info("Token bucket holds its rate")
+
+
+def test_token_bucket_threads_and_pause():
+    """Concurrent callers share the rate (the backfill's request pool); pause() holds every caller back"""
+    bucket = TokenBucket(rate=50, burst=1)
+    started = time.monotonic()
+    threads = [threading.Thread(target=lambda: [bucket.consume(1) for _ in range(5)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    assert 0.3 <= elapsed < 1.0, elapsed  # 20 requests at 50/s, the first one from the burst
+
+    bucket.pause(0.3)
+    started = time.monotonic()
+    bucket.consume(1)
+    assert time.monotonic() - started >= 0.3
+    logger.info("Token bucket shared across threads")
+
+
+def test_backs_off_on_writer_latency():
+    """Rising flush latency halves the budget scale; it recovers once the writer is fast again"""
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = FlushLatency(tmp, 'main', interval=0, alpha=1.0)
+        writer.observe(0.002)
+        pressure = WriterPressure(tmp, ratio=2.0, floor_ms=5.0, max_ms=250.0, check_interval=0.01)
+        pressure.observe_idle()
+        assert pressure.baseline_ms == 2.0
+        assert pressure.check() == 1.0
+
+        writer.observe(0.040)  # 40 ms: well past 2x the 2 ms baseline
+        time.sleep(0.02)
+        assert pressure.check() == 0.5
+        time.sleep(0.02)
+        assert pressure.check() == 0.25
+        assert pressure.backoffs == 2
+
+        writer.observe(0.002)
+        time.sleep(0.02)
+        assert abs(pressure.check() - 0.35) < 1e-9
+
+        # A stale file (writer gone) is no reason to hold back
+        entry = json.loads(writer.path.read_text())
+        entry.update(flush_ms=1000.0, updated_at=time.time() - 3600)
+        writer.path.write_text(json.dumps(entry))
+        time.sleep(0.02)
+        assert pressure.check() > 0.35
+    logger.info("Back-off follows writer latency")
+
+
+def test_throttled_archive_round_trip():
+    """compress_xz/verify_archive produce a valid archive while charging every byte to the budget"""
+    import archiver
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / 'price_data_2024-01-01.jsonl'
+        src.write_bytes(b''.join(b'{"price": %d}\n' % i for i in range(200000)))
+        digest = hashlib.sha256(src.read_bytes()).hexdigest()
+        budget = IOBudget(read_bps=2 * 1024 * 1024)
+        started = time.monotonic()
+        archiver.compress_xz(src, Path(tmp) / 'out.xz', level=1, budget=budget)
+        assert archiver.verify_archive(Path(tmp) / 'out.xz', digest, budget)
+        assert not archiver.verify_archive(Path(tmp) / 'out.xz', '0' * 64, budget)
+        # ~2.9 MB source plus the small archive at 2 MiB/s, the first second's worth from the burst
+        assert time.monotonic() - started >= 0.3 and budget.throttled >= 0.3
+    logger.info("Throttled archive round trip works")
+
+
+if __name__ == "__main__":
+    print("\n=== I/O Budget Test ===\n")
+    try:
+        test_token_bucket_rate()
+        test_token_bucket_threads_and_pause()
+        test_backs_off_on_writer_latency()
+        test_throttled_archive_round_trip()
+    except AssertionError as e:
+        logger.error(f"I/O budget test failed: {e}")
+        print("\n❌ I/O budget test failed")
+        sys.exit(1)
+    print("\n✅ I/O budget test passed")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for the crash-safe tick journal.
+Checks that unflushed records survive a reopen, wrap around the ring and respect checkpoints.
+"""
+
+import os
+import sys
+import logging
+import tempfile
+from pathlib import Path
+
+# Ensure project root on sys.path to import journal
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from journal import RingJournal, decode_line, encode_line
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def test_pending_survives_reopen_and_wraps():
+    """Records past the checkpoint are read back after reopening, even across the ring end"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'main.journal'
+        journal = RingJournal(path, capacity=300)
+        offsets = [journal.append(encode_line('price_data_2024-01-01.jsonl', f'{{"cs": {i}}}\n')) for i in range(5)]
+        journal.checkpoint(offsets[3])
+        # Wraps past the end of the 300-byte ring
+        for i in range(5, 9):
+            journal.append(encode_line('price_data_2024-01-01.jsonl', f'{{"cs": {i}}}\n'))
+        assert journal.head > journal.capacity
+        # Simulate a crash: the mapping is dropped without any explicit flush
+        del journal
+
+        reopened = RingJournal(path, capacity=4096)
+        assert reopened.capacity == 300  # Existing geometry wins so the records can be read
+        lines = [decode_line(p) for p in reopened.pending()]
+        assert [line for _, line in lines] == [f'{{"cs": {i}}}\n' for i in range(4, 9)]
+        assert {target for target, _ in lines} == {'price_data_2024-01-01.jsonl'}
+
+        reopened.checkpoint(reopened.head)
+        assert reopened.pending() == []
+        reopened.close()
+
+        resized = RingJournal(path, capacity=4096)  # Nothing pending: the configured size applies
+        assert resized.capacity == 4096 and path.stat().st_size == 64 + 4096 and resized.pending() == []
+        resized.close()
+    logger.info("Journal replay works")
+
+
+def test_full_ring_skips_instead_of_overwriting():
+    """A full ring never overwrites records that still need replay"""
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = RingJournal(Path(tmp) / 'main.journal', capacity=64)
+        assert journal.append(b'x' * 40) is not None
+        assert journal.append(b'y' * 40) is None
+        assert journal.skipped == 1
+        assert journal.pending() == [b'x' * 40]
+        journal.close()
+    logger.info("Full journal handled")
+
+
+if __name__ == "__main__":
+    print("\n=== Journal Test ===\n")
+    try:
+        test_pending_survives_reopen_and_wraps()
+        test_full_ring_skips_instead_of_overwriting()
+    except AssertionError as e:
+        logger.error(f"Journal test failed: {e}")
+        print("\n❌ Journal test failed")
+        sys.exit(1)
+    print("\n✅ Journal test passed")
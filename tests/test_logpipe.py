@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for the queued, rate-limited logging pipeline.
+Checks that identical records are suppressed and summarized, and that a full queue drops instead of blocking.
+"""
+
+import os
+import sys
+import logging
+
+# Ensure project root on sys.path to import logpipe
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from logpipe import DroppingQueueHandler, RepeatFilter
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def make_logger(name, *filters):
+    target = logging.getLogger(name)
+    target.propagate = False
+    target.setLevel(logging.INFO)
+    handler = ListHandler()
+    for f in filters:
+        handler.addFilter(f)
+    target.handlers = [handler]
+    return target, handler
+
+
+def test_repeats_are_suppressed_and_summarized():
+    """Only the first `burst` identical errors pass; the summary reports the rest"""
+    repeats = RepeatFilter(interval=60, burst=3)
+    log, handler = make_logger('test_logpipe.repeats', repeats)
+    for _ in range(1000):
+        log.error("Unexpected message format: missing 'lastPrice'")
+    log.error("Something else")
+    assert handler.messages.count("Unexpected message format: missing 'lastPrice'") == 3
+    assert "Something else" in handler.messages
+    assert repeats.suppressed == 997
+
+    repeats.summarize(log)  # Window still open: nothing to report yet
+    assert len(handler.messages) == 4
+    repeats.summarize(log, everything=True)
+    assert handler.messages[-1].startswith("Suppressed 997 repeats")
+    assert handler.messages[-1].endswith("of: Unexpected message format: missing 'lastPrice'")
+
+    # A new window lets the message through again
+    log.error("Unexpected message format: missing 'lastPrice'")
+    assert len(handler.messages) == 6
+    logger.info("Repeated records are rate limited")
+
+
+def test_full_queue_drops():
+    """A full log queue counts dropped records instead of blocking the logging thread"""
+    import queue
+
+    log_queue = queue.Queue(10)
+    handler = DroppingQueueHandler(log_queue)
+    log = logging.getLogger('test_logpipe.queue')
+    log.propagate = False
+    log.handlers = [handler]
+    for i in range(25):
+        log.warning(f"record {i}")
+    assert log_queue.qsize() == 10
+    assert handler.dropped == 15
+    assert log_queue.get_nowait().getMessage() == "record 0"
+    logger.info("Full queue drops records")
+
+
+if __name__ == "__main__":
+    print("\n=== Logging Pipeline Test ===\n")
+    try:
+        test_repeats_are_suppressed_and_summarized()
+        test_full_queue_drops()
+    except AssertionError as e:
+        logger.error(f"Logging pipeline test failed: {e}")
+        print("\n❌ Logging pipeline test failed")
+        sys.exit(1)
+    print("\n✅ Logging pipeline test passed")
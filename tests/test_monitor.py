@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for the monitor's incremental data directory statistics.
+Checks byte totals, compression ratio, backlog and newest tick age as files come and go.
+"""
+
+import os
+import sys
+import json
+import logging
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Ensure project root on sys.path to import monitor
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from monitor import DataDirStats, IngesterProcesses
+from pidfile import write_pid_file
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def test_incremental_directory_stats():
+    """Totals follow appends, archiving and removals without re-reading unchanged files"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        today, old = date.today(), date.today() - timedelta(days=5)
+        live = data_dir / f'price_data_{today.isoformat()}.jsonl'
+        tick_time = datetime.now().replace(microsecond=0) - timedelta(seconds=30)
+        live.write_text(json.dumps({'timestamp': tick_time.isoformat(), 'price': 1.0}) + '\n')
+        backlog = data_dir / f'price_data_{old.isoformat()}.jsonl'
+        backlog.write_bytes(b'x' * 1000)
+        stamp = datetime.combine(old, datetime.min.time()).timestamp()
+        os.utime(backlog, (stamp, stamp))
+        (data_dir / 'notes.txt').write_text('ignored')
+
+        stats = DataDirStats(data_dir, keep_days=2)
+        stats.refresh()
+        assert stats.totals['jsonl_files'] == 2
+        assert stats.totals['jsonl'] == live.stat().st_size + 1000
+        assert stats.backlog() == (1, 1000)
+        assert stats.newest_tick_time() == tick_time.timestamp()
+
+        # The archiver compresses the old day: checksum of the original, archive, original removed
+        (data_dir / f'{backlog.name}.sha256').write_text(f'abc  {backlog.name}  1000\n')
+        (data_dir / f'{backlog.name}.xz').write_bytes(b'y' * 100)
+        backlog.unlink()
+        with live.open('a') as f:
+            f.write(json.dumps({'timestamp': datetime.now().isoformat(), 'price': 2.0}) + '\n')
+        os.utime(data_dir, ns=(0, 1))  # Make sure the directory change is seen even within one mtime tick
+        stats.refresh()
+        assert stats.totals['jsonl_files'] == 1 and stats.totals['xz_files'] == 1
+        assert stats.totals['jsonl'] == live.stat().st_size
+        assert stats.totals['archived_original'] / stats.totals['archived_paired'] == 10.0
+        assert stats.backlog() == (0, 0)
+        assert stats.days[old] == {'jsonl': 0, 'xz': 100}
+        assert stats.newest_tick_time() > tick_time.timestamp()
+    logger.info("Directory stats stay in sync")
+
+
+def test_pid_file_discovery():
+    """The running process is found through its pid file"""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_pid_file(tmp, 'main')
+        (Path(tmp) / 'gone.pid').write_text('999999999\n')  # Stale file from a crashed process
+        running, rss, _cpu = IngesterProcesses(tmp).update()
+        assert running == 1 and rss > 0
+    logger.info("Pid file discovery works")
+
+
+if __name__ == "__main__":
+    print("\n=== Monitor Test ===\n")
+    try:
+        test_incremental_directory_stats()
+        test_pid_file_discovery()
+    except AssertionError as e:
+        logger.error(f"Monitor test failed: {e}")
+        print("\n❌ Monitor test failed")
+        sys.exit(1)
+    print("\n✅ Monitor test passed")
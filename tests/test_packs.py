@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test script for the monthly per-symbol packs.
+Checks that a closed month round-trips day by day, that sources are only removed after verification,
+and that open months are left alone.
+"""
+
+import os
+import sys
+import json
+import lzma
+import logging
+import tempfile
+from datetime import date
+from pathlib import Path
+
+# Ensure project root on sys.path to import packs
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import archiver
+import packs
+from coldstore import ArchiveReader, LocalStore
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT']
+
+
+def make_line(symbol: str, day: int, i: int) -> bytes:
+    topic = f'kline.1.{symbol}' if i % 50 == 0 else f'tickers.{symbol}'
+    entry = {'timestamp': f'2024-01-{day:02d}T00:00:{i % 60:02d}', 'price': 100.0 + i,
+             'full_data': {'topic': topic, 'type': 'snapshot', 'cs': i, 'ts': 1704067200000 + i,
+                           'data': {'symbol': symbol, 'lastPrice': str(100.0 + i)}}}
+    return (json.dumps(entry) + '\n').encode()
+
+
+def make_month(data_dir: Path, days: int = 5) -> dict:
+    """Daily archives for January 2024 (two shards); returns {(symbol, day): lines}"""
+    expected = {}
+    for day in range(1, days + 1):
+        for shard in ('linear-0', 'linear-1'):
+            src = data_dir / f'price_data_{shard}_2024-01-{day:02d}.jsonl'
+            lines = [make_line(SYMBOLS[(i + day) % len(SYMBOLS)], day, i) for i in range(600)]
+            src.write_bytes(b''.join(lines))
+            archiver.write_hash_file(src, *archiver.compute_sha256(src))
+            archiver.compress_xz(src, data_dir / f'{src.name}.xz', level=1)
+            src.unlink()
+            for line in lines:
+                expected.setdefault((symbol_of(line), f'2024-01-{day:02d}'), []).append(line)
+    return expected
+
+
+def symbol_of(line: bytes) -> str:
+    return json.loads(line)['full_data']['data']['symbol']
+
+
+def test_month_round_trips():
+    """Every day of every symbol reads back as the source lines, and xz -dc still reads whole packs"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        expected = make_month(data_dir)
+        months = packs.find_closed_months(data_dir, today=date(2024, 2, 10))
+        assert list(months) == ['2024-01'] and len(months['2024-01']) == 5
+
+        out_dir = data_dir / 'packs'
+        manifest = packs.pack_month('2024-01', months['2024-01'], out_dir, block_days=2, preset=1, workers=2)
+        assert sorted(manifest['packs']) == SYMBOLS
+        assert len(manifest['sources']) == 10
+        report = manifest['report']
+        assert report['lines'] == 6000 and report['saved_bytes'] == report['source_bytes'] - report['pack_bytes']
+        assert report['read_cost']['samples'] > 0
+
+        for (symbol, day), lines in expected.items():
+            assert packs.read_day(symbol, day, out_dir) == b''.join(lines), (symbol, day)
+        assert packs.read_day('BTCUSDT', '2024-01-20', out_dir) == b''
+        assert packs.read_day('XRPUSDT', '2024-01-01', out_dir) == b''
+
+        # Five days in blocks of two: three xz streams, concatenated
+        pack = manifest['packs']['ETHUSDT']
+        assert len({e['stream_offset'] for e in pack['days'].values()}) == 3
+        whole = lzma.decompress((out_dir / '2024-01' / pack['file']).read_bytes())
+        assert whole == b''.join(b''.join(expected[('ETHUSDT', f'2024-01-{d:02d}')]) for d in range(1, 6))
+
+        assert packs.pack_month('2024-01', months['2024-01'], out_dir) is None  # Already packed
+        assert len(list(data_dir.glob('*.jsonl.xz'))) == 10  # Sources kept by default
+    logger.info("Packed month round-trips")
+
+
+def test_sources_removed_only_after_verification():
+    """--delete-sources removes archives and their hash files; a corrupt pack is caught by verify_pack"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        make_month(data_dir, days=2)
+        months = packs.find_closed_months(data_dir, today=date(2024, 2, 1))
+        out_dir = data_dir / 'packs'
+        manifest = packs.pack_month('2024-01', months['2024-01'], out_dir, preset=1, workers=1,
+                                    delete_sources=True)
+        assert list(data_dir.glob('price_data*')) == []
+        month_dir = out_dir / '2024-01'
+        digest = (month_dir / 'manifest.json.sha256').read_text().split()[0]
+        assert digest == archiver.compute_sha256(month_dir / 'manifest.json')[0]
+
+        pack = manifest['packs']['BTCUSDT']
+        assert packs.verify_pack(month_dir / pack['file'], pack)
+        data = bytearray((month_dir / pack['file']).read_bytes())
+        data[len(data) // 2] ^= 0x01
+        (month_dir / pack['file']).write_bytes(bytes(data))
+        assert not packs.verify_pack(month_dir / pack['file'], pack)
+    logger.info("Sources removed only after verification")
+
+
+def test_pack_after_cold_prune():
+    """Days offloaded and pruned by the archiver are still packed, read back from the cold tier"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / 'ws_data'
+        data_dir.mkdir()
+        expected = make_month(data_dir, days=3)
+        for xz in data_dir.glob('*.jsonl.xz'):
+            archiver.write_hash_file(xz, *archiver.compute_sha256(xz))
+        sources = {p.name: archiver.compute_sha256(p) for p in data_dir.glob('*.jsonl.xz')}
+
+        # Prune down to the newest two archives
+        store = LocalStore(Path(tmp) / 'bucket')
+        status = archiver.offload_pass(store, data_dir, state_path=Path(tmp) / 'state.json',
+                                       status_path=Path(tmp) / 'status.json', keep_days=10 ** 5,
+                                       max_local_bytes=max(size for _digest, size in sources.values()) * 2)
+        assert status['pruned_this_pass'] == 4 and len(list(data_dir.glob('*.jsonl.xz'))) == 2
+
+        months = packs.find_closed_months(data_dir, today=date(2024, 2, 1))
+        assert len(months['2024-01']) == 3 and sum(len(v) for v in months['2024-01'].values()) == 6
+        out_dir = Path(tmp) / 'packs'
+        try:
+            packs.pack_month('2024-01', months['2024-01'], out_dir, preset=1, workers=1)
+        except RuntimeError as e:
+            assert 'cold tier' in str(e)
+        else:
+            assert False, "packed a month with pruned days and no reader"
+        assert not (out_dir / '2024-01').exists()
+
+        reader = ArchiveReader(data_dir, store, Path(tmp) / 'cache')
+        manifest = packs.pack_month('2024-01', months['2024-01'], out_dir, preset=1, workers=1, reader=reader)
+        assert manifest['report']['lines'] == 3600 and reader.misses == 4
+        assert {s['name']: (s['sha256'], s['size']) for s in manifest['sources']} == sources
+        for (symbol, day), lines in expected.items():
+            assert packs.read_day(symbol, day, out_dir) == b''.join(lines), (symbol, day)
+    logger.info("Pack after cold prune")
+
+
+def test_open_months_are_skipped():
+    """The current month and months with unarchived .jsonl files are not packed"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        make_month(data_dir, days=1)
+        assert packs.find_closed_months(data_dir, today=date(2024, 1, 20)) == {}
+        (data_dir / 'price_data_linear-0_2024-01-31.jsonl').write_bytes(make_line('BTCUSDT', 31, 0))
+        assert packs.find_closed_months(data_dir, today=date(2024, 3, 1)) == {}
+    logger.info("Open months are skipped")
+
+
+if __name__ == "__main__":
+    print("\n=== Monthly Packs Test ===\n")
+    try:
+        test_month_round_trips()
+        test_sources_removed_only_after_verification()
+        test_pack_after_cold_prune()
+        test_open_months_are_skipped()
+    except AssertionError as e:
+        logger.error(f"Monthly packs test failed: {e}")
+        print("\n❌ Monthly packs test failed")
+        sys.exit(1)
+    print("\n✅ Monthly packs test passed")
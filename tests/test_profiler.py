@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for the on-demand stack sampler and stage timing spans.
+Checks the collapsed-stack output, the bounded span buffer and the Chrome trace dump.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import threading
+from pathlib import Path
+
+# Ensure project root on sys.path to import profiler
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from profiler import NULL_SPAN, SpanRecorder, StackSampler
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def busy_loop(stop):
+    total = 0
+    while not stop.is_set():
+        total += sum(range(1000))
+    return total
+
+
+def test_sampler_writes_collapsed_stacks():
+    """A busy thread shows up in the folded output, root frame first"""
+    with tempfile.TemporaryDirectory() as tmp:
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,), name='busy')
+        worker.start()
+        sampler = StackSampler(tmp, 'test', interval=0.002)
+        sampler.toggle()
+        time.sleep(0.3)
+        path = sampler.toggle()
+        stop.set()
+        worker.join()
+
+        assert not sampler.running and sampler.samples > 0
+        lines = Path(path).read_text().splitlines()
+        busy = [line for line in lines if line.startswith('busy;')]
+        assert busy and any('busy_loop (test_profiler.py:' in line for line in busy)
+        stack, count = busy[0].rsplit(' ', 1)
+        assert int(count) > 0 and 'stack-sampler' not in ''.join(lines)
+    logger.info("Sampler writes collapsed stacks")
+
+
+def test_spans_are_bounded_and_dumped():
+    """Spans only cost a no-op while disabled, keep the newest `capacity` and dump as Chrome trace events"""
+    with tempfile.TemporaryDirectory() as tmp:
+        tracer = SpanRecorder(tmp, 'test', capacity=50)
+        assert tracer.span('handle_ticker') is NULL_SPAN
+        tracer.toggle()
+        for _ in range(80):
+            with tracer.span('handle_ticker'):
+                with tracer.span('serialize'):
+                    pass
+        summary = tracer.summary()
+        assert sum(stage['count'] for stage in summary.values()) == 50
+        assert summary['handle_ticker']['max_us'] >= summary['handle_ticker']['p50_us'] > 0
+
+        path = tracer.toggle()
+        assert not tracer.enabled
+        events = json.loads(Path(path).read_text())['traceEvents']
+        assert len(events) == 50
+        assert {e['name'] for e in events} == {'handle_ticker', 'serialize'}
+        assert all(e['ph'] == 'X' and e['dur'] >= 0 for e in events)
+    logger.info("Spans are bounded and dumped")
+
+
+if __name__ == "__main__":
+    print("\n=== Profiler Test ===\n")
+    try:
+        test_sampler_writes_collapsed_stacks()
+        test_spans_are_bounded_and_dumped()
+    except AssertionError as e:
+        logger.error(f"Profiler test failed: {e}")
+        print("\n❌ Profiler test failed")
+        sys.exit(1)
+    print("\n✅ Profiler test passed")
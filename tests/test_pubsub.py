@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test script for the local tick fan-out.
+Checks that subscribers get ticks in order and that a stalled subscriber is evicted.
+"""
+
+import os
+import sys
+import socket
+import logging
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Ensure project root on sys.path to import pubsub
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from pubsub import TickPublisher, subscribe
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_fanout_and_slow_consumer_eviction():
+    """A reading subscriber gets every tick in order; one that never reads is disconnected"""
+    with tempfile.TemporaryDirectory() as tmp:
+        publisher = TickPublisher(Path(tmp) / 'main.sock', max_queue=500)
+        publisher.start()
+        try:
+            received = []
+            reader = threading.Thread(
+                target=lambda: received.extend(t['cs'] for _, t in zip(range(20000), subscribe(publisher.path))),
+                daemon=True,
+            )
+            reader.start()
+            stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stalled.connect(str(publisher.path))
+            assert wait_for(lambda: publisher.stats['subscribers'] == 2)
+
+            padding = 'x' * 200
+            for i in range(20000):
+                publisher.publish(f'{{"cs": {i}, "pad": "{padding}"}}\n'.encode())
+                if i % 200 == 0:
+                    time.sleep(0.001)  # Roughly a live feed: bursts, not one tight loop
+
+            reader.join(timeout=10)
+            assert received == list(range(20000))
+            assert wait_for(lambda: publisher.stats['evicted'] == 1)
+            assert wait_for(lambda: publisher.stats['subscribers'] == 0)  # The reader hung up once done
+            stalled.close()
+        finally:
+            publisher.stop()
+    logger.info("Fan-out works")
+
+
+if __name__ == "__main__":
+    print("\n=== Pub/Sub Test ===\n")
+    try:
+        test_fanout_and_slow_consumer_eviction()
+    except AssertionError as e:
+        logger.error(f"Pub/sub test failed: {e}")
+        print("\n❌ Pub/sub test failed")
+        sys.exit(1)
+    print("\n✅ Pub/sub test passed")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Test script for connection supervision in main.py.
+Checks the bounds of the jittered reconnect backoff, the make-before-break handover and that pongs
+keep a quiet connection from being replaced, with stand-in connections in place of pybit,
+and that shards keep their own gap logs. Nothing connects to Bybit.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Ensure project root on sys.path to import main
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import main
+from gaps import read_gaps
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def offline_client(tmp: str, client_args=None, **settings):
+    """A client writing under tmp with every network-facing and background feature off"""
+    overrides = dict(
+        WS_DIR_PATH=os.path.join(tmp, 'ws_data'), SPOOL_DIR=os.path.join(tmp, 'spool'),
+        GAP_LOG_FILE=os.path.join(tmp, 'gaps.jsonl'), PID_DIR=os.path.join(tmp, 'run'), PROFILE_DIR=tmp,
+        JOURNAL_ENABLED=False, PUBSUB_ENABLED=False, TICKER_TABLE_ENABLED=False, STATS_ENABLED=False,
+        HEALTH_ENABLED=False, BACKFILL_ENABLED=False, WS_ENGINE='pybit',
+    )
+    overrides.update(settings)
+    saved = {name: getattr(main, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(main, name, value)
+    try:
+        yield main.BybitWebSocketClient(**(client_args or {}))
+    finally:
+        for name, value in saved.items():
+            setattr(main, name, value)
+
+
+class StandInSocket:
+    """Takes the place of pybit's WebSocket: connected until exit() or drop()"""
+
+    def __init__(self, conn, name, events):
+        self.conn = conn
+        self.name = name
+        self.events = events
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    def deliver(self):
+        self.events.append(f'{self.name} message')
+        self.conn.notify_message()
+
+    def drop(self):
+        self.events.append(f'{self.name} dropped')
+        self.connected = False
+        self.conn.notify_close()
+
+    def exit(self):
+        self.events.append(f'{self.name} closed')
+        self.connected = False
+
+
+def test_reconnect_delay_bounds():
+    """Delays stay within [0, min(max, base * 2^attempt)], reach the ceiling and are jittered"""
+    with tempfile.TemporaryDirectory() as tmp, offline_client(tmp, WS_RECONNECT_DELAY=0.5,
+                                                              WS_RECONNECT_MAX_DELAY=30) as client:
+        for attempt in range(12):
+            ceiling = min(30, 0.5 * 2 ** attempt)
+            delays = [client.reconnect_delay(attempt) for _ in range(200)]
+            assert all(0 <= d <= ceiling for d in delays), attempt
+            assert len(set(delays)) > 1  # Full jitter, so redundant connections do not retry in lockstep
+        assert max(client.reconnect_delay(20) for _ in range(500)) > 15  # Capped, not stuck near zero
+        assert max(client.reconnect_delay(60) for _ in range(500)) <= 30
+    logger.info("Reconnect delay within bounds")
+
+
+def test_stale_connection_is_replaced_make_before_break():
+    """A stale connection keeps streaming until its replacement delivers; a hard drop reconnects"""
+    events, sockets = [], []
+
+    with tempfile.TemporaryDirectory() as tmp, offline_client(
+            tmp, WS_STALE_TIMEOUT=0.3, WS_HANDOVER_TIMEOUT=5, WS_MAX_CONNECTION_AGE=0,
+            WS_RECONNECT_DELAY=0.01, WS_RECONNECT_MAX_DELAY=0.05) as client:
+
+        def open_connection(conn):
+            # Runs in a worker thread, like pybit's blocking connect
+            ws = StandInSocket(conn, f'ws{len(sockets) + 1}', events)
+            current = client.connections[conn.index]
+            events.append(f'{ws.name} opened' + (f' while {current.ws.name} live' if current and current.ws.connected
+                                                  else ''))
+            conn.ws = ws
+            sockets.append(ws)
+            if ws.name == 'ws1':
+                ws.deliver()  # Then silent: stale after WS_STALE_TIMEOUT
+            else:
+                threading.Timer(0.1, ws.deliver).start()
+            return conn
+
+        client.open_connection = open_connection
+
+        async def scenario():
+            task = asyncio.create_task(client.maintain_connection(0))
+            try:
+                deadline = time.monotonic() + 10
+                while 'ws2 message' not in events or client.connections[0].ws is not sockets[1]:
+                    assert time.monotonic() < deadline, events
+                    await asyncio.sleep(0.01)
+                await asyncio.sleep(0.1)  # Let the old connection's close run
+                sockets[1].drop()
+                while 'ws3 message' not in events or client.connections[0].ws is not sockets[2]:
+                    assert time.monotonic() < deadline, events
+                    await asyncio.sleep(0.01)
+            finally:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        asyncio.run(scenario())
+
+    assert events[:4] == ['ws1 opened', 'ws1 message', 'ws2 opened while ws1 live', 'ws2 message'], events
+    assert events.index('ws1 closed') > events.index('ws2 message')  # Break only after make
+    assert 'ws3 opened' in events and 'while' not in events[events.index('ws3 opened')]  # Hard drop: nothing to keep
+    assert events.index('ws2 dropped') < events.index('ws3 opened')
+    logger.info("Stale connection replaced make-before-break")
+
+
+def test_pongs_keep_a_quiet_connection():
+    """No messages but regular pongs is a quiet market, not a stale connection"""
+    with tempfile.TemporaryDirectory() as tmp, offline_client(tmp, WS_STALE_TIMEOUT=0.3,
+                                                              WS_MAX_CONNECTION_AGE=0) as client:
+        async def scenario():
+            conn = main.Connection(0, asyncio.get_running_loop())
+            conn.ws = StandInSocket(conn, 'ws1', [])
+            watch = asyncio.create_task(client.watch_connection(conn))
+            for _ in range(10):  # 1s of pongs, well past WS_STALE_TIMEOUT
+                conn.notify_heartbeat()
+                await asyncio.sleep(0.1)
+                assert not watch.done()
+            started = time.monotonic()
+            assert await asyncio.wait_for(watch, 5) == 'stale'  # Pongs stop: stale after the timeout
+            assert time.monotonic() - started >= 0.15
+
+        asyncio.run(scenario())
+    logger.info("Pongs keep a quiet connection")
+
+
+def test_shards_keep_separate_gap_logs():
+    """Each shard records gaps, tagged with where they belong, in its own file; logs are split the same way"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for shard_id, channel_type in (('linear-0', 'linear'), ('spot-0', 'spot')):
+            args = {'symbols': ['BTCUSDT'], 'channel_type': channel_type, 'shard_id': shard_id}
+            with offline_client(tmp, args) as client:
+                client.gap_log.record('BTCUSDT', 1, 2, 'disconnect')
+        with offline_client(tmp) as client:
+            client.gap_log.record('BTCUSDT', 3, 4, 'disconnect')
+
+        names = sorted(name for name in os.listdir(tmp) if name.endswith('.jsonl'))
+        assert names == ['gaps.jsonl', 'gaps_linear-0.jsonl', 'gaps_spot-0.jsonl'], names
+        spot = read_gaps(os.path.join(tmp, 'gaps_spot-0.jsonl'))
+        assert len(spot) == 1 and spot[0]['shard'] == 'spot-0' and spot[0]['category'] == 'spot'
+        assert spot[0]['file_prefix'] == 'price_data_spot-0'
+        assert main.shard_file(main.LOG_FILE, 'spot-0').endswith(os.path.join('logs', 'ws_log_spot-0.log'))
+        assert main.shard_file(main.LOG_FILE) == main.LOG_FILE
+    logger.info("Shards keep separate gap logs")
+
+
+if __name__ == "__main__":
+    print("\n=== Reconnect Test ===\n")
+    try:
+        test_reconnect_delay_bounds()
+        test_stale_connection_is_replaced_make_before_break()
+        test_pongs_keep_a_quiet_connection()
+        test_shards_keep_separate_gap_logs()
+    except AssertionError as e:
+        logger.error(f"Reconnect test failed: {e}")
+        print("\n❌ Reconnect test failed")
+        sys.exit(1)
+    print("\n✅ Reconnect test passed")
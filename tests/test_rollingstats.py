@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming rolling statistics.
+Checks the incremental window sums against a full recomputation and the Prometheus output.
+"""
+
+import os
+import sys
+import math
+import time
+import logging
+
+import numpy as np
+
+# Ensure project root on sys.path to import rollingstats
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from rollingstats import RollingStats, RollingStatsCollector
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def make_ticks(n, seed=1):
+    rng = np.random.default_rng(seed)
+    now = 0.0
+    price, volume, turnover = 100.0, 1000.0, 100000.0
+    ticks = []
+    for i in range(n):
+        now += rng.uniform(0, 0.1)
+        price *= math.exp(rng.normal(0, 1e-3))
+        traded = rng.uniform(0, 2)
+        volume += traded
+        turnover += traded * price
+        if i % 7 == 0:
+            # Trades rolling out of Bybit's 24h window outweigh the new ones: not this tick's volume
+            volume -= 5
+            turnover -= 5 * price * 1.1
+        data = {'symbol': 'BTCUSDT', 'lastPrice': str(price), 'bid1Price': str(price - 0.5),
+                'ask1Price': str(price + 0.5) if i % 3 else '', 'volume24h': str(volume), 'turnover24h': str(turnover)}
+        ticks.append((now, data))
+    # End just ahead of the current time: queries expire ticks against the wall clock,
+    # so a slow run must not age out more ticks than the recomputation below expects
+    shift = time.time() + 5 - now
+    return [(int((t + shift) * 1000), data) for t, data in ticks]
+
+
+def test_incremental_matches_recomputation():
+    """Windowed sums maintained in O(1) equal a brute-force pass over the same ticks"""
+    stats = RollingStats(windows=(2, 10), capacity=64, batch_size=17)  # Small ring: forces wraparound and overflow
+    ticks = make_ticks(500)
+    for ts, data in ticks:
+        stats.observe('BTCUSDT', ts, data)
+    result = stats.query('BTCUSDT')
+
+    t = np.array([ts / 1000.0 for ts, _ in ticks])
+    p = np.array([float(d['lastPrice']) for _, d in ticks])
+    r = np.diff(np.log(p), prepend=np.log(p[0]))
+    v = np.array([float(d['volume24h']) for _, d in ticks])
+    q = np.array([float(d['turnover24h']) for _, d in ticks])
+    for window in (2, 10):
+        rows = np.arange(len(t))[(t >= t[-1] - window) & (np.arange(len(t)) >= len(t) - 64)]
+        got = result[f'{window}s']
+        assert got['ticks'] == len(rows)
+        assert math.isclose(got['realized_volatility'], math.sqrt((r[rows] ** 2).sum()), rel_tol=1e-9)
+        spreads = [1.0 for i in rows if i % 3]
+        assert math.isclose(got['spread_avg'], sum(spreads) / len(spreads), rel_tol=1e-9)
+        z = (r[rows][-1] - r[rows].mean()) / r[rows].std()
+        assert math.isclose(got['zscore'], z, rel_tol=1e-6)
+        # Only rises in both 24h figures count as traded; each such tick trades at its own price here
+        d_volume = np.diff(v, prepend=np.nan)[rows]
+        d_turnover = np.diff(q, prepend=np.nan)[rows]
+        traded = (d_volume > 0) & (d_turnover > 0)
+        assert math.isclose(got['vwap'], d_turnover[traded].sum() / d_volume[traded].sum(), rel_tol=1e-9)
+        assert p[rows].min() <= got['vwap'] <= p[rows].max()
+    logger.info("Rolling stats match recomputation")
+
+
+def test_vwap_without_trades_is_nan():
+    """No rise in the 24h figures inside a window means no VWAP, not a stale or drifting one"""
+    stats = RollingStats(windows=(5, 100), batch_size=1)
+    now = time.time()
+    ticks = [(-30, 10, 1000), (-20, 12, 1210), (-2, 11, 1100), (-1, 11, 1100)]
+    for offset, volume, turnover in ticks:
+        stats.observe('BTCUSDT', int((now + offset) * 1000),
+                      {'lastPrice': '100', 'volume24h': str(volume), 'turnover24h': str(turnover)})
+    got = stats.query('BTCUSDT')
+    assert math.isclose(got['100s']['vwap'], 105.0)  # Only the 10 -> 12 rise traded: 210 / 2
+    assert got['5s']['ticks'] == 2 and math.isnan(got['5s']['vwap'])  # A fall, then no change
+    logger.info("VWAP without trades is NaN")
+
+
+def test_collector_exports_every_window():
+    """The Prometheus collector reports one sample per metric, symbol and window"""
+    stats = RollingStats(windows=(60, 300))
+    for ts, data in make_ticks(50):
+        stats.observe('BTCUSDT', ts, data)
+    families = {f.name: f for f in RollingStatsCollector(stats, 'main').collect()}
+    assert set(families) == {'getws_vwap', 'getws_realized_volatility', 'getws_spread_avg', 'getws_tick_rate',
+                             'getws_zscore'}
+    samples = families['getws_tick_rate'].samples
+    assert {s.labels['window'] for s in samples} == {'60s', '300s'}
+    assert all(s.labels['symbol'] == 'BTCUSDT' and s.value > 0 for s in samples)
+    logger.info("Collector works")
+
+
+if __name__ == "__main__":
+    print("\n=== Rolling Stats Test ===\n")
+    try:
+        test_incremental_matches_recomputation()
+        test_vwap_without_trades_is_nan()
+        test_collector_exports_every_window()
+    except AssertionError as e:
+        logger.error(f"Rolling stats test failed: {e}")
+        print("\n❌ Rolling stats test failed")
+        sys.exit(1)
+    print("\n✅ Rolling stats test passed")
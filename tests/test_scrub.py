@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script for the archive scrubber.
+Checks that passes are bounded and resume, that corrupt or truncated archives are flagged,
+and that monthly packs and their manifests are in the rotation.
+"""
+
+import os
+import sys
+import json
+import logging
+import tempfile
+from datetime import date
+from pathlib import Path
+
+# Ensure project root on sys.path to import archiver
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import archiver
+import packs
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def make_archive(data_dir: Path, day: str) -> Path:
+    src = data_dir / f'price_data_{day}.jsonl'
+    src.write_bytes(b''.join(b'{"day": "%s", "n": %d}\n' % (day.encode(), i) for i in range(5000)))
+    digest, size = archiver.compute_sha256(src)
+    archiver.write_hash_file(src, digest, size)
+    xz = data_dir / f'{src.name}.xz'
+    archiver.compress_xz(src, xz, level=1)
+    archiver.write_hash_file(xz, *archiver.compute_sha256(xz))
+    src.unlink()
+    return xz
+
+
+def test_passes_are_bounded_and_resume():
+    """Each pass checks at most max_bytes, least recently verified first, and remembers what it did"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        archives = [make_archive(data_dir, f'2024-01-0{d}') for d in range(1, 5)]
+        size = max(p.stat().st_size for p in archives)
+        kwargs = dict(state_path=data_dir / 'scrub' / 'state.json', status_path=data_dir / 'scrub' / 'status.json',
+                      interval_days=30, max_bytes=2 * size, workers=2)
+
+        status = archiver.scrub_pass(data_dir, **kwargs)
+        assert status['checked_this_pass'] == 2 and status['overdue'] == 2 and status['never_verified'] == 2
+        first = set(json.loads(kwargs['state_path'].read_text()))
+        status = archiver.scrub_pass(data_dir, **kwargs)
+        assert status['checked_this_pass'] == 2 and status['overdue'] == 0
+        assert set(json.loads(kwargs['state_path'].read_text())) - first == {p.name for p in archives} - first
+        assert archiver.scrub_pass(data_dir, **kwargs)['checked_this_pass'] == 0  # Nothing due for 30 days
+        assert status['corrupt'] == [] and status['never_verified'] == 0
+    logger.info("Scrub passes are bounded and resume")
+
+
+def test_corruption_is_flagged():
+    """Bit rot and truncation are reported, marked and cleared once the archive is good again"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        rotten, truncated, good = (make_archive(data_dir, f'2024-02-0{d}') for d in range(1, 4))
+        original = rotten.read_bytes()
+        data = bytearray(original)
+        data[len(data) // 2] ^= 0x01
+        rotten.write_bytes(bytes(data))
+        truncated.write_bytes(truncated.read_bytes()[:-100])
+        kwargs = dict(state_path=data_dir / 'scrub' / 'state.json', status_path=data_dir / 'scrub' / 'status.json',
+                      interval_days=0, max_bytes=10 ** 9)
+
+        status = archiver.scrub_pass(data_dir, **kwargs)
+        assert status['corrupt'] == sorted([rotten.name, truncated.name])
+        assert (data_dir / f'{rotten.name}.corrupt').exists()
+        assert archiver.scrub_archive(truncated)[1].startswith('size')
+
+        # Deep mode decompresses and checks the original's hash instead
+        assert archiver.scrub_archive(rotten, deep=True)[0] == 'corrupt'
+        assert archiver.scrub_archive(good, deep=True) == ('ok', '')
+
+        rotten.write_bytes(original)  # Restored from backup
+        status = archiver.scrub_pass(data_dir, **kwargs)
+        assert status['corrupt'] == [truncated.name]
+        assert not (data_dir / f'{rotten.name}.corrupt').exists()
+    logger.info("Corrupt archives are flagged")
+
+
+def test_packs_are_scrubbed():
+    """Pack manifests are checked against manifest.json.sha256 and packs against the hashes they record"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        for d in range(1, 3):
+            make_archive(data_dir, f'2024-03-0{d}')
+        months = packs.find_closed_months(data_dir, today=date(2024, 4, 1))
+        manifest = packs.pack_month('2024-03', months['2024-03'], data_dir / 'packs', preset=1, workers=1)
+        pack = data_dir / 'packs' / '2024-03' / manifest['packs']['unknown']['file']
+        kwargs = dict(state_path=data_dir / 'scrub' / 'state.json', status_path=data_dir / 'scrub' / 'status.json',
+                      interval_days=0, max_bytes=10 ** 9)
+
+        status = archiver.scrub_pass(data_dir, **kwargs)
+        assert status['pack_files'] == 2 and status['checked_this_pass'] == 4 and status['corrupt'] == []
+        assert {'packs/2024-03/manifest.json', f'packs/2024-03/{pack.name}'} <= set(
+            json.loads(kwargs['state_path'].read_text()))
+
+        data = bytearray(pack.read_bytes())
+        data[len(data) // 2] ^= 0x01
+        pack.write_bytes(bytes(data))
+        manifest_path = data_dir / 'packs' / '2024-03' / 'manifest.json'
+        manifest_path.write_text(manifest_path.read_text().replace('"month"', '"Month"'))
+        status = archiver.scrub_pass(data_dir, **kwargs)
+        assert status['corrupt'] == ['packs/2024-03/manifest.json', f'packs/2024-03/{pack.name}']
+        assert pack.with_name(pack.name + '.corrupt').exists()
+    logger.info("Packs are scrubbed")
+
+
+if __name__ == "__main__":
+    print("\n=== Archive Scrub Test ===\n")
+    try:
+        test_passes_are_bounded_and_resume()
+        test_corruption_is_flagged()
+        test_packs_are_scrubbed()
+    except AssertionError as e:
+        logger.error(f"Archive scrub test failed: {e}")
+        print("\n❌ Archive scrub test failed")
+        sys.exit(1)
+    print("\n✅ Archive scrub test passed")
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Test script for the overflow spool and the client's memory cap.
+Forces data file writes to fail, then checks spilling, the in-order drain after recovery,
+a full spool, the drop_oldest/drop_newest fallbacks and that late lines for an archived day (spool drain,
+journal replay) go to a _late segment. Nothing connects to Bybit.
+"""
+
+import os
+import sys
+import json
+import lzma
+import logging
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# Ensure project root on sys.path to import spool and main
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import main
+from journal import RingJournal, encode_line
+from spool import Spool, SpoolFullError
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def tick(cs: int) -> dict:
+    return {'topic': 'tickers.BTCUSDT', 'type': 'snapshot', 'cs': cs, 'ts': 1_700_000_000_000 + cs,
+            'data': {'symbol': 'BTCUSDT', 'lastPrice': str(100 + cs)}}
+
+
+@contextmanager
+def offline_client(tmp: str, **settings):
+    """A client writing under tmp with every network-facing and background feature off"""
+    overrides = dict(
+        WS_DIR_PATH=os.path.join(tmp, 'ws_data'), SPOOL_DIR=os.path.join(tmp, 'spool'),
+        GAP_LOG_FILE=os.path.join(tmp, 'gaps.jsonl'), PID_DIR=os.path.join(tmp, 'run'), PROFILE_DIR=tmp,
+        JOURNAL_ENABLED=False, PUBSUB_ENABLED=False, TICKER_TABLE_ENABLED=False, STATS_ENABLED=False,
+        HEALTH_ENABLED=False, BACKFILL_ENABLED=False, BUFFER_MAX_BYTES=1 << 30,
+    )
+    overrides.update(settings)
+    saved = {name: getattr(main, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(main, name, value)
+    try:
+        yield main.BybitWebSocketClient()
+    finally:
+        for name, value in saved.items():
+            setattr(main, name, value)
+
+
+def break_writes(client) -> Path:
+    """A directory where the data file should be: every append fails until it is removed"""
+    path = client.get_current_file()
+    path.mkdir(parents=True)
+    return path
+
+
+def retry_now(client) -> None:
+    client.next_flush_at = 0.0  # Skip the write backoff
+    client.save_price_data()
+
+
+def test_spool_orders_chunks_and_enforces_max_bytes():
+    """Chunks drain in spill order into their own targets; a spill past max_bytes raises SpoolFullError"""
+    with tempfile.TemporaryDirectory() as tmp:
+        spool = Spool(Path(tmp) / 'spool', max_bytes=64)
+        spool.spill('a.jsonl', ['1\n', '2\n'])
+        spool.spill('b.jsonl', ['3\n'])
+        spool.spill('a.jsonl', ['4\n'])
+        try:
+            spool.spill('a.jsonl', ['x' * 60 + '\n'])
+        except SpoolFullError:
+            pass
+        else:
+            assert False, "spill past max_bytes accepted"
+        assert spool.bytes == 8 and len(spool.chunks()) == 3
+
+        reopened = Spool(Path(tmp) / 'spool', max_bytes=64)  # Pending chunks survive a restart
+        assert reopened.bytes == 8 and reopened.seq == 3
+        out = Path(tmp) / 'out'
+        out.mkdir()
+        assert reopened.drain(out) == 4
+        assert (out / 'a.jsonl').read_text() == '1\n2\n4\n' and (out / 'b.jsonl').read_text() == '3\n'
+        assert not reopened.pending() and reopened.chunks() == []
+    logger.info("Spool orders chunks and enforces max_bytes")
+
+
+def test_failed_writes_spill_then_drain_in_order():
+    """Past the memory cap a failing writer spills; after recovery every line comes back once, in order"""
+    with tempfile.TemporaryDirectory() as tmp, offline_client(tmp) as client:
+        blocker = break_writes(client)
+        for cs in range(1, 11):
+            client.handle_ticker(tick(cs))
+        main.BUFFER_MAX_BYTES = 1  # Anything buffered is over the cap
+        retry_now(client)
+        chunks = client.spool.chunks()
+        assert len(chunks) == 1 and chunks[0].name.endswith('__' + blocker.name)
+        assert len(client.flush_buffer) == 0 and client.overflow_stats['spilled_records'] == 10
+
+        for cs in range(11, 16):
+            client.handle_ticker(tick(cs))  # Over the cap: flushes, fails, spills again
+        retry_now(client)
+        assert len(client.spool.chunks()) >= 2 and client.overflow_stats['spilled_records'] == 15
+
+        blocker.rmdir()
+        main.BUFFER_MAX_BYTES = 1 << 30
+        for cs in range(16, 21):
+            client.handle_ticker(tick(cs))
+        retry_now(client)
+        lines = [json.loads(line) for line in blocker.read_text().splitlines()]
+        assert [line['full_data']['cs'] for line in lines] == list(range(1, 21))
+        assert client.spool.chunks() == [] and client.overflow_stats['drained_records'] == 15
+        assert client.overflow_stats['dropped_records'] == 0
+    logger.info("Failed writes spill, then drain in order")
+
+
+def test_full_spool_drops_oldest():
+    """With the spool full too, drop_oldest keeps the newest ticks that fit the cap"""
+    with tempfile.TemporaryDirectory() as tmp, offline_client(tmp, BUFFER_OVERFLOW_POLICY='drop_oldest') as client:
+        break_writes(client)
+        client.spool.max_bytes = 0
+        for cs in range(1, 11):
+            client.handle_ticker(tick(cs))
+        main.BUFFER_MAX_BYTES = int(client.record_bytes * 3)
+        retry_now(client)
+        assert client.spool.chunks() == [] and client.next_spill_at > 0  # Spill refused, retried later
+        assert [record.cs for record in client.flush_buffer] == [8, 9, 10]
+        assert client.overflow_stats['dropped_records'] == 7
+    logger.info("Full spool drops oldest")
+
+
+def test_full_spool_drops_newest():
+    """With the spool full too, drop_newest keeps what is buffered and refuses new ticks until writes recover"""
+    with tempfile.TemporaryDirectory() as tmp, offline_client(tmp, BUFFER_OVERFLOW_POLICY='drop_newest') as client:
+        blocker = break_writes(client)
+        client.spool.max_bytes = 0
+        for cs in range(1, 6):
+            client.handle_ticker(tick(cs))
+        main.BUFFER_MAX_BYTES = 1
+        retry_now(client)
+        assert client.shedding and len(client.flush_buffer) == 5
+        for cs in range(6, 9):
+            client.handle_ticker(tick(cs))
+        assert client.overflow_stats['dropped_records'] == 3
+
+        blocker.rmdir()
+        retry_now(client)
+        assert not client.shedding
+        assert [json.loads(line)['full_data']['cs'] for line in blocker.read_text().splitlines()] == [1, 2, 3, 4, 5]
+    logger.info("Full spool drops newest")
+
+
+def archive(path: Path) -> None:
+    """Leave path the way the archiver does: .xz plus manifest, .jsonl gone"""
+    xz = path.with_name(path.name + '.xz')
+    xz.write_bytes(lzma.compress(path.read_bytes()))
+    xz.with_name(xz.name + '.sha256').write_text('0' * 64 + '\n')
+    path.unlink()
+
+
+def test_late_lines_for_archived_day_go_to_late_segment():
+    """Spool drain and journal replay never recreate an archived day's .jsonl"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / 'ws_data'
+        data_dir.mkdir()
+        day_file = data_dir / 'price_data_2024-01-01.jsonl'
+        day_file.write_text('1\n')
+        archive(day_file)
+
+        spool = Spool(Path(tmp) / 'spool', max_bytes=1024)
+        spool.spill(day_file.name, ['2\n'])
+        assert spool.drain(data_dir) == 1
+        late = data_dir / 'price_data_late_2024-01-01.jsonl'
+        assert not day_file.exists() and late.read_text() == '2\n'
+
+        # Once the late segment is archived too, the next one takes over
+        archive(late)
+        journal = RingJournal(Path(tmp) / 'journal' / 'main.journal', 1024)
+        journal.append(encode_line(day_file.name, '3\n'))
+        journal.close()
+        with offline_client(tmp, JOURNAL_ENABLED=True, JOURNAL_DIR=os.path.join(tmp, 'journal'),
+                            JOURNAL_SIZE=1024, WS_DIR_PATH=str(data_dir)) as client:
+            assert not client.journal.pending()
+        assert not day_file.exists() and not late.exists()
+        assert (data_dir / 'price_data_late2_2024-01-01.jsonl').read_text() == '3\n'
+    logger.info("Late lines for archived days go to a late segment")
+
+
+if __name__ == "__main__":
+    print("\n=== Spool Test ===\n")
+    try:
+        test_spool_orders_chunks_and_enforces_max_bytes()
+        test_failed_writes_spill_then_drain_in_order()
+        test_full_spool_drops_oldest()
+        test_full_spool_drops_newest()
+        test_late_lines_for_archived_day_go_to_late_segment()
+    except AssertionError as e:
+        logger.error(f"Spool test failed: {e}")
+        print("\n❌ Spool test failed")
+        sys.exit(1)
+    print("\n✅ Spool test passed")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for the shard supervisor.
+Checks shard partitioning, the restart backoff for crashing or silent workers and the aggregated status.
+Workers are stand-in processes, so no client is started and nothing connects to Bybit.
+"""
+
+import os
+import sys
+import time
+import logging
+
+# Ensure project root on sys.path to import supervisor
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import supervisor
+from supervisor import Supervisor, build_shards
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+class StandInSupervisor(Supervisor):
+    """Starts `target(*args)` instead of a real ingest worker"""
+
+    def __init__(self, shards, target, args=()):
+        super().__init__(shards)
+        self.target = target
+        self.args = args
+
+    def start_worker(self, shard_id):
+        process = self.ctx.Process(target=self.target, args=self.args, name=f'ingest-{shard_id}', daemon=True)
+        process.start()
+        self.processes[shard_id] = process
+        self.started_at[shard_id] = time.time()
+        self.restart_at.pop(shard_id, None)
+
+
+def test_build_shards_partitions_every_symbol():
+    """Each channel is cut into shards of at most shard_size; no symbol is lost or duplicated"""
+    subscriptions = {
+        'linear': [f'L{i}USDT' for i in range(23)],
+        'spot': [f'S{i}USDT' for i in range(10)],
+        'inverse': ['BTCUSD'],
+        'option': [],
+    }
+    shards = build_shards(subscriptions, 5)
+    assert [s['id'] for s in shards] == [f'linear-{n}' for n in range(5)] + ['spot-0', 'spot-1', 'inverse-0']
+    assert all(1 <= len(s['symbols']) <= 5 for s in shards)
+    for channel_type, symbols in subscriptions.items():
+        got = [sym for s in shards if s['channel_type'] == channel_type for sym in s['symbols']]
+        assert got == symbols, channel_type  # Same symbols, same order, each once
+    ports = [s['health_port'] for s in shards] + [s['metrics_port'] for s in shards]
+    assert len(set(ports)) == len(ports)
+    logger.info("Shards partition every symbol")
+
+
+def test_crashing_worker_backs_off():
+    """A worker that exits at once is restarted with 1s, 2s, 4s... delays, capped at the maximum"""
+    saved = supervisor.SUPERVISOR_RESTART_MAX_DELAY
+    supervisor.SUPERVISOR_RESTART_MAX_DELAY = 4
+    sup = StandInSupervisor(build_shards({'linear': ['BTCUSDT']}, 10), target=sys.exit, args=(3,))
+    try:
+        delays = []
+        for attempt in range(5):
+            if attempt:
+                sup.restart_at['linear-0'] = time.time() - 1  # Skip the wait
+            sup.check_workers()  # Starts (or restarts) the worker
+            process = sup.processes['linear-0']
+            process.join(30)
+            assert process.exitcode == 3
+            before = time.time()
+            sup.check_workers()  # Notices the exit and schedules the restart
+            delays.append(round(sup.restart_at['linear-0'] - before))
+        assert delays == [1, 2, 4, 4, 4], delays
+        assert sup.restarts['linear-0'] == 4 and sup.failures['linear-0'] == 5
+
+        # Not due yet: nothing is started
+        process = sup.processes['linear-0']
+        sup.check_workers()
+        assert sup.processes['linear-0'] is process
+    finally:
+        sup.stop()
+        supervisor.SUPERVISOR_RESTART_MAX_DELAY = saved
+    logger.info("Crashing worker backs off")
+
+
+def test_silent_worker_is_killed():
+    """A worker alive but silent past the heartbeat timeout is killed and scheduled for restart"""
+    sup = StandInSupervisor(build_shards({'linear': ['BTCUSDT']}, 10), target=time.sleep, args=(60,))
+    try:
+        sup.check_workers()
+        process = sup.processes['linear-0']
+        assert process.is_alive()
+        sup.check_workers()
+        assert 'linear-0' not in sup.restart_at  # Still within its heartbeat timeout
+
+        sup.started_at['linear-0'] -= supervisor.SUPERVISOR_HEARTBEAT_TIMEOUT + 1
+        sup.check_workers()
+        assert not process.is_alive() and 'linear-0' in sup.restart_at
+        assert sup.failures['linear-0'] == 1
+    finally:
+        sup.stop()
+    logger.info("Silent worker is killed")
+
+
+def test_get_status_aggregates_heartbeats():
+    """Heartbeats from the queue are summed into totals; only fresh, alive shards count as healthy"""
+    sup = StandInSupervisor(build_shards({'linear': ['BTCUSDT', 'ETHUSDT'], 'spot': ['BTCUSDT']}, 1),
+                            target=time.sleep, args=(60,))
+    try:
+        for shard_id in sup.shards:
+            sup.start_worker(shard_id)
+        for n, shard_id in enumerate(['linear-0', 'linear-1']):
+            sup.status_queue.put({'shard': shard_id, 'messages': 10 + n, 'written': 8, 'buffered': 2,
+                                  'duplicates': n})
+        deadline = time.time() + 10
+        while len(sup.health) < 2 and time.time() < deadline:
+            sup.drain_status()
+            time.sleep(0.05)
+        sup.health['linear-1']['received_at'] -= supervisor.SUPERVISOR_HEARTBEAT_TIMEOUT + 1
+
+        status = sup.get_status()
+        assert status['shards_total'] == 3 and status['shards_healthy'] == 1
+        assert status['totals'] == {'messages': 21, 'written': 16, 'buffered': 4, 'duplicates': 1}
+        shard = status['shards']['linear-0']
+        assert shard['alive'] and shard['symbols'] == 1 and shard['restarts'] == 0 and shard['heartbeat_age'] < 10
+        assert status['shards']['spot-0']['heartbeat_age'] is None and status['shards']['spot-0']['report'] == {}
+    finally:
+        sup.stop()
+    logger.info("Status aggregates heartbeats")
+
+
+if __name__ == "__main__":
+    print("\n=== Supervisor Test ===\n")
+    try:
+        test_build_shards_partitions_every_symbol()
+        test_crashing_worker_backs_off()
+        test_silent_worker_is_killed()
+        test_get_status_aggregates_heartbeats()
+    except AssertionError as e:
+        logger.error(f"Supervisor test failed: {e}")
+        print("\n❌ Supervisor test failed")
+        sys.exit(1)
+    print("\n✅ Supervisor test passed")
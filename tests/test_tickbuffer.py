@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test script for the compact in-memory tick buffer.
+Checks the written entry shape and that buffered records are snapshots.
+"""
+
+import os
+import sys
+import logging
+from datetime import datetime
+
+# Ensure project root on sys.path to import tickbuffer
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from config import TICK_SCHEMA, TYPED_TICK_SCHEMA
+from tickbuffer import FieldProjection, TickBuffer, iso_from_ns
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def test_entries_are_snapshots():
+    """pybit updates its merged ticker dict in place; buffered records must not change with it"""
+    buffer = TickBuffer(capacity=1)
+    state = {'symbol': 'BTCUSDT', 'lastPrice': '100.0'}
+    message = {'topic': 'tickers.BTCUSDT', 'type': 'snapshot', 'data': state, 'cs': 1, 'ts': 1000}
+    buffer.append(message, 100.0, ts_ns=1_700_000_000_123_456_789)
+
+    state['lastPrice'] = '101.0'
+    buffer.append(dict(message, cs=2, ts=1100), 101.0)  # Grows past capacity
+
+    entries = [record.to_entry() for record in buffer]
+    assert len(buffer) == 2
+    assert entries[0]['full_data']['data']['lastPrice'] == '100.0'
+    assert entries[1]['full_data']['data']['lastPrice'] == '101.0'
+    assert entries[0]['full_data'] == {'topic': 'tickers.BTCUSDT', 'type': 'snapshot',
+                                       'data': {'symbol': 'BTCUSDT', 'lastPrice': '100.0'}, 'cs': 1, 'ts': 1000}
+    assert entries[0]['timestamp'] == datetime.fromtimestamp(1_700_000_000).replace(microsecond=123456).isoformat()
+    assert entries[0]['recv_ns'] == 1_700_000_000_123_456_789
+    logger.info("Buffered records are snapshots")
+
+
+def test_take_keeps_order_and_reuses_records():
+    """Moving records between buffers keeps order and recycles the pool"""
+    active, pending = TickBuffer(2), TickBuffer(2)
+    for i in range(2):
+        pending.append({'topic': 't', 'data': {'lastPrice': str(i)}}, float(i))
+    active.append({'topic': 't', 'data': {'lastPrice': '2'}}, 2.0)
+    records_before = set(map(id, active.records + pending.records))
+
+    pending.take(active)
+    assert [r.price for r in pending] == [0.0, 1.0, 2.0]
+    assert len(active) == 0
+    pending.clear()
+    assert len(pending) == 0
+    assert set(map(id, active.records + pending.records)) >= records_before
+    assert iso_from_ns(0) == datetime.fromtimestamp(0).isoformat()
+    logger.info("Buffer hand-off works")
+
+
+def test_projection_types_and_raw():
+    """The schema keeps only its fields, typed; unparseable values become None; raw is optional"""
+    projection = FieldProjection({'symbol': 'str', 'lastPrice': 'float64', 'markPrice': 'float64',
+                                  'nextFundingTime': 'ts_ns', 'openInterest': 'int64'})
+    data = {'symbol': 'BTCUSDT', 'lastPrice': '17216.00', 'markPrice': '', 'nextFundingTime': '1673280000000',
+            'openInterest': 'n/a', 'tickDirection': 'PlusTick'}
+    message = {'topic': 'tickers.BTCUSDT', 'type': 'snapshot', 'data': data, 'cs': 1, 'ts': 1000}
+
+    projected = TickBuffer(1, projection)
+    projected.append(message, 17216.0)
+    assert next(iter(projected)).to_entry()['full_data']['data'] == {
+        'symbol': 'BTCUSDT', 'lastPrice': 17216.0, 'markPrice': None,
+        'nextFundingTime': 1673280000000 * 1_000_000, 'openInterest': None,
+    }
+
+    with_raw = TickBuffer(1, projection, keep_raw=True)
+    with_raw.append(message, 17216.0)
+    data['lastPrice'] = '17217.00'  # pybit mutates its dict in place
+    assert next(iter(with_raw)).to_entry()['full_data']['raw']['lastPrice'] == '17216.00'
+
+    try:
+        FieldProjection({'lastPrice': 'decimal'})
+        assert False, "unknown type accepted"
+    except ValueError:
+        pass
+    logger.info("Field projection works")
+
+
+def test_schema_per_category():
+    """Spot tickers carry different fields than linear/inverse; each category keeps its own"""
+    spot = {'symbol': 'BTCUSDT', 'lastPrice': '21109.77', 'highPrice24h': '21426.99', 'lowPrice24h': '20575',
+            'prevPrice24h': '20704.93', 'volume24h': '6780.866843', 'turnover24h': '141946527.22',
+            'price24hPcnt': '0.0196', 'usdIndexPrice': '21120.2400136'}
+    buffer = TickBuffer(1, FieldProjection(TYPED_TICK_SCHEMA['spot']))
+    buffer.append({'topic': 'tickers.BTCUSDT', 'type': 'snapshot', 'data': spot, 'cs': 1, 'ts': 1000}, 21109.77)
+    stored = next(iter(buffer)).to_entry()['full_data']['data']
+    assert set(stored) == set(spot) and None not in stored.values(), stored
+    assert stored['usdIndexPrice'] == 21120.2400136
+
+    for category in ('linear', 'inverse'):
+        assert {'markPrice', 'fundingRate', 'openInterest'} <= set(TYPED_TICK_SCHEMA[category])
+        FieldProjection(TYPED_TICK_SCHEMA[category])
+    # The stored format only changes when the projection is opted into
+    assert TICK_SCHEMA is None
+    logger.info("Schema per category works")
+
+
+if __name__ == "__main__":
+    print("\n=== Tick Buffer Test ===\n")
+    try:
+        test_entries_are_snapshots()
+        test_take_keeps_order_and_reuses_records()
+        test_projection_types_and_raw()
+        test_schema_per_category()
+    except AssertionError as e:
+        logger.error(f"Tick buffer test failed: {e}")
+        print("\n❌ Tick buffer test failed")
+        sys.exit(1)
+    print("\n✅ Tick buffer test passed")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared-memory latest-ticker table.
+Checks reads from another process are never torn and that a re-layout is picked up.
+"""
+
+import os
+import sys
+import math
+import logging
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+# Ensure project root on sys.path to import tickertable
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from ticker_reader import TickerReader
+from tickertable import TickerTable
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def hammer(path, updates):
+    table = TickerTable(path, ['BTCUSDT', 'ETHUSDT'])
+    for i in range(1, updates + 1):
+        value = str(i)
+        table.update('BTCUSDT', {'lastPrice': value, 'bid1Price': value, 'ask1Price': value,
+                                 'markPrice': value, 'indexPrice': value}, i)
+
+
+def test_reads_are_consistent_across_processes():
+    """Every field of a slot read during concurrent writes comes from the same update"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'main.tickers'
+        TickerTable(path, ['BTCUSDT', 'ETHUSDT']).close()
+        reader = TickerReader(tmp)
+        assert reader.get('ETHUSDT') is None  # Never written
+
+        writer = multiprocessing.get_context('spawn').Process(target=hammer, args=(path, 200000))
+        writer.start()
+        reads = 0
+        while writer.is_alive() or reads == 0:
+            ticker = reader.get('BTCUSDT')
+            if ticker is None:
+                continue
+            reads += 1
+            assert ticker.last_price == ticker.bid == ticker.ask == ticker.mark_price == ticker.index_price == ticker.ts
+        writer.join()
+        assert reader.price('BTCUSDT') == 200000.0
+        logger.info(f"{reads} consistent reads during writes")
+
+
+def test_missing_fields_and_relayout():
+    """Absent fields read as NaN; a writer restart with other symbols is noticed by readers"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'main.tickers'
+        table = TickerTable(path, ['BTCUSDT'])
+        table.update('BTCUSDT', {'lastPrice': '100.5', 'bid1Price': '100', 'ask1Price': '101'}, 1000)
+        reader = TickerReader(tmp)
+        ticker = reader.get('BTCUSDT')
+        assert (ticker.last_price, ticker.bid, ticker.ask, ticker.ts) == (100.5, 100.0, 101.0, 1000)
+        assert math.isnan(ticker.mark_price) and math.isnan(ticker.index_price)
+
+        table.close()
+        restarted = TickerTable(path, ['ETHUSDT', 'BTCUSDT'])
+        assert reader.get('BTCUSDT') is None  # Re-scanned: the new table has no data for it yet
+        restarted.update('ETHUSDT', {'lastPrice': '2000'}, 2000)
+        assert reader.price('ETHUSDT') == 2000.0
+        restarted.close()
+        reader.close()
+    logger.info("Missing fields and re-layout handled")
+
+
+if __name__ == "__main__":
+    print("\n=== Ticker Table Test ===\n")
+    try:
+        test_reads_are_consistent_across_processes()
+        test_missing_fields_and_relayout()
+    except AssertionError as e:
+        logger.error(f"Ticker table test failed: {e}")
+        print("\n❌ Ticker table test failed")
+        sys.exit(1)
+    print("\n✅ Ticker table test passed")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script for the asyncio WebSocket engine against a local mock of Bybit's v5 public stream.
+Checks subscription batching and acks, ticker delta merging, rejected subscriptions and the ping timeout.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import logging
+
+# Ensure project root on sys.path to import wsengine
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from websockets.asyncio.server import serve
+
+from wsengine import BybitStream, public_url
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+class MockBybit:
+    """Acks subscriptions, answers pings and sends a snapshot plus deltas per subscribed ticker topic."""
+
+    def __init__(self, reject=(), answer_pings=True):
+        self.reject = set(reject)
+        self.answer_pings = answer_pings
+        self.requests = []
+
+    async def handler(self, ws):
+        async for raw in ws:
+            request = json.loads(raw)
+            self.requests.append(request)
+            if request['op'] == 'ping':
+                if self.answer_pings:
+                    await ws.send(json.dumps({'success': True, 'ret_msg': 'pong', 'op': 'ping'}))
+                continue
+            rejected = self.reject & set(request['args'])
+            await ws.send(json.dumps({'success': not rejected, 'ret_msg': 'error' if rejected else '',
+                                      'op': 'subscribe', 'req_id': request['req_id']}))
+            for topic in request['args']:
+                symbol = topic.split('.')[1]
+                await ws.send(json.dumps({'topic': topic, 'type': 'snapshot', 'cs': 1, 'ts': 1000,
+                                          'data': {'symbol': symbol, 'lastPrice': '100', 'bid1Price': '99'}}))
+                await ws.send(json.dumps({'topic': topic, 'type': 'delta', 'cs': 2, 'ts': 1100,
+                                          'data': {'symbol': symbol, 'bid1Price': '99.5'}}))
+
+
+async def run_stream(mock, topics, until, **kwargs):
+    messages, closed = [], asyncio.Event()
+    async with serve(mock.handler, '127.0.0.1', 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        stream = BybitStream(f'ws://127.0.0.1:{port}/v5/public/linear', topics, messages.append, closed.set, **kwargs)
+        try:
+            await stream.connect(timeout=5)
+            await asyncio.wait_for(until(messages, closed), 5)
+        finally:
+            await stream.close()
+    return messages, closed.is_set()
+
+
+def test_subscribe_and_merge_deltas():
+    """Topics are subscribed in batches and deltas arrive as full snapshots"""
+    mock = MockBybit()
+    topics = [f'tickers.SYM{i}USDT' for i in range(12)]
+
+    async def all_delivered(messages, closed):
+        while len(messages) < 2 * len(topics):
+            await asyncio.sleep(0.01)
+
+    messages, _closed = asyncio.run(run_stream(mock, topics, all_delivered, subscribe_batch=5))
+    assert [len(r['args']) for r in mock.requests if r['op'] == 'subscribe'] == [5, 5, 2]
+    deltas = [m for m in messages if m['cs'] == 2]
+    assert len(deltas) == 12 and all(m['type'] == 'snapshot' for m in deltas)
+    assert deltas[0]['data'] == {'symbol': 'SYM0USDT', 'lastPrice': '100', 'bid1Price': '99.5'}
+    assert messages[0]['data']['bid1Price'] == '99'  # Delivered messages are not changed by later deltas
+    assert public_url('spot', domain='bytick') == 'wss://stream.bytick.com/v5/public/spot'
+    logger.info("Subscriptions acked and deltas merged")
+
+
+def test_rejected_subscription_fails_connect():
+    """A rejected subscribe makes connect() raise instead of streaming a partial set"""
+    mock = MockBybit(reject={'tickers.BADUSDT'})
+
+    async def never(messages, closed):
+        await asyncio.sleep(10)
+
+    try:
+        asyncio.run(run_stream(mock, ['tickers.BTCUSDT', 'tickers.BADUSDT'], never, subscribe_batch=1))
+    except ConnectionError as e:
+        assert 'rejected' in str(e)
+    else:
+        assert False, "connect() should have failed"
+    logger.info("Rejected subscription fails connect")
+
+
+def test_missing_pong_closes():
+    """A connection whose pings go unanswered is closed and reported"""
+    mock = MockBybit(answer_pings=False)
+
+    async def until_closed(messages, closed):
+        await closed.wait()
+
+    messages, closed = asyncio.run(run_stream(mock, ['tickers.BTCUSDT'], until_closed,
+                                              ping_interval=0.1, ping_timeout=0.1))
+    assert closed and len(messages) == 2
+    assert any(r['op'] == 'ping' for r in mock.requests)
+    logger.info("Missing pong closes the connection")
+
+
+if __name__ == "__main__":
+    print("\n=== WebSocket Engine Test ===\n")
+    try:
+        test_subscribe_and_merge_deltas()
+        test_rejected_subscription_fails_connect()
+        test_missing_pong_closes()
+    except AssertionError as e:
+        logger.error(f"WebSocket engine test failed: {e}")
+        print("\n❌ WebSocket engine test failed")
+        sys.exit(1)
+    print("\n✅ WebSocket engine test passed")
@@ -0,0 +1,209 @@
+import json
+import sys
+import time
+from datetime import datetime
+
+
+class TickRecord:
+    """One buffered ticker update. Field names are shared per layout, values kept as a tuple."""
+
+    __slots__ = ('ts_ns', 'price', 'topic', 'type', 'cs', 'ts', 'keys', 'values', 'raw_keys', 'raw_values',
+                 'line', 'jpos')
+
+    def __init__(self):
+        self.ts_ns = 0
+        self.price = 0.0
+        self.topic = None
+        self.type = None
+        self.cs = None
+        self.ts = None
+        self.keys = ()
+        self.values = ()
+        self.raw_keys = None  # Full payload, kept next to projected fields only if asked to
+        self.raw_values = None
+        self.line = None  # Serialized JSONL line, cached once something needed it early (the journal)
+        self.jpos = None  # Journal end offset, if the record was journaled
+
+    def to_entry(self) -> dict:
+        """Rebuild the JSONL entry written to the data files (recv_ns: receive time, ns since the epoch)."""
+        entry = {
+            'timestamp': iso_from_ns(self.ts_ns),
+            'recv_ns': self.ts_ns,
+            'price': self.price,
+            'full_data': {
+                'topic': self.topic,
+                'type': self.type,
+                'data': dict(zip(self.keys, self.values)),
+                'cs': self.cs,
+                'ts': self.ts,
+            },
+        }
+        if self.raw_keys is not None:
+            entry['full_data']['raw'] = dict(zip(self.raw_keys, self.raw_values))
+        return entry
+
+    def to_line(self) -> str:
+        if self.line is None:
+            self.line = json.dumps(self.to_entry()) + '\n'
+        return self.line
+
+
+def iso_from_ns(ts_ns: int) -> str:
+    # Local naive ISO with microseconds, matching datetime.now().isoformat()
+    return datetime.fromtimestamp(ts_ns // 1_000_000_000).replace(microsecond=(ts_ns // 1000) % 1_000_000).isoformat()
+
+
+def to_ts_ns(value) -> int:
+    return int(value) * 1_000_000  # Bybit sends ms
+
+
+FIELD_TYPES = {'float64': float, 'int64': int, 'ts_ns': to_ts_ns, 'str': str}
+
+
+class FieldProjection:
+    """
+    Picks and types the ticker fields that get stored (config.TICK_SCHEMA).
+
+    Bybit sends every number as a string; converting once here means the
+    files are smaller and readers get numbers. Missing, empty or
+    unparseable values are stored as null.
+    """
+
+    def __init__(self, schema: dict):
+        unknown = {t for t in schema.values() if t not in FIELD_TYPES}
+        if unknown:
+            raise ValueError(f"Unknown field types in tick schema: {sorted(unknown)} (use {sorted(FIELD_TYPES)})")
+        self.keys = tuple(sys.intern(k) for k in schema)
+        self.converters = tuple((k, FIELD_TYPES[t]) for k, t in schema.items())
+
+    def apply(self, data: dict) -> tuple:
+        try:
+            # Fast path: every field present and well-formed
+            return tuple([convert(data[key]) for key, convert in self.converters])
+        except (KeyError, TypeError, ValueError):
+            pass
+        values = []
+        for key, convert in self.converters:
+            value = data.get(key)
+            if value is None or value == '':
+                values.append(None)
+                continue
+            try:
+                values.append(convert(value))
+            except (TypeError, ValueError):
+                values.append(None)
+        return tuple(values)
+
+
+class TickBuffer:
+    """
+    Preallocated pool of TickRecords reused across flushes.
+
+    Appending fills the next record in place instead of building nested
+    dicts and an ISO string per tick; topics and field-name tuples are
+    interned so every record points at the same objects. The values are
+    snapshotted into a tuple, so later in-place updates to pybit's merged
+    ticker dict do not leak into records that are still buffered.
+
+    With a projection only the schema's fields are kept, already typed;
+    keep_raw additionally keeps the full payload under full_data['raw'].
+    """
+
+    def __init__(self, capacity: int = 100, projection: FieldProjection = None, keep_raw: bool = False):
+        self.records = [TickRecord() for _ in range(capacity)]
+        self.count = 0
+        self.layouts = {}
+        self.projection = projection
+        self.keep_raw = keep_raw and projection is not None
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __iter__(self):
+        records = self.records
+        for i in range(self.count):
+            yield records[i]
+
+    def next_record(self) -> TickRecord:
+        if self.count == len(self.records):
+            # Only grows when flushes fail; the extra records are reused afterwards
+            self.records.append(TickRecord())
+        record = self.records[self.count]
+        self.count += 1
+        return record
+
+    def append(self, message: dict, price: float, ts_ns: int = None) -> TickRecord:
+        data = message['data']
+        raw_layout = raw_values = None
+        if self.projection is None or self.keep_raw:
+            keys = tuple(data)
+            raw_layout = self.layouts.get(keys)
+            if raw_layout is None:
+                raw_layout = self.layouts[keys] = tuple(sys.intern(k) for k in keys)
+            raw_values = tuple(data.values())
+        if self.projection is None:
+            layout, values = raw_layout, raw_values
+            raw_layout = raw_values = None
+        else:
+            layout, values = self.projection.keys, self.projection.apply(data)
+
+        record = self.next_record()
+        record.ts_ns = ts_ns if ts_ns is not None else time.time_ns()
+        record.price = price
+        record.topic = sys.intern(message.get('topic', ''))
+        record.type = message.get('type')
+        record.cs = message.get('cs')
+        record.ts = message.get('ts')
+        record.keys = layout
+        record.values = values
+        record.raw_keys = raw_layout
+        record.raw_values = raw_values
+        record.line = None
+        record.jpos = None
+        return record
+
+    def take(self, other: 'TickBuffer') -> None:
+        """Move other's records to the end of this buffer by swapping pool slots (no copies)."""
+        if self.count == 0:
+            self.records, other.records = other.records, self.records
+            self.count, other.count = other.count, 0
+            return
+        for i in range(other.count):
+            if self.count < len(self.records):
+                self.records[self.count], other.records[i] = other.records[i], self.records[self.count]
+            else:
+                self.records.append(other.records[i])
+                other.records[i] = TickRecord()
+            self.count += 1
+        other.count = 0
+
+    def last_jpos(self):
+        """Journal offset covering every journaled record in the buffer, or None."""
+        for i in range(self.count - 1, -1, -1):
+            if self.records[i].jpos is not None:
+                return self.records[i].jpos
+        return None
+
+    def drop_oldest(self, n: int) -> int:
+        """Discard the n oldest records (last-resort overflow policy); returns how many were dropped."""
+        n = min(n, self.count)
+        for record in self.records[:n]:
+            record.values = ()
+            record.raw_values = None
+            record.line = None
+        # Rotate the dropped records to the back of the pool so they get reused
+        self.records = self.records[n:] + self.records[:n]
+        self.count -= n
+        return n
+
+    def clear(self) -> None:
+        # Drop references held by the used records but keep the records themselves
+        for i in range(self.count):
+            record = self.records[i]
+            record.values = ()
+            record.raw_keys = record.raw_values = None
+            record.line = None
+        self.count = 0
@@ -0,0 +1,123 @@
+"""
+Lock-free reader for the shared-memory latest-ticker tables written by the ingester.
+
+Standalone on purpose (stdlib only): copy it into any project that needs
+"the current price of X". Each ingester process maps one <shard>.tickers
+file, one fixed-size slot per symbol:
+
+    header  64 bytes   magic 'GWSTICK1', slot count, slot size
+    slot   128 bytes   seq (u64), symbol (16s), lastPrice, bid1Price,
+                       ask1Price, markPrice, indexPrice (f64),
+                       exchange ts ms (i64), local receive ns (i64)
+
+The writer bumps seq to an odd value, writes the fields and bumps it to
+even again (a seqlock). Readers copy the slot and retry if seq was odd
+or changed underneath them, so they never block the writer. Fields a
+channel does not provide (e.g. mark price on spot) are NaN.
+
+    reader = TickerReader()
+    reader.price('BTCUSDT')
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+
+MAGIC = b'GWSTICK1'
+HEADER = struct.Struct('<8sII')  # magic, slot count, slot size
+HEADER_SIZE = 64
+SLOT = struct.Struct('<Q16s5dqq')
+SEQ = struct.Struct('<Q')
+PRICE = struct.Struct('<Q16sd')  # Leading part of a slot: seq, symbol, lastPrice
+SLOT_SIZE = 128
+MAX_RETRIES = 1000
+
+DEFAULT_DIR = os.environ.get(
+    'TICKER_TABLE_DIR',
+    '/dev/shm/get_ws_data' if os.path.isdir('/dev/shm') else os.path.join(tempfile.gettempdir(), 'get_ws_data_tickers'),
+)
+
+Ticker = namedtuple('Ticker', 'symbol last_price bid ask mark_price index_price ts recv_ns')
+
+
+class TickerReader:
+    """Reads every <shard>.tickers table in a directory (or a single table file)."""
+
+    def __init__(self, path=DEFAULT_DIR):
+        self.path = Path(path)
+        self.maps = []
+        self.index = {}
+        self.refresh()
+
+    def refresh(self):
+        """Re-scan table files; done automatically when a symbol moved or appeared."""
+        for mm in self.maps:
+            mm.close()
+        self.maps = []
+        self.index = {}
+        files = [self.path] if self.path.is_file() else sorted(self.path.glob('*.tickers'))
+        for file in files:
+            with open(file, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, slots, slot_size = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or slot_size != SLOT_SIZE:
+                mm.close()
+                continue
+            self.maps.append(mm)
+            for i in range(slots):
+                offset = HEADER_SIZE + i * SLOT_SIZE
+                name = SLOT.unpack_from(mm, offset)[1]
+                if name.strip(b'\0'):
+                    self.index[name.rstrip(b'\0').decode()] = (mm, offset, name)
+
+    def read(self, symbol: str, retry: bool = True, layout=SLOT):
+        """Return the raw slot tuple for symbol, or None if unknown or never written."""
+        where = self.index.get(symbol)
+        if where is None:
+            if not retry:
+                return None
+            self.refresh()
+            return self.read(symbol, False, layout)
+        mm, offset, name = where
+        unpack_from, seq_from = layout.unpack_from, SEQ.unpack_from
+        for _ in range(MAX_RETRIES):
+            values = unpack_from(mm, offset)
+            if values[0] & 1 or seq_from(mm, offset)[0] != values[0]:
+                continue  # Torn read: the writer was mid-update
+            if values[1] != name:
+                # The writer restarted with another layout and retired this slot
+                if not retry:
+                    return None
+                self.refresh()
+                return self.read(symbol, False, layout)
+            if values[0] == 0:
+                return None
+            return values
+        return None
+
+    def get(self, symbol: str):
+        values = self.read(symbol)
+        if values is None:
+            return None
+        return Ticker(values[1].rstrip(b'\0').decode(), *values[2:])
+
+    def price(self, symbol: str) -> float:
+        values = self.read(symbol, True, PRICE)
+        return values[2] if values else float('nan')
+
+    def close(self):
+        for mm in self.maps:
+            mm.close()
+        self.maps = []
+        self.index = {}
+
+
+if __name__ == "__main__":
+    import sys
+
+    reader = TickerReader(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DIR)
+    for symbol in sorted(reader.index):
+        print(reader.get(symbol))
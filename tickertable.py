@@ -0,0 +1,101 @@
+import logging
+import math
+import mmap
+import os
+import time
+from pathlib import Path
+
+from ticker_reader import HEADER, HEADER_SIZE, MAGIC, SEQ, SLOT, SLOT_SIZE
+
+NAN = math.nan
+
+
+def to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN  # Missing on this channel (e.g. markPrice on spot) or an empty string
+
+
+class TickerTable:
+    """
+    Writer side of the shared-memory latest-ticker table (see ticker_reader.py for the layout).
+
+    One slot per subscribed symbol, updated in place with a seqlock so
+    readers in other processes never block the ingester. The caller must
+    serialize update() calls (the client holds buffer_lock).
+    """
+
+    def __init__(self, path, symbols):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.symbols = [s.encode('ascii')[:16] for s in symbols]
+        self.slots = {s: HEADER_SIZE + i * SLOT_SIZE for i, s in enumerate(symbols)}
+        self.names = dict(zip(symbols, self.symbols))
+        self.seqs = dict.fromkeys(symbols, 0)
+        self.mm = self.open_existing() or self.create()
+
+    def open_existing(self):
+        """Reuse the previous run's table in place when the symbol layout matches."""
+        if not self.path.exists():
+            return None
+        with open(self.path, 'r+b') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0)
+            except ValueError:
+                return None  # Empty file
+        magic, slots, slot_size = HEADER.unpack_from(mm, 0)
+        names = [SLOT.unpack_from(mm, HEADER_SIZE + i * SLOT_SIZE)[1].rstrip(b'\0') for i in range(slots)] \
+            if magic == MAGIC and slot_size == SLOT_SIZE and len(mm) == HEADER_SIZE + slots * SLOT_SIZE else None
+        if names == self.symbols:
+            for symbol, offset in self.slots.items():
+                seq = SEQ.unpack_from(mm, offset)[0]
+                self.seqs[symbol] = seq + (seq & 1)  # A crash mid-write leaves it odd
+                SEQ.pack_into(mm, offset, self.seqs[symbol])
+            return mm
+        # Readers may still map the old file; blank its symbols so they notice and re-scan
+        if names is not None:
+            for i in range(slots):
+                offset = HEADER_SIZE + i * SLOT_SIZE
+                seq = SEQ.unpack_from(mm, offset)[0]
+                SEQ.pack_into(mm, offset, seq | 1)
+                mm[offset + SEQ.size:offset + SEQ.size + 16] = bytes(16)
+                SEQ.pack_into(mm, offset, (seq | 1) + 1)
+        mm.close()
+        return None
+
+    def create(self):
+        # Build the new table aside and swap it in, so no reader ever maps a short file
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(self.symbols), SLOT_SIZE).ljust(HEADER_SIZE, b'\0'))
+            for name in self.symbols:
+                f.write(SLOT.pack(0, name, NAN, NAN, NAN, NAN, NAN, 0, 0).ljust(SLOT_SIZE, b'\0'))
+        os.replace(tmp, self.path)
+        with open(self.path, 'r+b') as f:
+            mm = mmap.mmap(f.fileno(), 0)
+        logging.info(f"Latest-ticker table for {len(self.symbols)} symbols at {self.path}")
+        return mm
+
+    def update(self, symbol: str, data: dict, ts) -> None:
+        offset = self.slots.get(symbol)
+        if offset is None:
+            return
+        seq = self.seqs[symbol] + 1
+        mm = self.mm
+        SEQ.pack_into(mm, offset, seq)  # Odd: readers retry until the write completes
+        SLOT.pack_into(
+            mm, offset, seq, self.names[symbol],
+            to_float(data.get('lastPrice')),
+            to_float(data.get('bid1Price')),
+            to_float(data.get('ask1Price')),
+            to_float(data.get('markPrice')),
+            to_float(data.get('indexPrice')),
+            ts or 0,
+            time.time_ns(),
+        )
+        SEQ.pack_into(mm, offset, seq + 1)
+        self.seqs[symbol] = seq + 1
+
+    def close(self):
+        self.mm.close()
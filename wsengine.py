@@ -0,0 +1,156 @@
+"""
+asyncio-native Bybit v5 public stream, used by main.py when WS_ENGINE = 'asyncio'.
+
+pybit runs each connection on its own websocket-client thread and calls
+back into ours for every message. BybitStream instead reads the socket
+in the event loop: it speaks the v5 public protocol itself
+({"op": "subscribe"} with acks, {"op": "ping"} keepalives) and hands each
+message to the callback on the loop thread, so any number of connections
+share one thread.
+
+Ticker deltas are merged into the last snapshot of their topic and
+delivered as type 'snapshot' with the full data, exactly as pybit
+delivers them, so the stored lines do not depend on the engine.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import time
+
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+PUBLIC_URL = "wss://{subdomain}.{domain}.com/v5/public/{channel_type}"
+
+
+def public_url(channel_type: str, testnet: bool = False, domain: str = '') -> str:
+    """Same endpoint pybit uses: wss://stream[-testnet].<bybit|bytick>.com/v5/public/<channel_type>."""
+    subdomain = 'stream-testnet' if testnet else 'stream'
+    return PUBLIC_URL.format(subdomain=subdomain, domain=domain or 'bybit', channel_type=channel_type)
+
+
+class BybitStream:
+    """One WebSocket connection subscribed to a set of public topics."""
+
+    def __init__(self, url: str, topics, on_message, on_close=None, ping_interval: float = 20.0,
+                 ping_timeout: float = 10.0, subscribe_batch: int = 10, on_pong=None):
+        self.url = url
+        self.topics = list(topics)
+        self.on_message = on_message
+        self.on_close = on_close
+        self.on_pong = on_pong
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.subscribe_batch = subscribe_batch  # Bybit caps the args of one request (10 on spot)
+        self.ws = None
+        self.tasks = []
+        self.snapshots = {}  # topic -> merged ticker data
+        self.acks = {}  # req_id -> future resolved by the subscribe response
+        self.req_ids = itertools.count(1)
+        self.last_pong = 0.0
+        self.connected = False
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def connect(self, timeout: float = 10.0) -> None:
+        """Open the socket and subscribe; returns once every subscription is acknowledged."""
+        loop = asyncio.get_running_loop()
+        # Keepalive is Bybit's JSON ping below, not protocol-level pings
+        self.ws = await asyncio.wait_for(
+            connect(self.url, ping_interval=None, compression=None, open_timeout=timeout), timeout)
+        self.connected = True
+        self.last_pong = time.monotonic()
+        self.tasks = [loop.create_task(self.read_loop()), loop.create_task(self.ping_loop())]
+        try:
+            pending = []
+            for start in range(0, len(self.topics), self.subscribe_batch):
+                req_id = str(next(self.req_ids))
+                self.acks[req_id] = loop.create_future()
+                pending.append(self.acks[req_id])
+                await self.ws.send(json.dumps(
+                    {'op': 'subscribe', 'req_id': req_id, 'args': self.topics[start:start + self.subscribe_batch]}))
+            await asyncio.wait_for(asyncio.gather(*pending), timeout)
+        except BaseException:
+            await self.close()
+            raise
+
+    async def read_loop(self) -> None:
+        try:
+            async for raw in self.ws:
+                message = json.loads(raw)
+                if 'topic' in message:
+                    self.dispatch(message)
+                else:
+                    self.handle_op(message)
+        except ConnectionClosed as e:
+            logging.info(f"WebSocket {self.url} closed: {e}")
+        except Exception as e:
+            logging.error(f"WebSocket {self.url} reader error: {str(e)}")
+        finally:
+            self.set_closed()
+            # Ends the ping loop; the socket may still be open after a reader error
+            await self.close()
+
+    def dispatch(self, message: dict) -> None:
+        topic = message['topic']
+        if topic.startswith('tickers.'):
+            data = message.get('data')
+            if message.get('type') == 'snapshot' or topic not in self.snapshots:
+                self.snapshots[topic] = dict(data)
+            else:
+                self.snapshots[topic].update(data)
+            # A copy: the consumer keeps the message, the next delta must not change it
+            message = dict(message, type='snapshot', data=dict(self.snapshots[topic]))
+        self.on_message(message)
+
+    def handle_op(self, message: dict) -> None:
+        op = message.get('op')
+        if op == 'subscribe':
+            ack = self.acks.pop(message.get('req_id'), None)
+            if ack is None or ack.done():
+                return
+            if message.get('success'):
+                ack.set_result(message)
+            else:
+                ack.set_exception(ConnectionError(f"Subscription rejected: {message.get('ret_msg')}"))
+        elif op in ('ping', 'pong'):
+            # linear/inverse answer {"op": "ping", "ret_msg": "pong"}, spot {"op": "pong"}
+            self.last_pong = time.monotonic()
+            if self.on_pong:
+                self.on_pong()
+
+    async def ping_loop(self) -> None:
+        while self.connected:
+            await asyncio.sleep(self.ping_interval)
+            sent = time.monotonic()
+            try:
+                await self.ws.send(json.dumps({'op': 'ping', 'req_id': str(next(self.req_ids))}))
+            except ConnectionClosed:
+                return
+            await asyncio.sleep(self.ping_timeout)
+            if self.connected and self.last_pong < sent:
+                logging.warning(f"WebSocket {self.url}: no pong within {self.ping_timeout}s, closing")
+                await self.close()
+                return
+
+    def set_closed(self) -> None:
+        if not self.connected:
+            return
+        self.connected = False
+        for ack in self.acks.values():
+            if not ack.done():
+                ack.set_exception(ConnectionError("Connection closed before the subscription was acknowledged"))
+        if self.on_close:
+            self.on_close()
+
+    async def close(self) -> None:
+        self.set_closed()
+        current = asyncio.current_task()
+        for task in self.tasks:
+            if task is not current:
+                task.cancel()
+        if self.ws is not None:
+            await self.ws.close()